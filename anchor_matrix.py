@@ -0,0 +1,132 @@
+"""
+Space R 锚点矩阵 - 独特性检测用的常驻 float32 向量矩阵
+
+- 启动时从 Space R 一次性载入（只取 clip 向量，不取 payload）
+- 晋升 / 删除锚点时原地追加或移除，不再每次从 Qdrant 点对象重建 np.array
+- max_similarity() 一次矩阵乘算出整页向量各自与最近锚点的相似度
+"""
+import threading
+from typing import Sequence
+
+import numpy as np
+
+ANCHOR_LOAD_PAGE_SIZE = 1024
+
+
+class AnchorMatrix:
+    """
+    按行存放锚点向量的可增长矩阵（容量翻倍，追加均摊 O(1)）
+
+    所有读写都在同一把锁下进行：爬虫后台线程晋升锚点的同时，
+    Web 请求线程可能正在做独特性检测。
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        # 向量维度由第一批锚点决定
+        self._matrix = None
+        self._ids = []
+        self._position = {}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, point_id):
+        return str(point_id) in self._position
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """当前锚点向量 (n, dim) 的副本"""
+        with self._lock:
+            if self._matrix is None:
+                return np.empty((0, 0), dtype=np.float32)
+            return self._matrix[:len(self._ids)].copy()
+
+    @staticmethod
+    def _as_rows(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors.reshape(len(vectors), -1) if vectors.size else vectors.reshape(0, 0)
+
+    def _reserve(self, n: int, dim: int):
+        if self._matrix is None:
+            self._matrix = np.empty((max(n, self.capacity), dim), dtype=np.float32)
+        elif n > len(self._matrix):
+            grown = np.empty((max(n, 2 * len(self._matrix)), self._matrix.shape[1]), dtype=np.float32)
+            grown[:len(self._ids)] = self._matrix[:len(self._ids)]
+            self._matrix = grown
+
+    def replace(self, ids: Sequence, vectors):
+        """整体替换为给定锚点（全量重算或启动载入时使用）"""
+        vectors = self._as_rows(vectors)
+        with self._lock:
+            self._matrix = None
+            self._ids = [str(i) for i in ids]
+            self._position = {point_id: k for k, point_id in enumerate(self._ids)}
+            if len(vectors):
+                self._reserve(len(vectors), vectors.shape[1])
+                self._matrix[:len(vectors)] = vectors
+
+    def add(self, ids: Sequence, vectors):
+        """追加锚点；已存在的 ID 只覆盖其向量"""
+        vectors = self._as_rows(vectors)
+        if not len(vectors):
+            return
+        with self._lock:
+            self._reserve(len(self._ids) + len(vectors), vectors.shape[1])
+            for point_id, vector in zip(ids, vectors):
+                point_id = str(point_id)
+                k = self._position.get(point_id)
+                if k is None:
+                    k = len(self._ids)
+                    self._ids.append(point_id)
+                    self._position[point_id] = k
+                self._matrix[k] = vector
+
+    def remove(self, ids: Sequence):
+        """移除锚点（把最后一行换到空位，O(1)）"""
+        with self._lock:
+            for point_id in ids:
+                k = self._position.pop(str(point_id), None)
+                if k is None:
+                    continue
+                last = len(self._ids) - 1
+                if k != last:
+                    self._matrix[k] = self._matrix[last]
+                    self._ids[k] = self._ids[last]
+                    self._position[self._ids[k]] = k
+                self._ids.pop()
+
+    def max_similarity(self, vectors) -> np.ndarray:
+        """
+        每个向量与最近锚点的相似度（点积），一次矩阵乘
+
+        Returns:
+            (q,) float32 数组；没有锚点时全为 0（距离 1.0，即一定独特）
+        """
+        queries = self._as_rows(vectors)
+        with self._lock:
+            n = len(self._ids)
+            if n == 0:
+                return np.zeros(len(queries), dtype=np.float32)
+            return (queries @ self._matrix[:n].T).max(axis=1)
+
+    def load(self, client, collection_name: str, page_size: int = ANCHOR_LOAD_PAGE_SIZE) -> int:
+        """从 Qdrant 载入全部锚点（只取 clip 向量）"""
+        ids, vectors = [], []
+        offset = None
+        while True:
+            batch, offset = client.scroll(
+                collection_name=collection_name,
+                limit=page_size,
+                offset=offset,
+                with_payload=False,
+                with_vectors=["clip"],
+            )
+            for p in batch:
+                ids.append(p.id)
+                vectors.append(p.vector["clip"])
+            if offset is None:
+                break
+        self.replace(ids, vectors)
+        return len(ids)
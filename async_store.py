@@ -0,0 +1,105 @@
+"""
+异步 Qdrant 数据访问层 - 供 web_server 的 async 端点使用
+
+所有端点共用一个 AsyncQdrantClient（带连接池），首次使用时创建。
+同步的 QdrantClient（system_manager / search_engine 中的模块级 client）继续服务
+后台任务和脚本；请求路径上的 retrieve / query_points / scroll / count 都在这里 await，
+慢查询不再阻塞事件循环上的 WebSocket 广播和其他请求。
+"""
+import os
+from typing import List, Optional, Sequence
+
+from qdrant_client import AsyncQdrantClient
+from dotenv import load_dotenv
+
+load_dotenv()
+
+QDRANT_URL = os.getenv("QDRANT_URL")
+QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+# 连接池大小（同时在途的 HTTP 连接数上限）
+QDRANT_ASYNC_POOL_SIZE = int(os.getenv("QDRANT_ASYNC_POOL_SIZE", "32"))
+QDRANT_ASYNC_TIMEOUT = int(os.getenv("QDRANT_ASYNC_TIMEOUT", "10"))
+
+_async_client: Optional[AsyncQdrantClient] = None
+
+
+def get_async_client() -> AsyncQdrantClient:
+    """返回进程内共享的 AsyncQdrantClient（懒加载）"""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncQdrantClient(
+            url=QDRANT_URL,
+            api_key=QDRANT_API_KEY,
+            pool_size=QDRANT_ASYNC_POOL_SIZE,
+            timeout=QDRANT_ASYNC_TIMEOUT,
+            # 版本检查是一次同步 HTTP 请求，不要在事件循环里做
+            check_compatibility=False,
+        )
+    return _async_client
+
+
+def set_async_client(client: Optional[AsyncQdrantClient]):
+    """替换共享客户端（测试时注入假客户端，传 None 则下次使用时重新创建）"""
+    global _async_client
+    _async_client = client
+
+
+async def close_async_client():
+    """应用关闭时释放连接池"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
+
+# --- 请求路径上用到的查询 ---
+
+async def retrieve(collection_name: str, ids: Sequence, with_payload=True, with_vectors=False) -> List:
+    if not ids:
+        return []
+    return await get_async_client().retrieve(
+        collection_name=collection_name,
+        ids=list(ids),
+        with_payload=with_payload,
+        with_vectors=with_vectors,
+    )
+
+
+async def query_points(collection_name: str, query, limit: int, using: str = "clip", with_payload=True) -> List:
+    response = await get_async_client().query_points(
+        collection_name=collection_name,
+        query=query,
+        using=using,
+        limit=limit,
+        with_payload=with_payload,
+    )
+    return response.points
+
+
+async def query_batch_points(collection_name: str, requests: Sequence) -> List[List]:
+    """多个 QueryRequest 合并成一次往返，按请求顺序返回每个请求的命中列表"""
+    if not requests:
+        return []
+    responses = await get_async_client().query_batch_points(
+        collection_name=collection_name,
+        requests=list(requests),
+    )
+    return [response.points for response in responses]
+
+
+async def browse_collection(collection_name: str, limit: int = 50, offset_id=None) -> dict:
+    """与 SystemManager.browse_collection 返回相同结构的异步版本"""
+    points, next_offset = await get_async_client().scroll(
+        collection_name=collection_name,
+        limit=limit,
+        with_payload=True,
+        with_vectors=False,  # 浏览时不需要看巨大的向量数据
+        offset=offset_id,
+    )
+    return {
+        "items": [
+            {"id": p.id, "payload": p.payload, "score": p.payload.get("pr_score", 0.0)}
+            for p in points
+        ],
+        "next_offset": next_offset,
+    }
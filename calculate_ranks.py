@@ -1,4 +1,5 @@
 import pandas as pd
+import numpy as np
 import json
 import visual_rank_engine  # 调用你写的 Rust 库
 import os
@@ -14,8 +15,8 @@ def run_pagerank():
         return
 
     # 2. 准备图数据 (Source -> Target)
-    # Rust 引擎需要 [(src, dst)] 格式的列表
-    edges = list(zip(edges_df['source_id'], edges_df['target_id']))
+    # 直接传 (E, 2) 的 int64 数组，Rust 端零拷贝读取，不再逐条构造 Python 元组
+    edges = np.ascontiguousarray(edges_df[['source_id', 'target_id']].to_numpy(dtype=np.int64))
 
     # 获取总节点数 (假设 ID 是连续的，取最大ID + 1)
     max_id = max([x['id'] for x in content_data])
@@ -42,8 +43,8 @@ def run_pagerank():
     )
 
     # 5. 保存结果
-    # 我们把分数存成字典: {id: score}
-    rank_dict = {i: score for i, score in enumerate(scores) if score > 0}
+    # 返回的是 float64 数组，我们把分数存成字典: {id: score}
+    rank_dict = {i: score for i, score in enumerate(scores.tolist()) if score > 0}
 
     with open('mock_data/pagerank_scores.json', 'w') as f:
         json.dump(rank_dict, f)
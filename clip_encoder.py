@@ -0,0 +1,248 @@
+"""
+CLIP 编码服务 - 进程内共享、惰性加载的 CLIP 编码器
+
+search_engine 和 system_manager 通过 get_encoder() 共用同一个模型实例，
+模型在第一次编码或显式调用 warmup() 时才加载。
+测试时可以用 set_encoder() 注入假的编码器，无需 patch 模块全局变量。
+QueryBatcher 为异步接口提供微批处理：并发的查询合并成一次 CLIP 前向计算。
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import torch
+from PIL import Image
+
+CLIP_MODEL_NAME = os.getenv("CLIP_MODEL_NAME", "openai/clip-vit-base-patch32")
+CLIP_MAX_LENGTH = 77  # CLIP 文本编码器的最大 token 数
+# 批量编码时每次前向计算的文本条数（CPU 上 32 条一批的单条耗时远低于逐条编码）
+CLIP_BATCH_SIZE = int(os.getenv("CLIP_BATCH_SIZE", "32"))
+# torch CPU 线程数；0 表示使用 torch 默认值
+CLIP_NUM_THREADS = int(os.getenv("CLIP_NUM_THREADS", "0"))
+
+
+class ClipEncoder:
+    """
+    惰性加载的 CLIP 编码器（CPU 模式）
+
+    所有编码方法返回 L2 归一化后的 float32 numpy 数组：
+    单条输入返回形状 (dim,)，批量输入返回形状 (n, dim)。
+    """
+
+    def __init__(self, model_name: str = CLIP_MODEL_NAME, batch_size: int = CLIP_BATCH_SIZE,
+                 num_threads: int = CLIP_NUM_THREADS):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self._model = None
+        self._processor = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    def warmup(self) -> "ClipEncoder":
+        """显式预热：立即加载模型（例如在服务启动时于后台线程调用）"""
+        self._ensure_loaded()
+        return self
+
+    def _ensure_loaded(self):
+        if self._model is not None:
+            return
+        with self._load_lock:
+            if self._model is not None:
+                return
+            # 延迟导入 transformers，避免仅导入模块时就付出加载代价
+            from transformers import CLIPModel, CLIPProcessor
+
+            if self.num_threads > 0:
+                torch.set_num_threads(self.num_threads)
+            print(f"⚙️Loading local CLIP model (CPU mode): {self.model_name} ...")
+            processor = CLIPProcessor.from_pretrained(self.model_name)
+            model = CLIPModel.from_pretrained(self.model_name)
+            model.eval()
+            self._processor = processor
+            self._model = model
+            print("✅ CLIP model loaded")
+
+    @staticmethod
+    def _normalize(feat) -> np.ndarray:
+        # 新版 transformers 的 get_*_features 返回 ModelOutput 而不是 Tensor
+        if not isinstance(feat, torch.Tensor):
+            feat = feat.pooler_output
+        feat = feat / feat.norm(p=2, dim=-1, keepdim=True)
+        return feat.detach().cpu().numpy().astype(np.float32, copy=False)
+
+    def encode_texts(self, texts: Sequence[str]) -> np.ndarray:
+        """批量编码文本，返回 (n, dim) 的 float32 数组"""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        self._ensure_loaded()
+        inputs = self._processor(
+            text=texts,
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=CLIP_MAX_LENGTH
+        )
+        with torch.inference_mode():
+            feat = self._model.get_text_features(**inputs)
+        return self._normalize(feat)
+
+    def encode_text(self, text: str) -> np.ndarray:
+        """编码单条文本，返回 (dim,) 的 float32 数组"""
+        return self.encode_texts([text])[0]
+
+    def embed_texts(self, texts: Sequence[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """
+        入库用的批量文本编码：按 batch_size 分批前向计算，返回 (n, dim) 的 float32 数组
+
+        先按文本长度排序再分批，同一批内的 padding 更少；结果按输入顺序返回。
+        """
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        batch_size = max(1, batch_size or self.batch_size)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+
+        out = None
+        for start in range(0, len(order), batch_size):
+            chunk = order[start:start + batch_size]
+            vecs = self.encode_texts([texts[i] for i in chunk])
+            if out is None:
+                out = np.empty((len(texts), vecs.shape[1]), dtype=np.float32)
+            out[chunk] = vecs
+        return out
+
+    def encode_images(self, images: Sequence[Union[str, Image.Image]]) -> np.ndarray:
+        """
+        批量编码图片
+
+        Args:
+            images: 本地图片路径或 PIL.Image 对象列表
+        """
+        images = [
+            Image.open(img).convert("RGB") if isinstance(img, str) else img.convert("RGB")
+            for img in images
+        ]
+        if not images:
+            return np.zeros((0, 0), dtype=np.float32)
+        self._ensure_loaded()
+        inputs = self._processor(images=images, return_tensors="pt")
+        with torch.inference_mode():
+            feat = self._model.get_image_features(**inputs)
+        return self._normalize(feat)
+
+    def encode_image(self, image: Union[str, Image.Image]) -> np.ndarray:
+        """编码单张图片，返回 (dim,) 的 float32 数组"""
+        return self.encode_images([image])[0]
+
+
+# --- 进程级单例 ---
+_encoder: Optional[ClipEncoder] = None
+_encoder_lock = threading.Lock()
+
+
+def get_encoder() -> ClipEncoder:
+    """获取进程内共享的编码器（首次调用时创建，但不会立即加载模型）"""
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                _encoder = ClipEncoder()
+    return _encoder
+
+
+def set_encoder(encoder) -> None:
+    """替换共享编码器（测试注入假编码器，或部署时使用自定义模型）"""
+    global _encoder
+    with _encoder_lock:
+        _encoder = encoder
+
+
+class QueryBatcher:
+    """
+    微批处理查询编码器（用于 async 接口）
+
+    在 max_wait_ms 时间窗口内（或凑满 max_batch_size 条）收集并发的查询，
+    合并成一次批量 CLIP 前向计算，并在独立线程中执行，不阻塞事件循环。
+    同一时刻只有一批在计算：计算期间到达的查询先排队，上一批结束后立即作为下一批发车。
+    每个调用者拿回自己查询对应的向量。
+    """
+
+    def __init__(self, max_batch_size: int = 32, max_wait_ms: float = 5.0, encoder=None):
+        """
+        Args:
+            max_batch_size: 单批最多合并的查询数
+            max_wait_ms: 第一个查询到达后最多等待多久再发车（毫秒）
+            encoder: 指定编码器；None 表示每批都使用 get_encoder() 的共享实例
+        """
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._encoder = encoder
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._running = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="clip-batch")
+        self.stats = {"queries": 0, "batches": 0, "max_batch_size_seen": 0}
+
+    async def encode(self, text: str) -> np.ndarray:
+        """异步编码单条查询，返回 (dim,) 的 float32 数组"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        self.stats["queries"] += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush(loop)
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush, loop)
+
+        return await future
+
+    def _flush(self, loop: asyncio.AbstractEventLoop):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        # 上一批还在计算：先不发车，等它结束时由 _run_batch 把积累的查询合并发出
+        if self._running or not self._pending:
+            return
+        batch = self._pending[:self.max_batch_size]
+        self._pending = self._pending[self.max_batch_size:]
+        self._running = True
+        loop.create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        # 同一批里的重复查询只编码一次
+        unique_texts: Dict[str, int] = {}
+        for text, _ in batch:
+            unique_texts.setdefault(text, len(unique_texts))
+
+        self.stats["batches"] += 1
+        self.stats["max_batch_size_seen"] = max(self.stats["max_batch_size_seen"], len(unique_texts))
+
+        encoder = self._encoder or get_encoder()
+        loop = asyncio.get_running_loop()
+        try:
+            vectors = await loop.run_in_executor(self._executor, encoder.encode_texts, list(unique_texts))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._running = False
+            # 计算期间到达的查询已至少等了一整批的时间，立即发车
+            self._flush(loop)
+
+        for text, future in batch:
+            if not future.done():
+                future.set_result(vectors[unique_texts[text]])
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
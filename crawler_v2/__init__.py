@@ -3,9 +3,10 @@
 """
 from .crawler import AsyncCrawler
 from .sync_wrapper import SyncCrawlerWrapper
+from .frontier import Frontier, run_frontier, score_link
 
 # 导出主要类
-__all__ = ['AsyncCrawler', 'SyncCrawlerWrapper']
+__all__ = ['AsyncCrawler', 'SyncCrawlerWrapper', 'Frontier', 'run_frontier', 'score_link']
 
 # 为了向后兼容，提供一个默认的同步接口
 def get_crawler(sync=True):
@@ -13,6 +13,7 @@ from concurrent.futures import ThreadPoolExecutor
 from .utils import normalize_url, is_valid_url, content_hash, get_domain
 from .filters import ContentFilter, LinkFilter
 from .robots import RobotsChecker
+from .frontier import Frontier, FrontierItem, Scorer, page_quality, run_frontier, score_link
 
 try:
     from fake_useragent import UserAgent
@@ -419,31 +420,35 @@ class AsyncCrawler:
             self.stats['failed_requests'] += 1
             return None
     
-    async def run(self, urls: List[str]) -> List[Dict]:
+    async def run(self, urls: List[str], session: Optional[aiohttp.ClientSession] = None) -> List[Dict]:
         """
         批量处理URL列表
         
         Args:
             urls: URL列表
+            session: 复用的会话（如 SyncCrawlerWrapper 的连接池）；None 时临时创建
             
         Returns:
             成功爬取的结果列表
         """
-        # 配置SSL连接器
-        connector = aiohttp.TCPConnector(ssl=False if not self.verify_ssl else None)
-        async with aiohttp.ClientSession(connector=connector) as session:
-            tasks = [self.process_url(session, url) for url in urls]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # 过滤异常和None
-            valid_results = []
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
-                    logger.error(f"Error processing {urls[i]}: {result}")
-                elif result is not None:
-                    valid_results.append(result)
-            
-            return valid_results
+        if session is None:
+            # 配置SSL连接器
+            connector = aiohttp.TCPConnector(ssl=False if not self.verify_ssl else None)
+            async with aiohttp.ClientSession(connector=connector) as own_session:
+                return await self.run(urls, session=own_session)
+
+        tasks = [self.process_url(session, url) for url in urls]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        # 过滤异常和None
+        valid_results = []
+        for i, result in enumerate(results):
+            if isinstance(result, Exception):
+                logger.error(f"Error processing {urls[i]}: {result}")
+            elif result is not None:
+                valid_results.append(result)
+        
+        return valid_results
     
     async def crawl_recursive(
         self,
@@ -452,10 +457,13 @@ class AsyncCrawler:
         max_pages: Optional[int] = None,
         callback: Optional[Callable[[int, str, Dict], None]] = None,
         same_domain_only: Optional[bool] = None,
-        adaptive_depth: bool = True
+        adaptive_depth: bool = True,
+        scorer: Optional[Scorer] = score_link,
+        session: Optional[aiohttp.ClientSession] = None,
+        frontier: Optional[Frontier] = None
     ) -> List[Dict]:
         """
-        递归爬取（BFS）
+        递归爬取（按主机分队列的优先级 frontier，没有层间等待）
         
         Args:
             start_url: 起始URL
@@ -463,70 +471,56 @@ class AsyncCrawler:
             max_pages: 最大页面数
             callback: 回调函数(count, url, result)
             same_domain_only: 是否只爬取同一域名
-            adaptive_depth: 是否自适应深度调整
+            adaptive_depth: 是否按父页面质量调整子链接优先级
+            scorer: 链接评分函数 scorer(url, depth, parent_quality)；None 表示 BFS 顺序
+            session: 复用的会话；None 时临时创建
+            frontier: 外部传入的 frontier（如可恢复的 DurableFrontier，续爬时不再加入起始URL）
             
         Returns:
             爬取结果列表
         """
-        visited = set()
-        queue = [(start_url, 0)]
+        if session is None:
+            # 配置SSL连接器
+            connector = aiohttp.TCPConnector(ssl=False if not self.verify_ssl else None)
+            async with aiohttp.ClientSession(connector=connector) as own_session:
+                return await self.crawl_recursive(
+                    start_url, max_depth, max_pages, callback, same_domain_only,
+                    adaptive_depth, scorer, session=own_session, frontier=frontier
+                )
+        
         results = []
-        count = 0
         start_domain = get_domain(start_url)
-        
         if same_domain_only is None:
             same_domain_only = self.link_filter.same_domain_only
         
-        # 配置SSL连接器
-        connector = aiohttp.TCPConnector(ssl=False if not self.verify_ssl else None)
-        async with aiohttp.ClientSession(connector=connector) as session:
-            while queue:
-                if max_pages and count >= max_pages:
-                    break
-                
-                # 获取当前层的所有URL
-                current_level = []
-                current_depth = queue[0][1] if queue else 0
-                
-                while queue and queue[0][1] == current_depth:
-                    url, depth = queue.pop(0)
-                    if url in visited:
-                        continue
-                    visited.add(url)
-                    current_level.append((url, depth))
-                
-                if not current_level:
-                    break
-                
-                # 并发处理当前层
-                tasks = [self.process_url(session, url) for url, _ in current_level]
-                level_results = await asyncio.gather(*tasks, return_exceptions=True)
-                
-                # 处理结果
-                for i, (url, depth) in enumerate(current_level):
-                    result = level_results[i]
-                    
-                    if isinstance(result, Exception) or result is None:
-                        continue
-                    
-                    results.append(result)
-                    count += 1
-                    
-                    # 回调
-                    if callback:
-                        try:
-                            callback(count, url, result)
-                        except Exception as e:
-                            logger.warning(f"Callback error for {url}: {e}")
-                    
-                    # 添加到下一层
-                    if depth < max_depth:
-                        for link in result.get('links', []):
-                            link_domain = get_domain(link)
-                            if link not in visited:
-                                if not same_domain_only or link_domain == start_domain:
-                                    queue.append((link, depth + 1))
+        if frontier is None:
+            frontier = Frontier(scorer=scorer)
+        frontier.add(start_url, 0)
         
+        async def handle(item: FrontierItem) -> bool:
+            result = await self.process_url(session, item.url)
+            if result is None:
+                return False
+            
+            results.append(result)
+            frontier.complete([item.url])
+            
+            # 回调
+            if callback:
+                try:
+                    callback(len(results), item.url, result)
+                except Exception as e:
+                    logger.warning(f"Callback error for {item.url}: {e}")
+            
+            # 子链接立即进入 frontier
+            if item.depth < max_depth:
+                quality = page_quality(result) if adaptive_depth else None
+                for link in result.get('links', []):
+                    if not same_domain_only or get_domain(link) == start_domain:
+                        frontier.add(link, item.depth + 1, quality)
+            return True
+        
+        await run_frontier(frontier, handle, self.concurrency, max_items=max_pages)
         return results
     
     def get_stats(self) -> Dict:
@@ -0,0 +1,319 @@
+"""
+可恢复的爬取前沿 - frontier 和 visited 集合持久化到本地 SQLite
+
+- 与 Frontier 接口一致（add / pop / done / complete），可直接替换
+- 所有 URL 只存在磁盘上（每个 crawl_id 一张逻辑表 + 索引），内存里只保留在途 URL，
+  百万级 URL 也不会占满内存
+- 每次操作（add / add_many / pop / done / complete）是一个短事务，不跨操作持有写锁
+  （一页的链接由 add_many 一次写入）：
+  WAL + synchronous=NORMAL 下提交不做 fsync，代价很小；多个 frontier（不同 crawl_id、
+  甚至不同进程）可同时使用同一个文件，写锁冲突时最多等待 BUSY_TIMEOUT 秒
+- 以 crawl_id 恢复：上次在途 / 已抓取但未入库的 URL 重新入队，已入库的不再处理
+- 同一进程内一个 crawl_id 同时只能被一个 DurableFrontier 持有（重复提交同一起始 URL 时抛出
+  CrawlAlreadyRunning），避免把正在运行的任务误当作中断任务"恢复"
+
+URL 状态：queued → in_flight（pop）→ fetched（done）→ stored（complete，已写入数据库）
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+from .frontier import FrontierItem, Scorer, score_link
+from .utils import normalize_url, get_domain
+
+logger = logging.getLogger(__name__)
+
+QUEUED, IN_FLIGHT, FETCHED, STORED = 0, 1, 2, 3
+# 等待其他连接释放写锁的上限（秒）；这些调用在爬虫事件循环上同步执行，事务都很短，不宜久等
+BUSY_TIMEOUT = 2.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawls (
+    crawl_id   TEXT PRIMARY KEY,
+    start_url  TEXT NOT NULL,
+    params     TEXT,
+    status     TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS urls (
+    crawl_id TEXT NOT NULL,
+    url      TEXT NOT NULL,
+    depth    INTEGER NOT NULL,
+    score    REAL NOT NULL,
+    host     TEXT NOT NULL,
+    state    INTEGER NOT NULL,
+    seq      INTEGER NOT NULL,
+    PRIMARY KEY (crawl_id, url)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS urls_by_priority ON urls (crawl_id, state, score DESC, seq);
+"""
+
+
+# 本进程中正在使用的 (数据库文件, crawl_id)
+_active_crawls = set()
+_active_crawls_lock = threading.Lock()
+
+
+class CrawlAlreadyRunning(RuntimeError):
+    """crawl_id 已被本进程中另一个 DurableFrontier 持有"""
+
+
+def default_crawl_id(start_url: str) -> str:
+    """同一个起始 URL 默认得到同一个 crawl_id，服务重启后重新提交即可续爬"""
+    return hashlib.sha1((normalize_url(start_url) or start_url).encode("utf-8")).hexdigest()[:16]
+
+
+class DurableFrontier:
+    """
+    SQLite 持久化的 frontier + visited 集合
+
+    Args:
+        path: SQLite 文件路径
+        crawl_id: 爬取任务 ID；已存在且未完成时自动恢复；正被本进程使用时抛出 CrawlAlreadyRunning
+        start_url: 新建任务时记录的起始 URL
+        params: 任务参数（max_depth 等），仅记录
+        scorer: 链接评分函数；None 表示 FIFO（按入队顺序）
+        per_host_limit: 每个主机同时在途的 URL 上限
+    """
+
+    def __init__(self, path: str, crawl_id: str, start_url: str = "", params: Optional[Dict] = None,
+                 scorer: Optional[Scorer] = score_link, per_host_limit: Optional[int] = None):
+        self.path = path
+        self.crawl_id = crawl_id
+        self.scorer = scorer
+        self.per_host_limit = per_host_limit
+
+        self._claim = (os.path.abspath(path), crawl_id)
+        with _active_crawls_lock:
+            if self._claim in _active_crawls:
+                raise CrawlAlreadyRunning(f"Crawl {crawl_id} is already running")
+            _active_crawls.add(self._claim)
+        try:
+            # 爬取可能在 SyncCrawlerWrapper 的事件循环线程中运行，与创建线程不同
+            self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            self._lock = threading.RLock()
+            self._in_flight: Dict[str, FrontierItem] = {}
+            self._host_in_flight: Dict[str, int] = {}
+
+            with self._transaction():
+                self.resumed = self._open(start_url, params)
+            self._seen = self._count()
+            self._queued = self._count(QUEUED)
+            self._stored = self._count(STORED)
+            self._seq = self._conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM urls WHERE crawl_id = ?", (crawl_id,)
+            ).fetchone()[0]
+        except BaseException:
+            self._release()
+            raise
+
+    @contextmanager
+    def _transaction(self):
+        """一次操作一个写事务（BEGIN IMMEDIATE：开始时就取写锁，避免读后升级写锁时死锁）"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _open(self, start_url: str, params: Optional[Dict]) -> bool:
+        """登记任务；返回是否为恢复未完成的任务"""
+        row = self._conn.execute("SELECT status FROM crawls WHERE crawl_id = ?", (self.crawl_id,)).fetchone()
+        now = time.time()
+        if row and row[0] == "running":
+            # 上次中断：在途和已抓取未入库的 URL 重新入队
+            self._conn.execute(
+                "UPDATE urls SET state = ? WHERE crawl_id = ? AND state IN (?, ?)",
+                (QUEUED, self.crawl_id, IN_FLIGHT, FETCHED)
+            )
+            self._conn.execute("UPDATE crawls SET updated_at = ? WHERE crawl_id = ?", (now, self.crawl_id))
+            return True
+        # 新任务，或已完成的任务重新开始
+        self._conn.execute("DELETE FROM urls WHERE crawl_id = ?", (self.crawl_id,))
+        self._conn.execute(
+            "INSERT OR REPLACE INTO crawls (crawl_id, start_url, params, status, created_at, updated_at) "
+            "VALUES (?, ?, ?, 'running', ?, ?)",
+            (self.crawl_id, start_url, json.dumps(params or {}), now, now)
+        )
+        return False
+
+    def _count(self, state: Optional[int] = None) -> int:
+        if state is None:
+            sql, args = "SELECT COUNT(*) FROM urls WHERE crawl_id = ?", (self.crawl_id,)
+        else:
+            sql, args = "SELECT COUNT(*) FROM urls WHERE crawl_id = ? AND state = ?", (self.crawl_id, state)
+        return self._conn.execute(sql, args).fetchone()[0]
+
+    # --- 与 Frontier 相同的接口 ---
+
+    def __len__(self):
+        """排队中的 URL 数"""
+        return self._queued
+
+    def __contains__(self, url: str):
+        key = normalize_url(url) or url
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM urls WHERE crawl_id = ? AND url = ?", (self.crawl_id, key)
+            ).fetchone() is not None
+
+    @property
+    def seen_count(self) -> int:
+        return self._seen
+
+    @property
+    def stored_count(self) -> int:
+        """已确认写入数据库的 URL 数（恢复时用于续接计数）"""
+        return self._stored
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def add(self, url: str, depth: int = 0, parent_quality: Optional[float] = None) -> Optional[FrontierItem]:
+        """URL 入队（规范化后去重，visited 判断由主键完成）"""
+        normalized = normalize_url(url)
+        if not normalized:
+            return None
+
+        score = self._score(normalized, depth, parent_quality)
+        host = get_domain(normalized) or ''
+        with self._transaction():
+            self._seq += 1
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO urls (crawl_id, url, depth, score, host, state, seq) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.crawl_id, normalized, depth, score, host, QUEUED, self._seq)
+            ).rowcount
+        if not inserted:
+            return None
+        self._seen += 1
+        self._queued += 1
+        return FrontierItem(normalized, depth, score, host)
+
+    def add_many(self, urls: Iterable[str], depth: int = 0, parent_quality: Optional[float] = None) -> int:
+        """一页的链接批量入队（一个事务、一次 executemany），返回新入队的数量"""
+        rows = {}
+        for url in urls:
+            normalized = normalize_url(url)
+            if normalized and normalized not in rows:
+                rows[normalized] = (self._score(normalized, depth, parent_quality), get_domain(normalized) or '')
+        if not rows:
+            return 0
+        with self._transaction():
+            params = []
+            for normalized, (score, host) in rows.items():
+                self._seq += 1
+                params.append((self.crawl_id, normalized, depth, score, host, QUEUED, self._seq))
+            inserted = max(self._conn.executemany(
+                "INSERT OR IGNORE INTO urls (crawl_id, url, depth, score, host, state, seq) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                params
+            ).rowcount, 0)
+        self._seen += inserted
+        self._queued += inserted
+        return inserted
+
+    def _score(self, url: str, depth: int, parent_quality: Optional[float]) -> float:
+        if self.scorer is None:
+            return 0.0
+        try:
+            return float(self.scorer(url, depth, parent_quality))
+        except Exception as e:
+            logger.warning(f"Scorer error for {url}: {e}")
+            return 0.0
+
+    def pop(self) -> Optional[FrontierItem]:
+        """取出评分最高（同分按入队顺序）且主机未达并发上限的 URL"""
+        sql = "SELECT url, depth, score, host FROM urls WHERE crawl_id = ? AND state = ?"
+        args = [self.crawl_id, QUEUED]
+        with self._transaction():
+            if self.per_host_limit:
+                busy = [h for h, n in self._host_in_flight.items() if n >= self.per_host_limit]
+                if busy:
+                    sql += f" AND host NOT IN ({', '.join('?' * len(busy))})"
+                    args += busy
+            row = self._conn.execute(sql + " ORDER BY score DESC, seq LIMIT 1", args).fetchone()
+            if row is None:
+                return None
+            item = FrontierItem(*row)
+            self._conn.execute(
+                "UPDATE urls SET state = ? WHERE crawl_id = ? AND url = ?", (IN_FLIGHT, self.crawl_id, item.url)
+            )
+            self._in_flight[item.url] = item
+            self._host_in_flight[item.host] = self._host_in_flight.get(item.host, 0) + 1
+            self._queued -= 1
+        return item
+
+    def done(self, item: FrontierItem):
+        """抓取结束：释放主机名额，状态记为 fetched（是否入库由 complete() 确认）"""
+        with self._lock:
+            if self._in_flight.pop(item.url, None) is None:
+                return
+            self._host_in_flight[item.host] -= 1
+            if not self._host_in_flight[item.host]:
+                del self._host_in_flight[item.host]
+            with self._transaction():
+                self._conn.execute(
+                    "UPDATE urls SET state = ? WHERE crawl_id = ? AND url = ? AND state = ?",
+                    (FETCHED, self.crawl_id, item.url, IN_FLIGHT)
+                )
+                self._conn.execute(
+                    "UPDATE crawls SET updated_at = ? WHERE crawl_id = ?", (time.time(), self.crawl_id)
+                )
+
+    def complete(self, urls: Iterable[str]):
+        """URL 已写入数据库（或确认已存在），恢复时不再处理"""
+        keys = [(STORED, self.crawl_id, normalize_url(u) or u, STORED) for u in urls]
+        if not keys:
+            return
+        with self._transaction():
+            cur = self._conn.executemany(
+                "UPDATE urls SET state = ? WHERE crawl_id = ? AND url = ? AND state != ?", keys
+            )
+            self._stored += max(cur.rowcount, 0)
+
+    def finish(self, keep_urls: bool = False):
+        """任务完成：标记状态并释放 URL 记录（keep_urls=True 时保留，便于排查）"""
+        with self._transaction():
+            if not keep_urls:
+                self._conn.execute("DELETE FROM urls WHERE crawl_id = ?", (self.crawl_id,))
+            self._conn.execute(
+                "UPDATE crawls SET status = 'finished', updated_at = ? WHERE crawl_id = ?", (time.time(), self.crawl_id)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+        self._release()
+
+    def _release(self):
+        with _active_crawls_lock:
+            _active_crawls.discard(self._claim)
+
+    @staticmethod
+    def unfinished_crawls(path: str) -> List[Dict]:
+        """列出未完成的爬取任务（可用于启动时提示或自动续爬）"""
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+        try:
+            conn.executescript(SCHEMA)
+            rows = conn.execute(
+                "SELECT crawl_id, start_url, params, updated_at FROM crawls WHERE status = 'running' ORDER BY updated_at"
+            ).fetchall()
+        finally:
+            conn.close()
+        return [
+            {"crawl_id": crawl_id, "start_url": start_url, "params": json.loads(params or "{}"), "updated_at": updated_at}
+            for crawl_id, start_url, params, updated_at in rows
+        ]
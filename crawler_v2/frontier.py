@@ -0,0 +1,280 @@
+"""
+爬取前沿（frontier）- 按主机分队列的优先级 URL 调度
+
+- 每个主机一个队列：无评分时是 FIFO（deque），有评分时是按分数出队的堆
+- 全局调度器 run_frontier() 始终保持 concurrency 个槽位忙碌，不按层等待：
+  某一层的慢页面不会拖住其他已就绪的 URL
+- 去重基于 normalize_url() 规范化后的 URL
+- 评分可插拔：scorer(url, depth, parent_quality) -> float，越大越优先；
+  默认 score_link() 沿用旧版 OptimizedCrawler 的链接 / 页面质量规则
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import re
+from collections import deque
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional
+from urllib.parse import urlparse
+
+from .utils import normalize_url, get_domain
+
+logger = logging.getLogger(__name__)
+
+Scorer = Callable[[str, int, Optional[float]], float]
+
+# 链接质量规则（与 crawler.OptimizedCrawler._score_link_quality 一致）
+HIGH_QUALITY_PATTERNS = [
+    (re.compile(r'/(article|post|news|blog|page|content|detail|view|show)/', re.I), 3.0),
+    (re.compile(r'/(course|program|study|education|research|faculty|department)/', re.I), 2.5),
+    (re.compile(r'/(about|info|overview|introduction)/', re.I), 2.0),
+    (re.compile(r'/\d{4}/|\d{2}/', re.I), 1.0),  # 日期路径通常表示文章
+]
+LOW_QUALITY_PATTERNS = [
+    (re.compile(r'/(tag|category|author|archive|feed|rss|atom)/', re.I), -2.0),
+    (re.compile(r'/(print|pdf|download|export|share|embed)/', re.I), -3.0),
+    (re.compile(r'/(search|result|filter|sort)/', re.I), -1.5),
+    (re.compile(r'/api/|/ajax/|/json/', re.I), -3.0),
+]
+
+
+def score_link(url: str, depth: int = 0, parent_quality: Optional[float] = None) -> float:
+    """
+    默认链接评分（0-10）：URL 模式 + 路径深度，父页面质量高的子链接略微提前
+
+    Args:
+        url: 链接URL
+        depth: 爬取深度（越浅略优先，保持接近 BFS 的覆盖顺序）
+        parent_quality: 父页面质量（page_quality() 的结果，可选）
+    """
+    score = 5.0
+    for pattern, points in HIGH_QUALITY_PATTERNS:
+        if pattern.search(url):
+            score += points
+    for pattern, points in LOW_QUALITY_PATTERNS:
+        if pattern.search(url):
+            score += points
+
+    # 适度路径深度（2-6层）通常质量更高
+    path_depth = len([p for p in urlparse(url).path.split('/') if p])
+    if 2 <= path_depth <= 6:
+        score += 0.5
+    elif path_depth > 10:
+        score -= 0.5
+
+    if parent_quality is not None:
+        score += (parent_quality - 5.0) * 0.2
+    score -= 0.1 * depth
+
+    return max(0.0, min(10.0, score))
+
+
+def page_quality(result: Optional[Dict]) -> float:
+    """
+    页面质量分数（0-10）：文本块数量、正文长度、链接数量、标题
+    （与 crawler.OptimizedCrawler._calculate_page_quality 一致）
+    """
+    if not result:
+        return 0.0
+
+    score = 0.0
+    texts = result.get('texts', [])
+    if texts:
+        score += min(len(texts) / 10.0, 3.0)
+        score += min(sum(len(t) for t in texts) / 1000.0, 2.0)
+
+    link_count = len(result.get('links', []))
+    if 5 <= link_count <= 50:
+        score += 2.0
+    elif link_count > 50:
+        score += 1.0
+
+    title = (result.get('title') or '').strip()
+    if len(title) > 10:
+        score += 1.0
+
+    return min(10.0, score)
+
+
+class FrontierItem(NamedTuple):
+    url: str
+    depth: int
+    score: float
+    host: str
+
+
+class _HostQueue:
+    """单个主机的待爬队列"""
+
+    def __init__(self, prioritized: bool):
+        self.prioritized = prioritized
+        self.items = [] if prioritized else deque()
+        self.in_flight = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def push(self, item: FrontierItem, seq: int):
+        if self.prioritized:
+            heapq.heappush(self.items, (-item.score, seq, item))
+        else:
+            self.items.append(item)
+
+    def peek_score(self) -> float:
+        return -self.items[0][0] if self.prioritized else 0.0
+
+    def pop(self) -> FrontierItem:
+        return heapq.heappop(self.items)[2] if self.prioritized else self.items.popleft()
+
+
+class Frontier:
+    """
+    按主机分队列的 URL 前沿
+
+    Args:
+        scorer: 评分函数；None 表示各主机内 FIFO（纯 BFS 顺序）
+        per_host_limit: 每个主机同时在途的 URL 上限（None 不限制，礼貌延迟仍由爬虫的 _domain_delay 负责）
+    """
+
+    def __init__(self, scorer: Optional[Scorer] = score_link, per_host_limit: Optional[int] = None):
+        self.scorer = scorer
+        self.per_host_limit = per_host_limit
+        self._hosts: Dict[str, _HostQueue] = {}
+        self._seen = set()
+        self._queued = 0
+        self._in_flight = 0
+        self._seq = itertools.count()
+        self._rotation = deque()  # 主机轮转顺序，分数相同时轮流出队
+
+    def __len__(self):
+        """排队中的 URL 数"""
+        return self._queued
+
+    def __contains__(self, url: str):
+        return (normalize_url(url) or url) in self._seen
+
+    @property
+    def seen_count(self) -> int:
+        """入过队的 URL 总数（含已出队）"""
+        return len(self._seen)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def add(self, url: str, depth: int = 0, parent_quality: Optional[float] = None) -> Optional[FrontierItem]:
+        """
+        URL 入队（规范化后去重）
+
+        Returns:
+            新入队的 FrontierItem；无效或重复时返回 None
+        """
+        normalized = normalize_url(url)
+        if not normalized or normalized in self._seen:
+            return None
+        self._seen.add(normalized)
+
+        score = 0.0
+        if self.scorer is not None:
+            try:
+                score = float(self.scorer(normalized, depth, parent_quality))
+            except Exception as e:
+                logger.warning(f"Scorer error for {normalized}: {e}")
+
+        host = get_domain(normalized) or ''
+        queue = self._hosts.get(host)
+        if queue is None:
+            queue = self._hosts[host] = _HostQueue(self.scorer is not None)
+            self._rotation.append(host)
+        item = FrontierItem(normalized, depth, score, host)
+        queue.push(item, next(self._seq))
+        self._queued += 1
+        return item
+
+    def add_many(self, urls, depth: int = 0, parent_quality: Optional[float] = None) -> int:
+        """一页的链接批量入队，返回新入队的数量"""
+        return sum(1 for url in urls if self.add(url, depth, parent_quality) is not None)
+
+    def pop(self) -> Optional[FrontierItem]:
+        """
+        取出下一个可爬 URL：在未达主机并发上限的主机中选队首分数最高者，
+        分数相同时按主机轮转；没有可爬 URL 时返回 None
+        """
+        best_host, best_score = None, None
+        for host in self._rotation:
+            queue = self._hosts[host]
+            if not queue or (self.per_host_limit and queue.in_flight >= self.per_host_limit):
+                continue
+            score = queue.peek_score()
+            if best_score is None or score > best_score:
+                best_host, best_score = host, score
+        if best_host is None:
+            return None
+
+        # 被选中的主机移到轮转末尾
+        self._rotation.remove(best_host)
+        self._rotation.append(best_host)
+
+        queue = self._hosts[best_host]
+        item = queue.pop()
+        queue.in_flight += 1
+        self._queued -= 1
+        self._in_flight += 1
+        return item
+
+    def done(self, item: FrontierItem):
+        """一个 URL 处理完毕，释放其主机的并发名额；空闲且无在途的主机被回收"""
+        queue = self._hosts.get(item.host)
+        if queue is None:
+            return
+        queue.in_flight -= 1
+        self._in_flight -= 1
+        if not queue and queue.in_flight == 0:
+            del self._hosts[item.host]
+            self._rotation.remove(item.host)
+
+    def complete(self, urls):
+        """URL 已写入数据库；内存 frontier 无需记录（见 DurableFrontier.complete）"""
+
+
+async def run_frontier(
+    frontier: Frontier,
+    handle: Callable[[FrontierItem], Awaitable[bool]],
+    concurrency: int,
+    max_items: Optional[int] = None,
+) -> int:
+    """
+    全局调度器：持续从 frontier 取 URL，保持最多 concurrency 个 handle() 同时运行。
+
+    handle(item) 负责处理页面并把新链接 add() 回 frontier，返回是否计入成功数；
+    max_items 限制成功数（在途任务也计入，避免超额派发）。
+
+    Returns:
+        成功处理的数量
+    """
+    running = set()
+    succeeded = 0
+
+    async def run_one(item: FrontierItem) -> bool:
+        try:
+            return bool(await handle(item))
+        except Exception as e:
+            logger.error(f"Frontier handler error for {item.url}: {e}")
+            return False
+        finally:
+            frontier.done(item)
+
+    while True:
+        while len(running) < concurrency and not (max_items and succeeded + len(running) >= max_items):
+            item = frontier.pop()
+            if item is None:
+                break
+            running.add(asyncio.ensure_future(run_one(item)))
+
+        if not running:
+            break
+
+        finished, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        succeeded += sum(1 for task in finished if task.result())
+
+    return succeeded
@@ -1,88 +1,174 @@
 """
 同步包装器 - 为了向后兼容，提供同步接口
+
+包装器持有一个常驻的后台事件循环线程和一个带连接池的 aiohttp.ClientSession：
+所有页面共用同一组 keep-alive 连接、TLS 会话和 DNS 缓存，
+不再为每个 URL 新建事件循环、线程和 TCPConnector。
 """
 import asyncio
+import concurrent.futures
 import logging
-from typing import Optional, Dict
+import threading
+from typing import Awaitable, Dict, List, Optional
+
+import aiohttp
+
 from .crawler import AsyncCrawler
 
 logger = logging.getLogger(__name__)
 
+# 连接池参数：DNS 缓存时间、空闲连接保活时间（秒）
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 30
+
 
 class SyncCrawlerWrapper:
     """
     同步爬虫包装器 - 包装AsyncCrawler以提供同步接口
     兼容原有的SmartCrawler.parse()接口
     """
-    
+
     def __init__(self, **kwargs):
         """
         初始化同步包装器
-        
+
         Args:
             **kwargs: 传递给AsyncCrawler的参数
         """
         self.async_crawler = AsyncCrawler(**kwargs)
-        self._loop = None
-    
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._start_lock = threading.Lock()
+
+    # --- 常驻事件循环 ---
+
+    def _ensure_loop(self):
+        """首次使用时启动后台事件循环线程，并在其中创建共享会话"""
+        if self._loop is not None:
+            return
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="crawler-loop", daemon=True)
+            thread.start()
+            self._session = asyncio.run_coroutine_threadsafe(self._create_session(), loop).result()
+            self._thread = thread
+            self._loop = loop
+            logger.debug("Crawler event loop started")
+
+    async def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            ssl=False if not self.async_crawler.verify_ssl else None,
+            limit=max(10, 2 * self.async_crawler.concurrency),
+            ttl_dns_cache=DNS_CACHE_TTL,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+        )
+        return aiohttp.ClientSession(connector=connector)
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """共享会话（只能在 submit() 提交的协程中使用）"""
+        self._ensure_loop()
+        return self._session
+
+    def submit(self, coro: Awaitable) -> concurrent.futures.Future:
+        """把协程提交到常驻事件循环，返回 concurrent.futures.Future"""
+        self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("Cannot block on the crawler loop from inside the crawler loop")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    # --- 同步接口 ---
+
     def parse(self, url: str) -> Optional[Dict]:
         """
         同步接口 - 兼容SmartCrawler.parse()
-        
+
         Args:
             url: 要爬取的URL
-            
+
         Returns:
             爬取结果字典，格式：{"url": str, "texts": List[str], "images": List[str], "links": List[str]}
             如果失败则返回None
         """
         logger.debug(f"SyncCrawlerWrapper.parse() called for: {url}")
+        future = None
         try:
-            # 检查是否在已有事件循环的上下文中
-            try:
-                loop = asyncio.get_running_loop()
-                logger.debug(f"Running in existing event loop context, using thread pool")
-                # 如果有运行中的循环，在新线程中运行
-                import concurrent.futures
-                
-                def run_in_new_loop():
-                    """在新的事件循环中运行（在新线程中）"""
-                    logger.debug(f"Creating new event loop in thread")
-                    new_loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(new_loop)
-                    try:
-                        logger.debug(f"Running async crawler for: {url}")
-                        results = new_loop.run_until_complete(self.async_crawler.run([url]))
-                        logger.debug(f"Async crawler completed, got {len(results) if results else 0} results")
-                        return results
-                    finally:
-                        logger.debug(f"Closing event loop")
-                        new_loop.close()
-                
-                with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-                    future = executor.submit(run_in_new_loop)
-                    results = future.result(timeout=120)  # 120秒超时
-                    return results[0] if results else None
-                    
-            except RuntimeError:
-                # 没有运行中的循环，直接运行
-                logger.debug(f"No running event loop, using asyncio.run()")
-                results = asyncio.run(self.async_crawler.run([url]))
-                return results[0] if results else None
-                
+            future = self.submit(self.async_crawler.run([url], session=self.session))
+            results = future.result(timeout=120)  # 120秒超时
+            return results[0] if results else None
+        except concurrent.futures.TimeoutError:
+            # 取消循环中的协程，否则超时后它仍占着连接和并发名额
+            future.cancel()
+            logger.error(f"Timeout in parse({url})")
+            return None
         except Exception as e:
             logger.error(f"Error in parse({url}): {e}")
             import traceback
             traceback.print_exc()
             return None
-    
+
+    def parse_many(self, urls: List[str], timeout: Optional[float] = None) -> List[Optional[Dict]]:
+        """
+        批量同步接口：所有 URL 在常驻循环中并发抓取（受爬虫 concurrency 和域名延迟约束）
+
+        Returns:
+            与 urls 一一对应的结果列表，失败的位置为 None
+        """
+        if not urls:
+            return []
+        future = None
+        try:
+            future = self.submit(self._parse_many(list(urls)))
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            logger.error(f"Timeout in parse_many({len(urls)} urls)")
+            return [None] * len(urls)
+        except Exception as e:
+            logger.error(f"Error in parse_many({len(urls)} urls): {e}")
+            return [None] * len(urls)
+
+    async def _parse_many(self, urls: List[str]) -> List[Optional[Dict]]:
+        results = await asyncio.gather(
+            *(self.async_crawler.process_url(self._session, url) for url in urls),
+            return_exceptions=True
+        )
+        out = []
+        for url, result in zip(urls, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error processing {url}: {result}")
+                result = None
+            out.append(result)
+        return out
+
+    def close(self):
+        """关闭共享会话并停止后台事件循环"""
+        loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        try:
+            if self._session is not None:
+                asyncio.run_coroutine_threadsafe(self._session.close(), loop).result(timeout=5)
+        except Exception:
+            pass
+        self._session = None
+        loop.call_soon_threadsafe(loop.stop)
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._thread = None
+
     def __getattr__(self, name):
         """代理其他方法到异步爬虫"""
         return getattr(self.async_crawler, name)
-    
+
     def __del__(self):
         """清理资源"""
         try:
+            self.close()
             # 尝试关闭异步爬虫
             if hasattr(self.async_crawler, 'executor'):
                 self.async_crawler.executor.shutdown(wait=False)
@@ -7,7 +7,8 @@ import io
 import uuid
 from typing import List, Dict, Optional, Callable
 from qdrant_client.http import models
-from system_manager import SystemManager, SPACE_X, SPACE_R
+from system_manager import SystemManager, SPACE_X, SPACE_R, NOVELTY_THRESHOLD
+from search_cache import invalidate_search_results
 import asyncio
 
 class CSVImporter:
@@ -162,119 +163,139 @@ class CSVImporter:
             'skipped': 0  # 数据库已存在而跳过的数量
         }
         
-        batch_points_x = []
-        batch_points_r = []
-        
-        for idx, row in enumerate(csv_rows):
-            try:
-                # 准备数据
-                row_data = self.prepare_row_data(row, default_url_prefix)
-                if not row_data:
-                    stats['failed'] += 1
-                    continue
-                
-                text = row_data['text']
-                url = row_data['url']
-                
-                # 检查数据库（如果启用）
-                if check_db_first:
-                    if self.mgr.check_url_exists(url, SPACE_X):
-                        stats['skipped'] = stats.get('skipped', 0) + 1
-                        stats['processed'] += 1
-                        if progress_callback:
-                            progress_callback(
-                                stats['processed'], 
-                                stats['total'], 
-                                f"跳过（已存在）: {url[:50]}..."
-                            )
-                        continue
-                
-                # 生成向量
+        # 每 batch_size 行为一块：先逐行准备、整块一次查重，再一次批量编码，最后一次批量写入
+        for chunk_start in range(0, len(csv_rows), batch_size):
+            prepared = []
+            for idx in range(chunk_start, min(chunk_start + batch_size, len(csv_rows))):
                 try:
-                    vec = self.mgr.get_text_embedding(text)
-                    if not vec:
+                    # 准备数据
+                    row_data = self.prepare_row_data(csv_rows[idx], default_url_prefix)
+                    if not row_data:
                         stats['failed'] += 1
                         continue
+                    prepared.append((idx, row_data))
                 except Exception as e:
-                    print(f"   ❌ Error generating embedding for row {idx}: {e}")
+                    print(f"❌ Error processing row {idx}: {e}")
                     stats['failed'] += 1
+
+            # 检查数据库（如果启用）：整块一次批量查询
+            existing = {}
+            if check_db_first and prepared:
+                existing = self.mgr.batch_check_urls([row_data['url'] for _, row_data in prepared], SPACE_X)
+
+            pending = []
+            for idx, row_data in prepared:
+                url = row_data['url']
+                if existing.get(url):
+                    stats['skipped'] = stats.get('skipped', 0) + 1
+                    stats['processed'] += 1
+                    if progress_callback:
+                        progress_callback(
+                            stats['processed'], 
+                            stats['total'], 
+                            f"跳过（已存在）: {url[:50]}..."
+                        )
                     continue
-                
-                # 构造payload
-                payload = {
-                    "url": url,
-                    "type": "text",
-                    "content": text,
-                    "full_text": text,
-                    "content_preview": text[:100],
-                    "pr_score": 0.0,
-                    "is_summarized": False,
-                    "source": "csv_import"
-                }
-                
-                # 添加标题和分类（如果有）
-                if row_data.get('title'):
-                    payload['title'] = row_data['title']
-                if row_data.get('category'):
-                    payload['category'] = row_data['category']
-                
-                pt_id = str(uuid.uuid4())
-                
-                # 检查是否需要晋升到R空间（独特性检测）
-                should_promote = False
-                if promote_novel:
-                    try:
-                        is_novel, dist = self.mgr._check_novelty(vec)
-                        if is_novel:
-                            should_promote = True
-                            stats['promoted'] += 1
-                    except Exception as e:
-                        print(f"   ⚠️ Novelty check failed: {e}, skipping promotion")
-                
-                # 添加到Space X
-                batch_points_x.append(
-                    models.PointStruct(
-                        id=pt_id,
-                        vector={"clip": vec},
-                        payload=payload
-                    )
-                )
-                
-                # 如果需要晋升，添加到Space R
-                if should_promote:
-                    batch_points_r.append(
+                pending.append((idx, row_data))
+
+            if not pending:
+                continue
+
+            # 生成向量（整块一次批量编码）
+            try:
+                vectors = self.mgr.embed_texts([row_data['text'] for _, row_data in pending])
+            except Exception as e:
+                print(f"   ❌ Error generating embeddings for rows {pending[0][0]}-{pending[-1][0]}: {e}")
+                stats['failed'] += len(pending)
+                continue
+
+            # 整块一次矩阵乘算出与现有锚点的相似度；可能独特的再逐条复查（同块内先晋升的也算锚点）
+            maybe_novel = None
+            if promote_novel:
+                try:
+                    maybe_novel = (1.0 - self.mgr.check_novelty_many(vectors)) > NOVELTY_THRESHOLD
+                except Exception as e:
+                    print(f"   ⚠️ Novelty check failed: {e}, skipping promotion")
+
+            batch_points_x = []
+            batch_points_r = []
+            for k, (idx, row_data) in enumerate(pending):
+                try:
+                    text = row_data['text']
+                    url = row_data['url']
+                    vec = vectors[k].tolist()
+
+                    # 构造payload
+                    payload = {
+                        "url": url,
+                        "type": "text",
+                        "content": text,
+                        "full_text": text,
+                        "content_preview": text[:100],
+                        "pr_score": 0.0,
+                        "is_summarized": False,
+                        "source": "csv_import"
+                    }
+                    
+                    # 添加标题和分类（如果有）
+                    if row_data.get('title'):
+                        payload['title'] = row_data['title']
+                    if row_data.get('category'):
+                        payload['category'] = row_data['category']
+                    
+                    pt_id = str(uuid.uuid4())
+                    
+                    # 检查是否需要晋升到R空间（独特性检测）
+                    should_promote = False
+                    if maybe_novel is not None and maybe_novel[k]:
+                        try:
+                            is_novel, dist = self.mgr._check_novelty(vec)
+                            if is_novel:
+                                should_promote = True
+                                stats['promoted'] += 1
+                        except Exception as e:
+                            print(f"   ⚠️ Novelty check failed: {e}, skipping promotion")
+                    
+                    # 添加到Space X
+                    batch_points_x.append(
                         models.PointStruct(
                             id=pt_id,
                             vector={"clip": vec},
                             payload=payload
                         )
                     )
-                
-                # 批量插入
-                if len(batch_points_x) >= batch_size:
-                    self._flush_batches(batch_points_x, batch_points_r)
-                    batch_points_x.clear()
-                    batch_points_r.clear()
-                
-                stats['success'] += 1
-                stats['processed'] += 1
-                
-                # 进度回调
-                if progress_callback:
-                    progress_callback(
-                        stats['processed'], 
-                        stats['total'], 
-                        f"处理中: {url[:50]}..."
-                    )
                     
-            except Exception as e:
-                print(f"❌ Error processing row {idx}: {e}")
-                stats['failed'] += 1
-                continue
-        
-        # 处理剩余的批次
-        if batch_points_x:
-            self._flush_batches(batch_points_x, batch_points_r)
+                    # 如果需要晋升，添加到Space R
+                    # (立即加入锚点矩阵，同一批次后面的重复内容不会再被判为独特)
+                    if should_promote:
+                        self.mgr.anchors.add([pt_id], [vec])
+                        batch_points_r.append(
+                            models.PointStruct(
+                                id=pt_id,
+                                vector={"clip": vec},
+                                payload=payload
+                            )
+                        )
+                    
+                    stats['success'] += 1
+                    stats['processed'] += 1
+                    
+                    # 进度回调
+                    if progress_callback:
+                        progress_callback(
+                            stats['processed'], 
+                            stats['total'], 
+                            f"处理中: {url[:50]}..."
+                        )
+                        
+                except Exception as e:
+                    print(f"❌ Error processing row {idx}: {e}")
+                    stats['failed'] += 1
+                    continue
+
+            # 批量插入
+            if batch_points_x:
+                self._flush_batches(batch_points_x, batch_points_r)
         
         return stats
     
@@ -285,6 +306,8 @@ class CSVImporter:
                 collection_name=SPACE_X,
                 points=batch_x
             )
+            self.mgr.url_index.add(SPACE_X, [p.payload.get('url') for p in batch_x])
+            invalidate_search_results()
         
         if batch_r:
             self.client.upsert(
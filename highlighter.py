@@ -0,0 +1,103 @@
+"""
+摘要高亮引擎 - 每个查询只编译一次关键词正则，供该请求的所有结果复用
+
+一次扫描找出全部关键词位置并选出关键词最密集的窗口，
+再用同一个正则一次替换完成高亮标记。
+"""
+import re
+from functools import lru_cache
+from typing import List
+
+HIGHLIGHT_OPEN = "[[HIGHLIGHT]]"
+HIGHLIGHT_CLOSE = "[[/HIGHLIGHT]]"
+
+# 高亮时忽略的常见停用词
+STOP_WORDS = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were'}
+
+
+def extract_highlight_keywords(query: str) -> List[str]:
+    """从查询中提取需要高亮的关键词（去除停用词和过短的词）"""
+    query_lower = query.lower()
+    keywords = [word.strip() for word in re.split(r'[\s,\.;:]+', query_lower)
+                if word.strip() and word.strip() not in STOP_WORDS and len(word.strip()) > 2]
+    return keywords if keywords else [query_lower]
+
+
+class SnippetHighlighter:
+    """
+    针对单个查询预编译的高亮器
+
+    所有关键词合并成一个不区分大小写的正则 alternation（长词优先），
+    同一个查询的所有结果共用这一个编译后的正则。
+    """
+
+    def __init__(self, query: str):
+        self.query = query
+        self.keywords = extract_highlight_keywords(query)
+        # 去重并按长度降序，保证较长的关键词优先匹配
+        alternatives = sorted({k for k in self.keywords if k}, key=len, reverse=True)
+        self.pattern = (
+            re.compile("|".join(re.escape(k) for k in alternatives), re.IGNORECASE)
+            if alternatives else None
+        )
+
+    def _densest_window(self, spans, width: int):
+        """
+        双指针扫描：找出宽度不超过 width 的窗口中包含最多关键词的一段
+
+        Returns:
+            (窗口内第一个匹配的起点, 窗口内最后一个匹配的终点)
+        """
+        best_count = 0
+        best = spans[0]
+        j = 0
+        for i in range(len(spans)):
+            window_start = spans[i][0]
+            if j < i:
+                j = i
+            while j + 1 < len(spans) and spans[j + 1][1] - window_start <= width:
+                j += 1
+            if j - i + 1 > best_count:
+                best_count = j - i + 1
+                best = (window_start, spans[j][1])
+        return best
+
+    def snippet(self, text: str, snippet_length: int = 200) -> str:
+        """
+        生成带高亮标记的摘要片段
+
+        Returns:
+            格式：...前文 [[HIGHLIGHT]]关键词[[/HIGHLIGHT]] 后文...
+        """
+        if not text:
+            return ""
+        if self.pattern is None:
+            return text[:snippet_length]
+
+        # 一次扫描拿到所有关键词位置
+        spans = [m.span() for m in self.pattern.finditer(text)]
+        if not spans:
+            # 如果没找到关键词，返回文本开头
+            return text[:snippet_length]
+
+        cluster_start, cluster_end = self._densest_window(spans, snippet_length)
+
+        # 向前留出半个窗口的上下文，向后至少覆盖一个窗口并多留四分之一
+        snippet_start = max(0, cluster_start - snippet_length // 2)
+        snippet_end = min(len(text), max(cluster_end, cluster_start + snippet_length) + snippet_length // 4)
+
+        prefix = "..." if snippet_start > 0 else ""
+        suffix = "..." if snippet_end < len(text) else ""
+
+        # 一次替换完成所有关键词的高亮
+        highlighted = self.pattern.sub(
+            lambda m: f"{HIGHLIGHT_OPEN}{m.group()}{HIGHLIGHT_CLOSE}",
+            text[snippet_start:snippet_end]
+        )
+        return prefix + highlighted + suffix
+
+
+@lru_cache(maxsize=256)
+def get_highlighter(query: str) -> SnippetHighlighter:
+    """按查询缓存编译好的高亮器，热门查询无需重复编译正则"""
+    return SnippetHighlighter(query)
@@ -1,10 +1,9 @@
 import pickle
-import torch
 import numpy as np
 import requests
 import uuid
-from transformers import CLIPProcessor, CLIPModel
-from PIL import Image
+from clip_encoder import get_encoder
+from space_projection import AnchorIndex, project_scores_topk
 
 # ================= 配置区 =================
 import os
@@ -20,10 +19,8 @@ QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 COLLECTION_NAME = "tum_data"
 # =========================================
 
-# 1. 加载资源 (模型 + 锚点)
+# 1. 加载资源 (锚点；CLIP 模型由 clip_encoder 在首次编码时加载)
 print("⚙️Initializing Ingestion Pipeline...")
-clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
 
 # 加载“元老院”数据
 try:
@@ -36,59 +33,46 @@ except FileNotFoundError:
 
 
 # --- 核心算法：基于投影的实时打分 ---
+# 只对最相似的 Top 5 个锚点求和
+ANCHOR_TOP_K = 5
+# 锚点向量和 PR 值打包成矩阵，内存 top-k 索引在首次打分时建立
+ANCHOR_VECTORS = np.asarray([anchor['vector'] for anchor in ANCHORS], dtype=np.float32)
+ANCHOR_SCORES = np.asarray([anchor['pr_score'] for anchor in ANCHORS], dtype=np.float64)
+_anchor_index = None
+
+
+def get_anchor_index():
+    global _anchor_index
+    if _anchor_index is None:
+        _anchor_index = AnchorIndex(ANCHOR_VECTORS)
+    return _anchor_index
+
+
 def calculate_projected_score(target_vector):
     """
-    计算公式: Score(x) = Sum( Sim(x, anchor_i) * PR(anchor_i) )
+    计算公式: Score(x) = Sum( Sim(x, anchor_i) * PR(anchor_i) )，只对 Top 5 相似且正相关的锚点求和
     """
-    scores = []
-    # 1. 计算与所有锚点的相似度
-    for anchor in ANCHORS:
-        # Cosine Similarity
-        sim = np.dot(target_vector, anchor['vector'])
-        if sim > 0:  # 只考虑正相关
-            scores.append({
-                "sim": sim,
-                "anchor_pr": anchor['pr_score']
-            })
-
-    # 2. 排序，取 Top 5 相似的锚点
-    scores.sort(key=lambda x: x['sim'], reverse=True)
-    top_k = scores[:5]
-
-    # 3. 加权求和
-    final_score = 0.0
-    for item in top_k:
-        final_score += item['sim'] * item['anchor_pr']
+    if len(ANCHORS) == 0:
+        return 0.0
+    query = np.asarray(target_vector, dtype=np.float32).reshape(1, -1)
+    score = project_scores_topk(query, get_anchor_index(), ANCHOR_SCORES, ANCHOR_TOP_K)[0]
 
     # 转换为 Python float
-    return float(final_score)
+    return float(score)
 
 
 # --- 向量化工具 ---
 def get_clip_embedding(text=None, image_path=None):
-    inputs = None
+    encoder = get_encoder()
     if text:
-        # 加入 truncation 防止过长报错
-        inputs = clip_processor(
-            text=[text],
-            return_tensors="pt",
-            padding=True,
-            truncation=True,
-            max_length=77
-        )
-        feat = clip_model.get_text_features(**inputs)
+        # encoder 内部已做 truncation 防止过长报错
+        return encoder.encode_text(text)
     elif image_path:
         try:
-            image = Image.open(image_path).convert("RGB")
-            inputs = clip_processor(images=image, return_tensors="pt")
-            feat = clip_model.get_image_features(**inputs)
+            return encoder.encode_image(image_path)
         except Exception as e:
             print(f"❌🌌Image read failed: {e}")
             return None
-
-    if inputs is not None:
-        feat = feat / feat.norm(p=2, dim=-1, keepdim=True)
-        return feat[0].detach().numpy()
     return None
 
 
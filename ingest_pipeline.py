@@ -0,0 +1,444 @@
+"""
+流水线式递归入库 - 爬取、解析、摘要、向量化、写库五个阶段重叠执行
+
+    frontier ─▶ fetch (async) ─▶ parse (线程池) ─▶ summarize (限并发) ─▶ embed (批量) ─▶ upsert (批量)
+
+- 阶段之间是有界队列：下游慢时上游在 put 上阻塞（背压），内存占用有上限
+- 解析出的链接立即回灌 frontier（按主机分队列、按评分出队），不等整层结束；抓取吞吐只受礼貌延迟约束，
+  而不是所有阶段延迟之和
+- max_pages 按入库数计：已入库 + 处理中的页面达到上限时暂停出队，处理中的页面失败 / 无内容时释放名额
+- 每个阶段记录处理量、失败数、忙碌时间、被下游阻塞的时间和队列峰值，见 IngestPipeline.metrics()
+"""
+import asyncio
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+from qdrant_client.http import models
+
+from crawler_v2.frontier import Frontier, Scorer, score_link
+from search_cache import invalidate_search_results
+
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "64"))
+PIPELINE_PARSE_WORKERS = int(os.getenv("PIPELINE_PARSE_WORKERS", "4"))
+PIPELINE_SUMMARY_CONCURRENCY = int(os.getenv("PIPELINE_SUMMARY_CONCURRENCY", "4"))
+PIPELINE_EMBED_BATCH = int(os.getenv("PIPELINE_EMBED_BATCH", "32"))
+PIPELINE_UPSERT_BATCH = int(os.getenv("PIPELINE_UPSERT_BATCH", "50"))
+# 批量阶段凑批时最多等待的秒数
+PIPELINE_BATCH_WAIT = float(os.getenv("PIPELINE_BATCH_WAIT", "0.5"))
+
+SUMMARY_MIN_LENGTH = 300  # 超过该长度的正文才调用摘要 API
+
+
+class StageMetrics:
+    """单个阶段的计数器"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.failed = 0      # 在该阶段失败而被放弃的页面数
+        self.busy = 0.0      # 处理耗时（秒）
+        self.blocked = 0.0   # 等待下游队列腾出空间的时间（背压）
+        self.queue_peak = 0  # 该阶段输出队列的最大长度
+
+    def as_dict(self) -> Dict:
+        return {
+            "items": self.items,
+            "failed": self.failed,
+            "busy_s": round(self.busy, 3),
+            "blocked_s": round(self.blocked, 3),
+            "queue_peak": self.queue_peak,
+        }
+
+
+class IngestPipeline:
+    """
+    一次递归爬取入库任务
+
+    Args:
+        mgr: SystemManager（用到 check_url_exists / get_url_from_db / summarize_text_api /
+             embed_texts / client）
+        crawler: crawler_v2.AsyncCrawler
+        collection_name: 写入的集合（Space X）
+        scorer: frontier 的链接评分函数（None 表示 BFS 顺序），见 crawler_v2.frontier
+        frontier: 外部传入的 frontier（如可恢复的 DurableFrontier）；None 时新建内存 Frontier
+    """
+
+    def __init__(self, mgr, crawler, collection_name: str, max_depth: int = 8, max_pages: Optional[int] = None,
+                 callback: Optional[Callable[[int, str], None]] = None, check_db_first: bool = True,
+                 fetch_workers: Optional[int] = None, parse_workers: int = PIPELINE_PARSE_WORKERS,
+                 summary_concurrency: int = PIPELINE_SUMMARY_CONCURRENCY, embed_batch: int = PIPELINE_EMBED_BATCH,
+                 upsert_batch: int = PIPELINE_UPSERT_BATCH, queue_size: int = PIPELINE_QUEUE_SIZE,
+                 batch_wait: float = PIPELINE_BATCH_WAIT, scorer: Optional[Scorer] = score_link,
+                 frontier=None):
+        self.mgr = mgr
+        self.crawler = crawler
+        self.collection_name = collection_name
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.callback = callback
+        self.check_db_first = check_db_first
+        self.fetch_workers = fetch_workers or getattr(crawler, "concurrency", 5)
+        self.parse_workers = parse_workers
+        self.summary_concurrency = summary_concurrency
+        self.embed_batch = embed_batch
+        self.upsert_batch = upsert_batch
+        self.queue_size = queue_size
+        self.batch_wait = batch_wait
+
+        self.stages = {name: StageMetrics(name) for name in ("fetch", "parse", "summarize", "embed", "upsert")}
+        self._frontier = frontier if frontier is not None else Frontier(scorer=scorer)
+        # 已入库 + 跳过（数据库已存在）的页面数；恢复的任务从已入库的页面数续接，排队中的 URL 计入待处理数
+        self.count = getattr(self._frontier, "stored_count", 0)
+        self._pending = len(self._frontier)
+        self._in_progress = 0  # 已出队、尚未入库或放弃的页面数（计入 max_pages 名额）
+        self._start_domain = None
+
+    # --- 公共接口 ---
+
+    def run_sync(self, start_url: str) -> int:
+        """同步入口（在没有事件循环的线程中调用，如 web_server 的后台爬取线程）"""
+        return asyncio.run(self.run(start_url))
+
+    def metrics(self) -> Dict[str, Dict]:
+        return {name: stage.as_dict() for name, stage in self.stages.items()}
+
+    async def run(self, start_url: str, session: Optional[aiohttp.ClientSession] = None) -> int:
+        """执行爬取入库，返回处理的页面数"""
+        self._start_domain = urlparse(start_url).netloc
+        self._frontier_ready = asyncio.Event()  # frontier 有新 URL 时唤醒抓取协程
+        self._frontier_ready.set()
+        self._parse_q = asyncio.Queue(self.queue_size)
+        self._summary_q = asyncio.Queue(self.queue_size)
+        self._embed_q = asyncio.Queue(self.queue_size)
+        self._upsert_q = asyncio.Queue(self.queue_size)
+        self._crawl_done = asyncio.Event()
+        # 摘要和写库都是阻塞调用，各用独立线程池，互不挤占
+        self._summary_executor = ThreadPoolExecutor(self.summary_concurrency, thread_name_prefix="pipeline-summary")
+        self._io_executor = ThreadPoolExecutor(4, thread_name_prefix="pipeline-io")
+
+        self._notify(0, start_url)
+        self._admit(start_url, 0)
+        if self._page_limit_reached():
+            self._crawl_done.set()  # 恢复的任务已入库够数
+
+        owns_session = session is None
+        if owns_session:
+            connector = aiohttp.TCPConnector(ssl=False if not getattr(self.crawler, "verify_ssl", True) else None)
+            session = aiohttp.ClientSession(connector=connector)
+        start_time = time.time()
+        try:
+            crawl_tasks = [asyncio.create_task(self._fetch_worker(session)) for _ in range(self.fetch_workers)]
+            crawl_tasks += [asyncio.create_task(self._parse_worker()) for _ in range(self.parse_workers)]
+            summarizers = [asyncio.create_task(self._summary_worker()) for _ in range(self.summary_concurrency)]
+            embedder = asyncio.create_task(self._embed_worker())
+            upserter = asyncio.create_task(self._upsert_worker())
+
+            # 1. 所有 URL 都走完抓取和解析（子链接已回灌），或入库数达到 max_pages 后，爬取侧结束
+            if self._pending:
+                await self._crawl_done.wait()
+            for task in crawl_tasks:
+                task.cancel()
+            await asyncio.gather(*crawl_tasks, return_exceptions=True)
+
+            # 2. 下游按顺序排空：哨兵 None 逐级传递
+            for _ in summarizers:
+                await self._summary_q.put(None)
+            await asyncio.gather(*summarizers)
+            await self._embed_q.put(None)
+            await embedder
+            await self._upsert_q.put(None)
+            await upserter
+        finally:
+            if owns_session:
+                await session.close()
+            self._summary_executor.shutdown(wait=False)
+            self._io_executor.shutdown(wait=False)
+
+        print(f"✅ Pipeline crawl finished: {self.count} pages in {time.time() - start_time:.1f}s")
+        for name, stats in self.metrics().items():
+            print(f"   📊 {name:<9} items={stats['items']:<6} failed={stats['failed']:<4} busy={stats['busy_s']:.1f}s "
+                  f"blocked={stats['blocked_s']:.1f}s queue_peak={stats['queue_peak']}")
+        return self.count
+
+    # --- frontier ---
+
+    def _admit(self, url: str, depth: int):
+        """URL 进入 frontier（规范化去重；max_pages 在出队时按入库数限制，见 _next_url）"""
+        if self._frontier.add(url, depth) is None:
+            return
+        self._pending += 1
+        self._frontier_ready.set()
+
+    async def _next_url(self):
+        """从 frontier 取下一个 URL，为空（或 max_pages 名额已占满）时等待新链接回灌 / 名额释放"""
+        while True:
+            if not self._page_limit_reached():
+                item = self._frontier.pop()
+                if item is not None:
+                    self._in_progress += 1
+                    return item
+            self._frontier_ready.clear()
+            await self._frontier_ready.wait()
+
+    def _page_limit_reached(self) -> bool:
+        return bool(self.max_pages) and self.count + self._in_progress >= self.max_pages
+
+    def _settle(self, url: str, stored: bool):
+        """一个已出队的页面结束：入库（或数据库已存在）时计数，失败 / 无内容时只释放 max_pages 名额"""
+        self._in_progress -= 1
+        if stored:
+            self.count += 1
+            self._notify(self.count, url)
+            if self.max_pages and self.count >= self.max_pages:
+                self._crawl_done.set()
+        self._frontier_ready.set()
+
+    def _admit_links(self, links: List[str], depth: int):
+        """一页的站内链接一次批量入队（DurableFrontier 中是一个事务）"""
+        if depth >= self.max_depth:
+            return
+        links = [link for link in links if urlparse(link).netloc == self._start_domain]
+        added = self._frontier.add_many(links, depth + 1)
+        if added:
+            self._pending += added
+            self._frontier_ready.set()
+
+    def _url_done(self):
+        """一个 URL 的抓取 + 解析结束（子链接已入队）"""
+        self._pending -= 1
+        if self._pending == 0:
+            self._crawl_done.set()
+
+    async def _put(self, queue: asyncio.Queue, item, stage: StageMetrics):
+        start = time.perf_counter()
+        await queue.put(item)
+        stage.blocked += time.perf_counter() - start
+        stage.queue_peak = max(stage.queue_peak, queue.qsize())
+
+    def _notify(self, count: int, url: str):
+        if self.callback:
+            try:
+                self.callback(count, url)
+            except Exception as e:
+                print(f"   ⚠️  Error in callback: {e}")
+
+    # --- 各阶段 ---
+
+    async def _fetch_worker(self, session):
+        loop = asyncio.get_running_loop()
+        stage = self.stages["fetch"]
+        while True:
+            item = await self._next_url()
+            url, depth = item.url, item.depth
+            start = time.perf_counter()
+            handed_off = settled = False
+            try:
+                if self.check_db_first and await self._skip_existing(loop, url, depth):
+                    settled = True
+                    continue
+                robots = getattr(self.crawler, "robots_checker", None)
+                if robots and not await robots.can_fetch(url):
+                    print(f"   🚫 Blocked by robots.txt: {url}")
+                    continue
+                html = await self.crawler.fetch(session, url)
+                if html:
+                    stage.busy += time.perf_counter() - start
+                    stage.items += 1
+                    await self._put(self._parse_q, (url, depth, html), stage)
+                    handed_off = True
+                else:
+                    print(f"   ⚠️  No data retrieved from: {url}")
+            except Exception as e:
+                stage.failed += 1
+                print(f"   ❌ Crawler error for {url}: {e}")
+            finally:
+                self._frontier.done(item)
+                if not handed_off:
+                    if not settled:
+                        self._settle(url, stored=False)
+                    self._url_done()
+
+    async def _skip_existing(self, loop, url: str, depth: int) -> bool:
+        """数据库中已存在的 URL：计数并沿用存储的链接；没有存储链接时仍需重新抓取（入库后再计数）"""
+        try:
+            exists = await loop.run_in_executor(self._io_executor, self.mgr.check_url_exists, url, self.collection_name)
+        except Exception as e:
+            print(f"   ⚠️  Database check failed: {e}, continuing without check...")
+            return False
+        if not exists:
+            return False
+
+        print(f"   ⏭️  跳过（数据库中已存在）: {url}")
+        self._frontier.complete([url])
+        if depth < self.max_depth:
+            existing = await loop.run_in_executor(self._io_executor, self.mgr.get_url_from_db, url, self.collection_name)
+            stored_links = (existing or {}).get("payload", {}).get("links")
+            if not stored_links:
+                return False
+            self._admit_links(stored_links, depth)
+        self._settle(url, stored=True)
+        return True
+
+    async def _parse_worker(self):
+        loop = asyncio.get_running_loop()
+        stage = self.stages["parse"]
+        while True:
+            url, depth, html = await self._parse_q.get()
+            start = time.perf_counter()
+            handed_off = False
+            try:
+                data = await loop.run_in_executor(self.crawler.executor, self.crawler._parse_sync, html, url)
+                if not data:
+                    self._frontier.complete([url])
+                    continue
+                self._admit_links(data.get("links", []), depth)
+                stage.busy += time.perf_counter() - start
+                stage.items += 1
+                if data.get("texts"):
+                    await self._put(self._summary_q, (url, data), stage)
+                    handed_off = True
+                else:
+                    self._frontier.complete([url])
+                    print(f"   ⚠️  No text content found in: {url}")
+            except Exception as e:
+                stage.failed += 1
+                print(f"   ❌ Parse error for {url}: {e}")
+            finally:
+                if not handed_off:
+                    self._settle(url, stored=False)
+                self._url_done()
+
+    async def _summary_worker(self):
+        loop = asyncio.get_running_loop()
+        stage = self.stages["summarize"]
+        while True:
+            item = await self._summary_q.get()
+            if item is None:
+                return
+            url, data = item
+            start = time.perf_counter()
+            raw_content = "\n\n".join(data["texts"])
+            final_content, is_summarized = raw_content, False
+            if len(raw_content) > SUMMARY_MIN_LENGTH:
+                try:
+                    summary = await loop.run_in_executor(self._summary_executor, self.mgr.summarize_text_api, raw_content)
+                    if summary and summary != raw_content:
+                        # ONLY store the summary to keep it clean
+                        final_content, is_summarized = summary, True
+                except Exception as e:
+                    print(f"   ⚠️ API Summarization failed for {url}: {e}")
+            stage.busy += time.perf_counter() - start
+            stage.items += 1
+            await self._put(self._embed_q, {
+                "url": url,
+                "text": final_content,
+                "full_text": raw_content,
+                "is_summarized": is_summarized,
+                "links": data.get("links", []),
+            }, stage)
+
+    async def _collect(self, queue: asyncio.Queue, max_items: int):
+        """凑一批：至少等到一条，之后最多等 batch_wait 秒或凑满 max_items；返回 (batch, 是否收到哨兵)"""
+        first = await queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < max_items:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _embed_worker(self):
+        loop = asyncio.get_running_loop()
+        stage = self.stages["embed"]
+        while True:
+            docs, finished = await self._collect(self._embed_q, self.embed_batch)
+            if docs:
+                start = time.perf_counter()
+                try:
+                    vectors = await loop.run_in_executor(None, self.mgr.embed_texts, [d["text"] for d in docs])
+                    encoded = list(zip(docs, vectors))
+                except Exception as e:
+                    # 整批失败时逐页重试，一个坏页面不连累同批的其他页面
+                    print(f"   ⚠️  Embedding failed for {len(docs)} pages, retrying one by one: {e}")
+                    encoded = []
+                    for doc in docs:
+                        try:
+                            vectors = await loop.run_in_executor(None, self.mgr.embed_texts, [doc["text"]])
+                            encoded.append((doc, vectors[0]))
+                        except Exception as e:
+                            stage.failed += 1
+                            self._settle(doc["url"], stored=False)
+                            print(f"   ❌ Embedding failed for {doc['url']}: {e}")
+                stage.busy += time.perf_counter() - start
+                stage.items += len(encoded)
+                for doc, vec in encoded:
+                    await self._put(self._upsert_q, (doc, vec), stage)
+            if finished:
+                return
+
+    async def _upsert_worker(self):
+        loop = asyncio.get_running_loop()
+        stage = self.stages["upsert"]
+        while True:
+            batch, finished = await self._collect(self._upsert_q, self.upsert_batch)
+            if batch:
+                start = time.perf_counter()
+                points = [
+                    models.PointStruct(id=str(uuid.uuid4()), vector={"clip": vec.tolist()}, payload=self._payload(doc))
+                    for doc, vec in batch
+                ]
+                urls = [doc["url"] for doc, _ in batch]
+                try:
+                    await loop.run_in_executor(
+                        self._io_executor,
+                        lambda: self.mgr.client.upsert(collection_name=self.collection_name, points=points)
+                    )
+                except Exception as e:
+                    # 不调用 complete()：可恢复的 frontier 续爬时会重新处理这些页面
+                    stage.failed += len(batch)
+                    for url in urls:
+                        self._settle(url, stored=False)
+                    print(f"   ❌ Upsert failed for {len(batch)} pages: {e}")
+                else:
+                    invalidate_search_results()
+                    self._frontier.complete(urls)
+                    url_index = getattr(self.mgr, "url_index", None)
+                    if url_index is not None:
+                        url_index.add(self.collection_name, urls)
+                    stage.busy += time.perf_counter() - start
+                    stage.items += len(batch)
+                    for url in urls:
+                        self._settle(url, stored=True)
+            if finished:
+                return
+
+    @staticmethod
+    def _payload(doc: Dict) -> Dict:
+        """与 SystemManager.add_to_space_x 相同的 payload 结构"""
+        payload = {
+            "url": doc["url"],
+            "type": "text",
+            "content": doc["text"],
+            "full_text": doc["full_text"],
+            "content_preview": doc["text"][:100],
+            "pr_score": 0.0,
+            "is_summarized": doc["is_summarized"],
+        }
+        if doc["links"]:
+            payload["links"] = doc["links"][:50]  # 存储前50个链接
+        return payload
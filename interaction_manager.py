@@ -4,6 +4,8 @@ import time
 import random
 from collections import defaultdict
 
+import numpy as np
+
 class InteractionManager:
     def __init__(self, storage_path="interaction_data.json"):
         self.storage_path = storage_path
@@ -114,6 +116,43 @@ class InteractionManager:
         # 100 clicks -> ~5.6
         return 1.0 + (0.5 * clicks) # Linear for stronger effect in demo
 
+    def rank_tables(self, ids):
+        """
+        Export interaction data as dense, index-aligned arrays for the Rust rank engine.
+
+        IDs are mapped to their position in `ids` once here, so the engine's edge
+        loop only does integer lookups instead of hashing strings per candidate edge.
+
+        Returns:
+            (weights[float64], trans_src[int64], trans_dst[int64], trans_count[int64])
+            weights[k] is the interaction weight of ids[k]; transitions are COO
+            triples sorted by (src, dst), i.e. one contiguous target-sorted slice
+            per source. Nodes not in `ids` are ignored.
+        """
+        position = {node_id: k for k, node_id in enumerate(ids)}
+        weights = np.fromiter(
+            (self.get_interaction_weight(node_id) for node_id in ids),
+            dtype=np.float64, count=len(ids)
+        )
+
+        src, dst, counts = [], [], []
+        for source_id, targets in self.transitions.items():
+            k = position.get(source_id)
+            if k is None:
+                continue
+            for target_id, count in targets.items():
+                j = position.get(target_id)
+                if j is not None:
+                    src.append(k)
+                    dst.append(j)
+                    counts.append(count)
+
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        counts = np.asarray(counts, dtype=np.int64)
+        order = np.lexsort((dst, src))
+        return weights, src[order], dst[order], counts[order]
+
     def simulate_cold_start_data(self, items):
         """
         Generate plausible synthetic data for cold start.
@@ -0,0 +1,90 @@
+"""
+Space R 排名图快照 - 全局重算之间复用 kNN 图
+
+- 指纹：每个锚点 (id, 向量) 的 128 位 blake2b 摘要按位异或，与顺序无关，
+  单个锚点增删时只需再异或一次即可更新，无需重新哈希整个 Space R
+- 快照：IncrementalRankGraph.export_graph() 导出的 CSR 邻接表 + 上次的 PR 值，
+  以未压缩的 .npz 保存；指纹和建图参数一致时直接恢复，跳过 HNSW 建图和邻居搜索
+"""
+import hashlib
+import os
+from typing import Sequence
+
+import numpy as np
+
+RANK_GRAPH_SNAPSHOT = os.getenv("RANK_GRAPH_SNAPSHOT", "rank_graph_snapshot.npz")
+
+
+def point_digest(point_id, vector) -> int:
+    """单个锚点的 128 位摘要"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(point_id).encode("utf-8"))
+    h.update(b"\0")
+    h.update(np.asarray(vector, dtype=np.float32).tobytes())
+    return int.from_bytes(h.digest(), "big")
+
+
+def space_fingerprint(ids: Sequence, vectors) -> int:
+    """Space R 内容指纹（所有锚点摘要的异或）"""
+    fingerprint = 0
+    for point_id, vector in zip(ids, vectors):
+        fingerprint ^= point_digest(point_id, vector)
+    return fingerprint
+
+
+def save_snapshot(graph, fingerprint: int, params: Sequence[int], path: str = RANK_GRAPH_SNAPSHOT) -> bool:
+    """保存排名图快照；写入失败只打印警告"""
+    try:
+        ids, indptr, indices, distances, ranks = graph.export_graph()
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            fingerprint=np.array(f"{fingerprint:032x}"),
+            params=np.asarray(params, dtype=np.int64),
+            ids=np.asarray(ids, dtype=str),
+            indptr=indptr,
+            indices=indices,
+            distances=distances,
+            ranks=ranks,
+        )
+        # 先写临时文件再替换，避免中途崩溃留下半个快照
+        os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        print(f"⚠️ [Snapshot] Failed to save rank graph snapshot: {e}")
+        return False
+
+
+def load_snapshot(engine, fingerprint: int, params: Sequence[int], ids: Sequence[str], vectors,
+                  graph_kwargs: dict, path: str = RANK_GRAPH_SNAPSHOT):
+    """
+    指纹和建图参数都匹配时恢复排名图，否则返回 None
+
+    Args:
+        engine: visual_rank_engine 模块
+        ids / vectors: 当前 Space R 的锚点（顺序任意，按快照中的 id 顺序重排）
+        graph_kwargs: 传给 IncrementalRankGraph.from_graph 的迭代参数
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as snap:
+            if str(snap["fingerprint"]) != f"{fingerprint:032x}":
+                return None
+            if snap["params"].tolist() != list(params):
+                return None
+            snap_ids = snap["ids"].tolist()
+            position = {node_id: k for k, node_id in enumerate(ids)}
+            order = np.fromiter((position[node_id] for node_id in snap_ids), dtype=np.int64, count=len(snap_ids))
+            return engine.IncrementalRankGraph.from_graph(
+                snap_ids,
+                np.ascontiguousarray(np.asarray(vectors, dtype=np.float32)[order]),
+                snap["indptr"],
+                snap["indices"],
+                snap["distances"],
+                snap["ranks"],
+                **graph_kwargs,
+            )
+    except Exception as e:
+        print(f"⚠️ [Snapshot] Ignoring unreadable rank graph snapshot: {e}")
+        return None
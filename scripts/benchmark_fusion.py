@@ -0,0 +1,68 @@
+"""
+融合排序阶段的微基准：旧版逐条 Python 循环 vs. NumPy 向量化 + argpartition
+
+用法: python scripts/benchmark_fusion.py
+"""
+import sys
+import os
+import time
+
+import numpy as np
+
+# Add parent directory to path to import search_engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_engine import gauss_rank_norm, fuse_scores, top_k_indices
+
+
+def legacy_fusion(sims, prs, top_k, w_sim=0.7, w_pr=0.3):
+    """原 search() 中的实现：列表 + 逐条构建字典 + 全量排序"""
+    raw_sims = []
+    raw_prs = []
+    results = []
+    for i in range(len(sims)):
+        raw_sims.append(sims[i])
+        raw_prs.append(prs[i])
+        results.append({"id": i, "sim": sims[i], "pr": prs[i]})
+
+    norm_sims = gauss_rank_norm(raw_sims)
+    norm_prs = gauss_rank_norm(raw_prs)
+
+    final_ranked = []
+    for i, item in enumerate(results):
+        final_ranked.append({"id": item["id"], "score": w_sim * norm_sims[i] + w_pr * norm_prs[i]})
+    final_ranked.sort(key=lambda x: x["score"], reverse=True)
+    return [r["id"] for r in final_ranked[:top_k]]
+
+
+def vectorized_fusion(sims, prs, top_k, w_sim=0.7, w_pr=0.3):
+    scores = fuse_scores(sims, prs, w_sim=w_sim, w_pr=w_pr)
+    return top_k_indices(scores, top_k).tolist()
+
+
+def bench(fn, *args, repeat=50):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        out = fn(*args)
+    return (time.perf_counter() - start) / repeat * 1000, out
+
+
+def run_benchmark():
+    rng = np.random.default_rng(42)
+    top_k = 20
+    print(f"{'pool':>8} | {'legacy (ms)':>12} | {'vectorized (ms)':>16} | {'speedup':>8} | same top-k")
+    print("-" * 68)
+    for pool in [60, 300, 1000, 5000, 20000]:
+        sims = rng.random(pool)
+        prs = rng.random(pool)
+        # 旧实现的输入是 Python 列表
+        sims_list = sims.tolist()
+        prs_list = prs.tolist()
+
+        legacy_ms, legacy_ids = bench(legacy_fusion, sims_list, prs_list, top_k)
+        vec_ms, vec_ids = bench(vectorized_fusion, sims, prs, top_k)
+        print(f"{pool:>8} | {legacy_ms:>12.3f} | {vec_ms:>16.3f} | {legacy_ms / vec_ms:>7.1f}x | {legacy_ids == vec_ids}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,126 @@
+"""
+Rank 引擎输入格式的基准：字符串键字典 vs. 下标对齐的数组
+
+对比两条路径（默认 100k 个节点）：
+- legacy: Python 侧构造 {id: weight} / {src_id: {dst_id: count}}，
+  调用 calculate_hnsw_pagerank（字符串 ID）
+- indexed: InteractionManager.rank_tables() 导出 float64 权重 + 排序后的 COO 转移表，
+  调用 calculate_hnsw_pagerank_array（整数下标）
+
+另外单独测量边循环中的查表开销（纯 Python 模拟），即每条候选边
+interaction_weights[target_id] + transitions[source_id][target_id] 与 Vec 下标访问的差异。
+
+用法: python scripts/benchmark_rank_tables.py [num_nodes] [dim]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+import bisect
+
+import numpy as np
+
+# Add parent directory to path to import interaction_manager
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from interaction_manager import InteractionManager
+
+
+def build_interactions(ids, rng, clicked_fraction=0.3, transitions_per_source=3):
+    """随机交互数据：部分节点有点击，部分节点有若干条转移"""
+    mgr = InteractionManager(storage_path=os.path.join(tempfile.gettempdir(), "benchmark_rank_tables.json"))
+    mgr.interactions.clear()
+    mgr.transitions.clear()
+    n = len(ids)
+    for node_id in rng.sample(ids, int(n * clicked_fraction)):
+        mgr.interactions[node_id]["clicks"] = rng.randint(1, 50)
+    for node_id in rng.sample(ids, int(n * clicked_fraction)):
+        for _ in range(transitions_per_source):
+            mgr.transitions[node_id][ids[rng.randrange(n)]] += rng.randint(1, 10)
+    return mgr
+
+
+def legacy_tables(mgr, ids):
+    weights = {node_id: mgr.get_interaction_weight(node_id) for node_id in ids}
+    transitions = {src: dict(targets) for src, targets in mgr.transitions.items()}
+    return weights, transitions
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - start, out
+
+
+def simulate_edge_loop(ids, neighbors, weights, transitions, weight_vec, trans_src, trans_dst, trans_count):
+    """边循环查表开销：字符串哈希 vs. 整数下标 + 二分查找"""
+    start = time.perf_counter()
+    acc = 0.0
+    for i, row in enumerate(neighbors):
+        source_id = ids[i]
+        for j in row:
+            target_id = ids[j]
+            acc += weights.get(target_id, 1.0)
+            acc += transitions.get(source_id, {}).get(target_id, 0)
+    legacy = time.perf_counter() - start
+
+    indptr = np.searchsorted(trans_src, np.arange(len(ids) + 1)).tolist()
+    dst_list = trans_dst.tolist()
+    count_list = trans_count.tolist()
+    w = weight_vec.tolist()
+    start = time.perf_counter()
+    acc = 0.0
+    for i, row in enumerate(neighbors):
+        lo, hi = indptr[i], indptr[i + 1]
+        for j in row:
+            acc += w[j]
+            if lo < hi:
+                k = bisect.bisect_left(dst_list, j, lo, hi)
+                if k < hi and dst_list[k] == j:
+                    acc += count_list[k]
+    indexed = time.perf_counter() - start
+    return legacy, indexed
+
+
+def run_benchmark(num_nodes=100_000, dim=64, m_neighbors=5):
+    rng = random.Random(42)
+    ids = [f"node-{k}" for k in range(num_nodes)]
+    mgr = build_interactions(ids, rng)
+    print(f"{num_nodes} nodes, dim={dim}, {sum(len(t) for t in mgr.transitions.values())} transitions")
+
+    t_legacy_export, (weights, transitions) = timed(legacy_tables, mgr, ids)
+    t_indexed_export, tables = timed(mgr.rank_tables, ids)
+    print(f"Export   legacy dicts: {t_legacy_export:.3f}s | indexed arrays: {t_indexed_export:.3f}s")
+
+    neighbors = [[rng.randrange(num_nodes) for _ in range(m_neighbors)] for _ in range(num_nodes)]
+    legacy_loop, indexed_loop = simulate_edge_loop(ids, neighbors, weights, transitions, *tables)
+    print(f"Edge-loop lookups (Python model): legacy {legacy_loop:.3f}s | indexed {indexed_loop:.3f}s "
+          f"| {legacy_loop / indexed_loop:.1f}x")
+
+    try:
+        import visual_rank_engine
+    except ImportError:
+        visual_rank_engine = None
+    # 未编译时 import 到的是同名源码目录（命名空间包）
+    if not hasattr(visual_rank_engine, "calculate_hnsw_pagerank_array"):
+        print("visual_rank_engine not built (cd visual_rank_engine && maturin develop --release); skipping engine timings")
+        return
+
+    vectors = np.random.default_rng(42).standard_normal((num_nodes, dim)).astype(np.float32)
+    vector_lists = vectors.tolist()
+
+    start = time.perf_counter()
+    visual_rank_engine.calculate_hnsw_pagerank(ids, vector_lists, weights, transitions, m_neighbors, 0.85, 100)
+    legacy_engine = time.perf_counter() - start
+
+    start = time.perf_counter()
+    visual_rank_engine.calculate_hnsw_pagerank_array(vectors, *tables, m_neighbors, 0.85, 100)
+    indexed_engine = time.perf_counter() - start
+    print(f"Engine   legacy: {legacy_engine:.3f}s | indexed: {indexed_engine:.3f}s "
+          f"| {legacy_engine / indexed_engine:.1f}x")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    run_benchmark(*args)
@@ -0,0 +1,123 @@
+"""
+搜索缓存模块 - 带 TTL 的有界 LRU 缓存
+
+两层缓存：
+- query_vector_cache: 查询文本 -> 归一化后的 CLIP 向量
+- search_result_cache: (查询文本, top_k) -> 排序后的搜索结果
+
+Space X 发生变化（upsert / 删除 / 全局重算）时调用 invalidate_search_results()，
+向量缓存不受影响（同一查询的向量不会变）。每次清空都会递增缓存的 generation：
+在清空之前开始计算的结果，带着查询时的 generation 写入时会被丢弃，不会把旧结果写回缓存。
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+QUERY_VECTOR_CACHE_SIZE = int(os.getenv("QUERY_VECTOR_CACHE_SIZE", "2048"))
+QUERY_VECTOR_CACHE_TTL = float(os.getenv("QUERY_VECTOR_CACHE_TTL", "86400"))
+SEARCH_RESULT_CACHE_SIZE = int(os.getenv("SEARCH_RESULT_CACHE_SIZE", "512"))
+SEARCH_RESULT_CACHE_TTL = float(os.getenv("SEARCH_RESULT_CACHE_TTL", "300"))
+
+
+class LRUTTLCache:
+    """线程安全的 LRU 缓存，每个条目在 ttl 秒后过期"""
+
+    def __init__(self, maxsize: int, ttl: float, timer: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            maxsize: 最大条目数，超出时淘汰最久未使用的条目
+            ttl: 条目存活时间（秒）
+            timer: 时钟函数（测试时可替换）
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_puts = 0
+        self.generation = 0  # 每次 clear() 加一
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if self._timer() >= expires_at:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        """
+        写入条目；generation 为计算开始前读取的 self.generation，
+        期间缓存被清空过（generation 已变化）时不写入
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                self.stale_puts += 1
+                return
+            self._data[key] = (value, self._timer() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            if self._data:
+                self.invalidations += 1
+            self._data.clear()
+            self.generation += 1
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": f"{(self.hits / total if total else 0.0):.2%}",
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "stale_puts": self.stale_puts,
+        }
+
+
+def normalize_query(query_text: str) -> str:
+    """缓存键：忽略大小写和多余空白（CLIP 分词器本身也不区分大小写）"""
+    return " ".join(query_text.lower().split())
+
+
+# --- 进程级缓存实例 ---
+query_vector_cache = LRUTTLCache(QUERY_VECTOR_CACHE_SIZE, QUERY_VECTOR_CACHE_TTL)
+search_result_cache = LRUTTLCache(SEARCH_RESULT_CACHE_SIZE, SEARCH_RESULT_CACHE_TTL)
+
+
+def invalidate_search_results():
+    """Space X 内容或分数变化后调用，清空结果缓存"""
+    search_result_cache.clear()
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {
+        "query_vectors": query_vector_cache.stats(),
+        "search_results": search_result_cache.stats(),
+    }
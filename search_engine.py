@@ -1,5 +1,5 @@
+import asyncio
 import json
-import torch
 import numpy as np
 import random
 import sys
@@ -13,8 +13,11 @@ from qdrant_client import QdrantClient
 # Add root to path
 sys.path.append(os.getcwd())
 from consistency_engine import ConsistencyEngine
+from clip_encoder import get_encoder
+from search_cache import query_vector_cache, search_result_cache, normalize_query
+from highlighter import get_highlighter
+import async_store
 
-from transformers import CLIPProcessor, CLIPModel
 from scipy.stats import rankdata
 
 # ================= 配置区 =================
@@ -22,6 +25,19 @@ from scipy.stats import rankdata
 QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 SPACE_X = "tum_space_x"
+
+# 融合权重：final = W_SIM * rank(sim) + W_PR * rank(pr)
+W_SIM = float(os.getenv("SEARCH_W_SIM", "0.7"))
+W_PR = float(os.getenv("SEARCH_W_PR", "0.3"))
+# 从 Qdrant 取回的候选数；0 表示 top_k * EXPLORATION_DEPTH
+CANDIDATE_POOL_SIZE = int(os.getenv("SEARCH_CANDIDATE_POOL", "0"))
+# 排序后保留前 top_k * EXPLORATION_DEPTH 名，探索机制从中抽取低分结果
+EXPLORATION_DEPTH = 3
+# 两阶段取数：候选阶段只取排序和展示需要的轻量字段，
+# 生成摘要所需的正文只为最终返回的 top_k 单独获取
+CANDIDATE_PAYLOAD_FIELDS = ["url", "type", "pr_score", "content_preview"]
+SNIPPET_PAYLOAD_FIELDS = ["full_text", "content"]
+SNIPPET_LENGTH = 200
 # =========================================
 
 print("🛠️Initializing Search Engine...")
@@ -30,10 +46,7 @@ print("🛠️Initializing Search Engine...")
 print("🔗Connecting to Qdrant Database...")
 client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
 
-# 2. 加载本地 CLIP (CPU模式)
-print("⚙️Loading local CLIP model (CPU mode)...")
-clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+# 2. CLIP 编码器由 clip_encoder 统一管理（与 system_manager 共享，首次使用时加载）
 
 # 3. 初始化一致性引擎
 consistency_engine = ConsistencyEngine()
@@ -44,6 +57,44 @@ def gauss_rank_norm(scores):
     ranks = rankdata(scores, method='average')
     return (ranks / len(scores)).tolist()
 
+# --- 融合打分（整段在 NumPy 数组上完成） ---
+def fuse_scores(sims, prs, w_sim=W_SIM, w_pr=W_PR):
+    """
+    对相似度和 PageRank 分别做秩归一化后加权求和
+
+    Args:
+        sims: 候选的向量相似度数组
+        prs: 候选的 PageRank 分数数组（与 sims 对齐）
+
+    Returns:
+        np.ndarray: 每个候选的最终得分
+    """
+    sims = np.asarray(sims, dtype=np.float64)
+    prs = np.asarray(prs, dtype=np.float64)
+    n = sims.shape[0]
+    if n == 0:
+        return np.empty(0, dtype=np.float64)
+    return w_sim * (rankdata(sims, method='average') / n) + w_pr * (rankdata(prs, method='average') / n)
+
+def top_k_indices(scores, k):
+    """
+    用 argpartition 选出得分最高的 k 个下标，按得分降序返回（同分时保持原始顺序）
+    """
+    n = scores.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        # argpartition 在第 k 名有并列时任选其一；并列的只按原始位置取前面的，结果与稳定全排序一致
+        kth = -np.partition(-scores, k - 1)[k - 1]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[:k - above.size]
+        idx = np.concatenate((above, ties))
+    else:
+        idx = np.arange(n)
+    # lexsort 以最后一个键为主键：先按得分降序，再按原始位置升序
+    return idx[np.lexsort((idx, -scores[idx]))]
+
 # --- 辅助函数：生成高亮摘要 ---
 def generate_highlighted_snippet(text: str, query: str, snippet_length: int = 200) -> str:
     """
@@ -59,72 +110,7 @@ def generate_highlighted_snippet(text: str, query: str, snippet_length: int = 20
     """
     if not text or not query:
         return text[:snippet_length] if text else ""
-    
-    text_lower = text.lower()
-    query_lower = query.lower()
-    
-    # 提取查询中的关键词（去除常见停用词）
-    stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were'}
-    keywords = [word.strip() for word in re.split(r'[\s,\.;:]+', query_lower) 
-                if word.strip() and word.strip() not in stop_words and len(word.strip()) > 2]
-    
-    if not keywords:
-        keywords = [query_lower]
-    
-    # 查找所有关键词在文本中的位置
-    positions = []
-    for keyword in keywords:
-        # 使用正则表达式进行不区分大小写的搜索
-        pattern = re.escape(keyword)
-        for match in re.finditer(pattern, text_lower, re.IGNORECASE):
-            positions.append((match.start(), match.end(), keyword))
-    
-    # 按位置排序
-    positions.sort(key=lambda x: x[0])
-    
-    if not positions:
-        # 如果没找到关键词，返回文本开头
-        return text[:snippet_length]
-    
-    # 选择第一个匹配位置作为中心（或选择包含最多关键词的区域）
-    center_start, center_end, matched_keyword = positions[0]
-    
-    # 尝试找到一个包含更多关键词的窗口
-    # 计算一个可以包含多个关键词的窗口大小
-    best_start = center_start
-    best_end = min(len(text), center_start + snippet_length)
-    
-    # 尝试向后扩展，看看能否包含更多关键词
-    for pos_start, pos_end, _ in positions[1:]:
-        if pos_end <= center_start + snippet_length:
-            best_end = pos_end + snippet_length // 4  # 扩展一点以包含后面的关键词
-    
-    # 计算摘要的起始位置（向前扩展）
-    snippet_start = max(0, best_start - snippet_length // 2)
-    
-    # 计算摘要的结束位置（向后扩展）
-    snippet_end = min(len(text), best_end + snippet_length // 4)
-    
-    # 如果摘要从文本中间开始，添加省略号
-    prefix = "..." if snippet_start > 0 else ""
-    
-    # 如果摘要未到达文本末尾，添加省略号
-    suffix = "..." if snippet_end < len(text) else ""
-    
-    # 提取摘要片段
-    snippet = text[snippet_start:snippet_end]
-    
-    # 在摘要中高亮所有关键词
-    highlighted_snippet = snippet
-    for keyword in keywords:
-        # 使用正则表达式匹配关键词（不区分大小写）
-        pattern = re.compile(re.escape(keyword), re.IGNORECASE)
-        highlighted_snippet = pattern.sub(
-            lambda m: f"[[HIGHLIGHT]]{m.group()}[[/HIGHLIGHT]]",
-            highlighted_snippet
-        )
-    
-    return prefix + highlighted_snippet + suffix
+    return get_highlighter(query).snippet(text, snippet_length)
 
 def extract_keywords_from_query(query: str) -> list:
     """
@@ -136,129 +122,266 @@ def extract_keywords_from_query(query: str) -> list:
                 if word.strip() and word.strip() not in stop_words and len(word.strip()) > 2]
     return keywords if keywords else [query.lower()]
 
+# --- 查询向量（带缓存） ---
+def get_query_vector(query_text):
+    """查询文本 -> 归一化 CLIP 向量，命中缓存时跳过编码"""
+    key = normalize_query(query_text)
+    query_vector = query_vector_cache.get(key)
+    if query_vector is None:
+        query_vector = get_encoder().encode_text(query_text)
+        query_vector_cache.put(key, query_vector)
+    return query_vector
+
+
+async def get_query_vector_async(query_text, batcher=None):
+    """
+    get_query_vector() 的异步版本：未命中缓存时交给 batcher（clip_encoder.QueryBatcher）合并编码，
+    没有 batcher 时在线程池中编码，不阻塞事件循环
+    """
+    key = normalize_query(query_text)
+    query_vector = query_vector_cache.get(key)
+    if query_vector is None:
+        if batcher is not None:
+            query_vector = await batcher.encode(query_text)
+        else:
+            query_vector = await asyncio.get_running_loop().run_in_executor(
+                None, get_encoder().encode_text, query_text
+            )
+        query_vector_cache.put(key, query_vector)
+    return query_vector
+
 # --- 核心搜索函数 ---
-def search(query_text, top_k=10):
+def search(query_text, top_k=10, query_vector=None, w_sim=W_SIM, w_pr=W_PR, candidate_pool=None):
+    """
+    Args:
+        query_text: 查询文本
+        top_k: 返回结果数
+        query_vector: 预先计算好的查询向量（例如由 QueryBatcher 批量编码），None 时在此编码
+        w_sim / w_pr: 融合权重（相似度 / PageRank）
+        candidate_pool: 从 Qdrant 取回参与重排的候选数（默认 top_k * 3）
+    """
+    print(f"\n🔍 Searching for: '{query_text}' ...")
+
+    # 结果缓存保存的是探索机制之前的完整排序，探索红利每次请求重新掷骰子
+    cache_key = (normalize_query(query_text), top_k, w_sim, w_pr, candidate_pool)
+    # 计算期间若缓存被 invalidate_search_results() 清空，put 会按 generation 丢弃这份旧结果
+    generation = search_result_cache.generation
+    ranked = search_result_cache.get(cache_key)
+    if ranked is None:
+        ranked = _rank_candidates(query_text, top_k, query_vector, w_sim, w_pr, candidate_pool)
+        if ranked is None:
+            return []
+        search_result_cache.put(cache_key, ranked, generation)
+    else:
+        print("⚡ [Cache] Search result cache hit")
+
+    results, missing = _finalize(ranked, top_k)
+    if missing:
+        _apply_snippets(missing, query_text, _fetch_snippet_texts(missing), ranked)
+    return results
+
+
+async def search_async(query_text, top_k=10, query_vector=None, w_sim=W_SIM, w_pr=W_PR, candidate_pool=None):
+    """
+    search() 的异步版本：Qdrant 请求通过 async_store 中共享的 AsyncQdrantClient 完成，
+    不占用事件循环；缓存、融合排序、探索机制和摘要生成与 search() 共用同一套代码
+    """
     print(f"\n🔍 Searching for: '{query_text}' ...")
 
+    cache_key = (normalize_query(query_text), top_k, w_sim, w_pr, candidate_pool)
+    # 计算期间若缓存被 invalidate_search_results() 清空，put 会按 generation 丢弃这份旧结果
+    generation = search_result_cache.generation
+    ranked = search_result_cache.get(cache_key)
+    if ranked is None:
+        if query_vector is None:
+            query_vector = await get_query_vector_async(query_text)
+        try:
+            hits = await async_store.query_points(
+                SPACE_X,
+                np.asarray(query_vector, dtype=np.float32).tolist(),
+                limit=_candidate_limit(top_k, candidate_pool),
+                with_payload=CANDIDATE_PAYLOAD_FIELDS
+            )
+        except Exception as e:
+            print(f"❌ Qdrant search failed: {e}")
+            return []
+        ranked = _rank_hits(query_text, hits, top_k, w_sim, w_pr)
+        search_result_cache.put(cache_key, ranked, generation)
+    else:
+        print("⚡ [Cache] Search result cache hit")
+
+    results, missing = _finalize(ranked, top_k)
+    if missing:
+        texts = None
+        try:
+            points = await async_store.retrieve(
+                SPACE_X, [r['id'] for r in missing],
+                with_payload=SNIPPET_PAYLOAD_FIELDS, with_vectors=False
+            )
+            texts = _snippet_texts(points)
+        except Exception as e:
+            print(f"⚠️ Snippet text fetch failed, falling back to previews: {e}")
+        _apply_snippets(missing, query_text, texts, ranked)
+    return results
+
+
+def _candidate_limit(top_k, candidate_pool=None):
+    # 直接查询 Space X (包含所有内容)，多取一些用于重排
+    return candidate_pool or CANDIDATE_POOL_SIZE or top_k * EXPLORATION_DEPTH
+
+
+def _finalize(ranked, top_k):
+    """
+    在缓存的排序上应用探索机制并截取 top_k
+
+    Returns:
+        (最终结果, 其中还没有高亮摘要的条目)
+    """
+    # 复制一份，避免探索机制修改缓存中的条目
+    final_ranked = [dict(item) for item in ranked]
+
+    # --- 第三道防线 (B)：探索红利 (Exploration Bonus) ---
+    # 随机插入新内容 (Bandit 算法)
+    if random.random() < 0.05: # 5% 概率触发
+        print("🎲 [Exploration] Triggering exploration mechanism, injecting new content...")
+        # 这里简单模拟：随机取一个低分结果提升到第 2 名
+        if len(final_ranked) > 5:
+            lucky_idx = random.randint(5, len(final_ranked)-1)
+            lucky_item = final_ranked.pop(lucky_idx)
+            lucky_item['is_exploration'] = True
+            lucky_item['score'] += 0.5 # 强行加分
+            final_ranked.insert(1, lucky_item) # 插入到第二位
+
+    results = final_ranked[:top_k]
+    return results, [r for r in results if r.get('highlighted_snippet') is None]
+
+
+def _snippet_texts(points):
+    return {
+        p.id: (p.payload or {}).get('full_text', '') or (p.payload or {}).get('content', '')
+        for p in points
+    }
+
+
+def _fetch_snippet_texts(missing):
+    """第二阶段：只为最终返回的结果获取正文（一次 retrieve）；失败时返回 None"""
+    try:
+        points = client.retrieve(
+            collection_name=SPACE_X,
+            ids=[r['id'] for r in missing],
+            with_payload=SNIPPET_PAYLOAD_FIELDS,
+            with_vectors=False
+        )
+        return _snippet_texts(points)
+    except Exception as e:
+        print(f"⚠️ Snippet text fetch failed, falling back to previews: {e}")
+        return None
+
+
+def _apply_snippets(missing, query_text, texts, ranked):
+    """
+    生成高亮摘要，并写回缓存中的条目，缓存命中时无需再次获取正文。
+    texts 为 None（获取正文失败）时用预览生成摘要，但不写回缓存，下次命中时重新获取
+    """
+    cached_by_id = {item['id']: item for item in ranked} if texts is not None else {}
+    texts = texts or {}
+    # 关键词正则每个查询只编译一次，所有结果共用
+    highlighter = get_highlighter(query_text) if query_text else None
+
+    for r in missing:
+        # 优先使用full_text，否则使用content，最后退回content_preview
+        full_text = texts.get(r['id']) or r.get('content') or ''
+        full_text = full_text if isinstance(full_text, str) else str(full_text)
+        if highlighter is not None:
+            snippet = highlighter.snippet(full_text, snippet_length=SNIPPET_LENGTH)
+        else:
+            snippet = full_text[:SNIPPET_LENGTH]
+        r['highlighted_snippet'] = snippet
+        if r['id'] in cached_by_id:
+            cached_by_id[r['id']]['highlighted_snippet'] = snippet
+
+
+def _rank_candidates(query_text, top_k, query_vector=None, w_sim=W_SIM, w_pr=W_PR, candidate_pool=None):
+    """
+    向量检索 + 融合排序，返回按分数降序的候选列表；Qdrant 查询失败时返回 None
+    只为前 top_k * EXPLORATION_DEPTH 名生成结果条目，与原先的探索深度一致；
+    高亮摘要留空，由 _apply_snippets 只为最终结果补齐
+    """
     # ---------------------------------------------------------
     # Layer 1: Vector Embedding (CLIP)
     # ---------------------------------------------------------
-    inputs = clip_processor(text=[query_text], return_tensors="pt", padding=True)
-    with torch.no_grad():
-        query_vector = clip_model.get_text_features(**inputs)
-        query_vector = query_vector / query_vector.norm(p=2, dim=-1, keepdim=True)
-        query_vector = query_vector[0].numpy().tolist()
+    if query_vector is None:
+        query_vector = get_query_vector(query_text)
+    query_vector = np.asarray(query_vector, dtype=np.float32).tolist()
 
     # ---------------------------------------------------------
     # Layer 2: Qdrant Search (HNSW)
     # ---------------------------------------------------------
-    # 直接查询 Space X (包含所有内容)
     try:
         hits = client.query_points(
             collection_name=SPACE_X,
             query=query_vector,
             using="clip",
-            limit=top_k * 3  # 多取一些用于重排
+            limit=_candidate_limit(top_k, candidate_pool),
+            with_payload=CANDIDATE_PAYLOAD_FIELDS  # 不拉取 full_text / content / links
         ).points
     except Exception as e:
         print(f"❌ Qdrant search failed: {e}")
-        return []
+        return None
 
+    return _rank_hits(query_text, hits, top_k, w_sim, w_pr)
+
+
+def _rank_hits(query_text, hits, top_k, w_sim=W_SIM, w_pr=W_PR):
+    """一致性校验 + 融合排序（同步 / 异步两条检索路径共用）"""
     # ---------------------------------------------------------
-    # Layer 3: Fusion & Ranking & Safeguards
+    # Layer 3: Safeguards (Consistency Check)
     # ---------------------------------------------------------
-    results = []
-    raw_sims = []
-    raw_prs = []
-    
     total_candidates = len(hits)
-
+    kept = []
     for rank_idx, hit in enumerate(hits):
-        hit_id = hit.id
-        sim = hit.score
-        payload = hit.payload
-
-        # 获取权威度 (PageRank)
-        pr = payload.get('pr_score', 0.0)
-
         # --- 第四道防线：一致性校验 (Consistency Check) ---
         # 检查 CLIP 排名与 DINO 排名的冲突 (Mock)
         is_consistent, conflict_loss = consistency_engine.check_consistency(
-            query_text, payload, rank_idx, total_candidates
+            query_text, hit.payload, rank_idx, total_candidates
         )
-        
         if not is_consistent:
-            print(f"🛡️ [Circuit Breaker] Blocked ID {hit_id}: High Semantic-Visual Conflict (Loss: {conflict_loss:.2f})")
+            print(f"🛡️ [Circuit Breaker] Blocked ID {hit.id}: High Semantic-Visual Conflict (Loss: {conflict_loss:.2f})")
             continue
+        kept.append(hit)
 
-        raw_sims.append(sim)
-        raw_prs.append(pr)
-
-        results.append({
-            "id": hit_id,
-            "sim": sim,
-            "pr": pr,
-            "payload": payload,
-            "conflict_loss": conflict_loss
-        })
+    if not kept:
+        return []
 
-    # 4. 归一化处理 (Gauss Rank)
-    norm_sims = gauss_rank_norm(raw_sims)
-    norm_prs = gauss_rank_norm(raw_prs)
+    # ---------------------------------------------------------
+    # Layer 4: Fusion & Ranking (向量化)
+    # ---------------------------------------------------------
+    sims = np.fromiter((hit.score for hit in kept), dtype=np.float64, count=len(kept))
+    prs = np.fromiter((hit.payload.get('pr_score', 0.0) for hit in kept), dtype=np.float64, count=len(kept))
+    scores = fuse_scores(sims, prs, w_sim=w_sim, w_pr=w_pr)
+    order = top_k_indices(scores, top_k * EXPLORATION_DEPTH)
 
     final_ranked = []
-
-    # 权重设定
-    w_sim = 0.7
-    w_pr = 0.3
-
-    for i, item in enumerate(results):
-        # 最终打分公式
-        final_score = w_sim * norm_sims[i] + w_pr * norm_prs[i]
-
+    for i in order:
+        hit = kept[i]
         # 解析内容
-        p = item['payload']
+        p = hit.payload
         content_type = p.get('type', 'unknown')
         url = p.get('url', '#')
         preview = p.get('content_preview', 'No preview')
         if isinstance(preview, list): preview = preview[0]
-        
-        # 获取完整文本用于生成高亮摘要（优先使用full_text，否则使用content或content_preview）
-        full_text = p.get('full_text', '') or p.get('content', '') or preview
-        
-        # 生成高亮摘要
-        highlighted_snippet = generate_highlighted_snippet(
-            full_text if isinstance(full_text, str) else str(full_text), 
-            query_text, 
-            snippet_length=200
-        )
 
         final_ranked.append({
-            "score": final_score,
+            "score": float(scores[i]),
             "type": content_type,
             "url": url,
             "content": preview,
-            "highlighted_snippet": highlighted_snippet,  # 新增：包含高亮标记的摘要
-            "id": item['id'],
+            "highlighted_snippet": None,  # 包含高亮标记的摘要，由 _apply_snippets 填充
+            "id": hit.id,
             "is_exploration": False
         })
 
-    # 5. 排序
-    final_ranked.sort(key=lambda x: x['score'], reverse=True)
-    
-    # --- 第三道防线 (B)：探索红利 (Exploration Bonus) ---
-    # 随机插入新内容 (Bandit 算法)
-    if random.random() < 0.05: # 5% 概率触发
-        print("🎲 [Exploration] Triggering exploration mechanism, injecting new content...")
-        # 这里简单模拟：随机取一个低分结果提升到第 2 名
-        if len(final_ranked) > 5:
-            lucky_idx = random.randint(5, len(final_ranked)-1)
-            lucky_item = final_ranked.pop(lucky_idx)
-            lucky_item['is_exploration'] = True
-            lucky_item['score'] += 0.5 # 强行加分
-            final_ranked.insert(1, lucky_item) # 插入到第二位
-
-    return final_ranked[:top_k]
+    return final_ranked
 
 
 # --- 结果展示 ---
@@ -0,0 +1,205 @@
+"""
+Space X 分数投影 - 把 Space R 的 PageRank 投影到 Space X 的 pr_score
+
+pr_score(x) = Σ_{r ∈ topk(x)} max(0, cos(x, r)) * rank(r)
+
+- 只对每个点最相似的 PROJECTION_TOP_K 个锚点求和（与 ingest_data 的 Top 5 一致）；
+  锚点多时用 visual_rank_engine.AnchorHnsw 做近似近邻检索，开销随 |R| 亚线性增长，
+  锚点少或 Rust 扩展未编译时用 NumPy 精确平面检索（一次矩阵乘 + argpartition）
+- 按大页拉取 Space X 向量（只取 clip 向量，不取 payload），每页一次矩阵乘：
+  clip(X @ R.T, 0) @ r_scores
+- 只回写 pr_score：每页一次 batch_update_points（SetPayload），不重传向量和整个 payload
+- 可续跑：每页完成后把 scroll 游标写入检查点；检查点按 Space R 的排名内容区分，
+  Space R 变了则旧进度作废、从头开始
+"""
+import hashlib
+import json
+import os
+from typing import Optional, Sequence
+
+import numpy as np
+from qdrant_client.http import models
+
+PROJECTION_PAGE_SIZE = int(os.getenv("PROJECTION_PAGE_SIZE", "1024"))
+PROJECTION_CHECKPOINT = os.getenv("PROJECTION_CHECKPOINT", "projection_checkpoint.json")
+# 每个点只对最相似的 K 个锚点求和；0 表示使用全部锚点
+PROJECTION_TOP_K = int(os.getenv("PROJECTION_TOP_K", "5"))
+# 锚点数达到该值才建 HNSW 索引，以下直接精确平面检索更快
+ANCHOR_ANN_MIN_SIZE = int(os.getenv("ANCHOR_ANN_MIN_SIZE", "2048"))
+ANCHOR_HNSW_M = int(os.getenv("ANCHOR_HNSW_M", "16"))
+ANCHOR_HNSW_EF_SEARCH = int(os.getenv("ANCHOR_HNSW_EF_SEARCH", "64"))
+
+
+class AnchorIndex:
+    """
+    Space R 锚点向量的内存 top-k 检索
+
+    锚点数 >= ANCHOR_ANN_MIN_SIZE 且 Rust 扩展可用时用 HNSW，否则用精确平面检索。
+    """
+
+    def __init__(self, r_vecs, min_ann_size: int = ANCHOR_ANN_MIN_SIZE):
+        self.r_vecs = np.ascontiguousarray(r_vecs, dtype=np.float32)
+        self.hnsw = None
+        if len(self.r_vecs) >= min_ann_size:
+            try:
+                import visual_rank_engine
+                if hasattr(visual_rank_engine, "AnchorHnsw"):
+                    self.hnsw = visual_rank_engine.AnchorHnsw(
+                        self.r_vecs, m_neighbors=ANCHOR_HNSW_M, ef_search=ANCHOR_HNSW_EF_SEARCH
+                    )
+            except Exception as e:
+                print(f"⚠️ [Projection] Anchor HNSW unavailable, using exact search: {e}")
+
+    def __len__(self):
+        return len(self.r_vecs)
+
+    def search(self, x_vecs, k: int):
+        """
+        每个查询向量最相似的 k 个锚点
+
+        Returns:
+            (indices[int64 (q, k)], sims[float32 (q, k)])；不足 k 个时下标为 -1、相似度为 0
+        """
+        x_vecs = np.ascontiguousarray(x_vecs, dtype=np.float32)
+        k = min(k, len(self.r_vecs))
+        if self.hnsw is not None:
+            return self.hnsw.search(x_vecs, k)
+
+        sims = x_vecs @ self.r_vecs.T
+        if k < sims.shape[1]:
+            idx = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.broadcast_to(np.arange(sims.shape[1]), sims.shape)
+        return idx.astype(np.int64), np.take_along_axis(sims, idx, axis=1)
+
+
+def project_scores(x_vecs: np.ndarray, r_vecs: np.ndarray, r_scores: np.ndarray) -> np.ndarray:
+    """一页 Space X 向量的投影分数（负相似度截断为 0）"""
+    sims = x_vecs @ r_vecs.T
+    np.maximum(sims, 0.0, out=sims)
+    return sims @ r_scores
+
+
+def project_scores_topk(x_vecs, index: AnchorIndex, r_scores: np.ndarray, k: int) -> np.ndarray:
+    """只对 top-k 锚点求和的投影分数（负相似度截断为 0）"""
+    idx, sims = index.search(x_vecs, k)
+    sims = np.maximum(sims, 0.0)
+    weights = np.where(idx >= 0, np.asarray(r_scores)[np.maximum(idx, 0)], 0.0)
+    return np.sum(sims * weights, axis=1)
+
+
+def ranking_key(r_ids: Sequence[str], r_scores: np.ndarray) -> str:
+    """本次投影所用 Space R 排名的摘要，用来判断检查点是否仍然有效"""
+    h = hashlib.blake2b(digest_size=16)
+    for r_id in r_ids:
+        h.update(str(r_id).encode("utf-8"))
+        h.update(b"\0")
+    h.update(np.asarray(r_scores, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+class SpaceXProjection:
+    """
+    一次（可续跑的）Space X 投影任务
+
+    Args:
+        client: 同步 QdrantClient
+        collection_name: Space X 集合名
+        r_ids / r_vecs / r_scores: Space R 锚点 ID、(n, dim) 向量矩阵和对应的 PR 值
+        top_k: 每个点参与求和的锚点数，0 表示全部锚点
+    """
+
+    def __init__(self, client, collection_name: str, r_ids: Sequence[str], r_vecs, r_scores,
+                 page_size: int = PROJECTION_PAGE_SIZE, checkpoint_path: Optional[str] = PROJECTION_CHECKPOINT,
+                 top_k: int = PROJECTION_TOP_K):
+        self.client = client
+        self.collection_name = collection_name
+        self.r_vecs = np.ascontiguousarray(r_vecs, dtype=np.float32)
+        self.r_scores = np.asarray(r_scores, dtype=np.float32)
+        self.page_size = page_size
+        self.checkpoint_path = checkpoint_path
+        self.top_k = top_k
+        self.index = AnchorIndex(self.r_vecs) if 0 < top_k < len(self.r_vecs) else None
+        self.key = f"{ranking_key(r_ids, r_scores)}:{top_k}"
+
+    # --- 检查点 ---
+
+    def _load_checkpoint(self):
+        """返回 (offset, 已处理数量)；没有检查点或排名已变化时从头开始"""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return None, 0
+        try:
+            with open(self.checkpoint_path, "r") as f:
+                state = json.load(f)
+            if state.get("key") == self.key and state.get("collection") == self.collection_name:
+                return state.get("offset"), int(state.get("done", 0))
+        except Exception as e:
+            print(f"⚠️ [Projection] Ignoring unreadable checkpoint: {e}")
+        return None, 0
+
+    def _save_checkpoint(self, offset, done: int):
+        if not self.checkpoint_path:
+            return
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"key": self.key, "collection": self.collection_name, "offset": offset, "done": done}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _clear_checkpoint(self):
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    # --- 主流程 ---
+
+    def _write_scores(self, point_ids, scores):
+        """
+        一页的 pr_score 合并成一次批量请求，只改这一个字段。
+        wait=True：返回时写入已生效，之后才保存检查点 / 让搜索缓存失效，
+        中断续跑不会跳过未落盘的页面
+        """
+        operations = [
+            models.SetPayloadOperation(
+                set_payload=models.SetPayload(payload={"pr_score": float(score)}, points=[point_id])
+            )
+            for point_id, score in zip(point_ids, scores)
+        ]
+        self.client.batch_update_points(collection_name=self.collection_name, update_operations=operations, wait=True)
+
+    def run(self) -> int:
+        """
+        执行（或续跑）投影
+
+        Returns:
+            本次任务累计处理的点数（包括续跑前已完成的部分）
+        """
+        if len(self.r_scores) == 0:
+            return 0
+
+        offset, done = self._load_checkpoint()
+        if offset is not None:
+            print(f"   -> Resuming Space X projection after {done} points")
+
+        while True:
+            batch, next_offset = self.client.scroll(
+                collection_name=self.collection_name,
+                limit=self.page_size,
+                offset=offset,
+                with_payload=False,
+                with_vectors=["clip"],
+            )
+            if batch:
+                x_vecs = np.asarray([p.vector["clip"] for p in batch], dtype=np.float32)
+                if self.index is not None:
+                    scores = project_scores_topk(x_vecs, self.index, self.r_scores, self.top_k)
+                else:
+                    scores = project_scores(x_vecs, self.r_vecs, self.r_scores)
+                self._write_scores([p.id for p in batch], scores)
+                done += len(batch)
+
+            if next_offset is None:
+                break
+            offset = next_offset
+            self._save_checkpoint(offset, done)
+
+        self._clear_checkpoint()
+        return done
@@ -3,14 +3,22 @@ import uuid
 import time
 import random
 import logging
+import threading
+from collections import deque
 from typing import Optional, Dict, List
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
 import google.generativeai as genai
-from transformers import CLIPProcessor, CLIPModel
-from PIL import Image
+from clip_encoder import get_encoder
+from search_cache import invalidate_search_results
+from rank_snapshot import space_fingerprint, point_digest, save_snapshot, load_snapshot
+from space_projection import SpaceXProjection
+from anchor_matrix import AnchorMatrix
+from url_index import UrlIndex
+from ingest_pipeline import IngestPipeline
 # 使用新的模块化爬虫（向后兼容的同步接口）
 from crawler_v2 import SyncCrawlerWrapper
+from crawler_v2.durable_frontier import DurableFrontier, CrawlAlreadyRunning, default_crawl_id
 
 logger = logging.getLogger(__name__)
 
@@ -41,12 +49,29 @@ SPACE_X = "tum_space_x"
 
 # 阈值设定
 NOVELTY_THRESHOLD = 0.2  # 距离大于 0.2 (相似度 < 0.8) 视为独特，自动晋升
+
+# PageRank 迭代参数：L1 残差低于 PAGERANK_TOLERANCE 时提前停止，最多 PAGERANK_MAX_ITERATIONS 轮
+PAGERANK_DAMPING = 0.85
+PAGERANK_MAX_ITERATIONS = int(os.getenv("PAGERANK_MAX_ITERATIONS", "100"))
+PAGERANK_TOLERANCE = float(os.getenv("PAGERANK_TOLERANCE", "1e-6"))
+# HNSW 建图参数（Rust 引擎中并行插入）
+HNSW_MAX_LAYER = int(os.getenv("HNSW_MAX_LAYER", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+# 递归爬取是否使用分阶段流水线（ingest_pipeline）
+INGEST_PIPELINE = os.getenv("INGEST_PIPELINE", "1") != "0"
+# 递归爬取的 frontier / visited 持久化文件（SQLite），服务重启后可按 crawl_id 续爬；留空则只在内存中
+CRAWL_STATE_DB = os.getenv("CRAWL_STATE_DB", "crawl_state.db")
+# 服务启动时续爬 CRAWL_STATE_DB 中未完成的递归爬取任务（见 resume_unfinished_crawls）
+CRAWL_RESUME_ON_START = os.getenv("CRAWL_RESUME_ON_START", "1") != "0"
+# 启动时在后台预热 Space X 的已知 URL 集合（只取 url 字段）
+URL_INDEX_WARM = os.getenv("URL_INDEX_WARM", "1") != "0"
+# 增量晋升后延迟多少秒再把 PR 投影到 Space X：期间的多次晋升只投影一次（0 表示每次立即投影）
+SPACE_X_PROJECTION_DELAY = float(os.getenv("SPACE_X_PROJECTION_DELAY", "30"))
 # =========================================
 
 print("🛠️System Initialization: Connecting to database & loading models...")
 client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
-clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+# CLIP 模型由 clip_encoder 统一管理（与 search_engine 共享，首次使用时才加载）
 # 使用新的模块化爬虫（暂时禁用robots.txt以排查问题）
 try:
     from crawler_v2 import SyncCrawlerWrapper
@@ -69,29 +94,40 @@ except Exception as e:
 from interaction_manager import InteractionManager
 
 def get_embedding(text=None, image_path=None):
-    inputs = None
+    encoder = get_encoder()
     if text:
-        inputs = clip_processor(text=[text], return_tensors="pt", padding=True, truncation=True, max_length=77)
-        feat = clip_model.get_text_features(**inputs)
+        return encoder.encode_text(text).tolist()
     elif image_path:
         try:
             # 如果是URL图片，需要先下载，这里简化为兼容本地路径
-            image = Image.open(image_path).convert("RGB")
-            inputs = clip_processor(images=image, return_tensors="pt")
-            feat = clip_model.get_image_features(**inputs)
+            return encoder.encode_image(image_path).tolist()
         except Exception as e:
             return None
-    if inputs is not None:
-        feat = feat / feat.norm(p=2, dim=-1, keepdim=True)
-        return feat[0].detach().numpy().tolist()
     return None
 
 
+def embed_texts(texts, batch_size=None):
+    """入库用的批量文本编码，返回 (n, dim) 的 float32 数组（批大小默认 CLIP_BATCH_SIZE）"""
+    return get_encoder().embed_texts(texts, batch_size=batch_size)
+
+
 class SystemManager:
     def __init__(self):
         self.client = client
         self.r_cache = []
         self.r_ranks = {}
+        # 独特性检测用的锚点向量矩阵（启动时载入，晋升/删除时增量维护）
+        self.anchors = AnchorMatrix()
+        # URL 存在性索引（本地已知 URL 集合 + MatchAny 批量查询）
+        self.url_index = UrlIndex(self.client)
+        # 增量 PageRank 图（Rust IncrementalRankGraph），全量重算时建立，之后单点增删只做增量更新
+        self.rank_graph = None
+        # rank_graph 对应的 Space R 指纹（见 rank_snapshot），用于判断能否跳过建图
+        self.rank_graph_fingerprint = None
+        # 延迟执行的 Space X 投影（合并连续的增量晋升）
+        self._projection_timer = None
+        self._projection_lock = threading.Lock()
+        self._projection_run_lock = threading.Lock()
         # HNSW 立体结构参数
         self.max_level = 3
         self.m_neighbors = 5
@@ -104,6 +140,25 @@ class SystemManager:
         
         self._init_collections()
         self._ensure_indices()
+        self._load_anchor_matrix()
+        if URL_INDEX_WARM:
+            threading.Thread(target=self._warm_url_index, name="url-index-warm", daemon=True).start()
+
+    def _warm_url_index(self):
+        """预热已知 URL 集合；预热完成前查询照常走数据库，只是少了本地命中"""
+        try:
+            count = self.url_index.warm(SPACE_X)
+            print(f"✅ URL index warmed: {count} points from {SPACE_X}")
+        except Exception as e:
+            print(f"⚠️  [Database] Could not warm URL index: {e}")
+
+    def _load_anchor_matrix(self):
+        """启动时载入 Space R 锚点向量，保证刚启动时的独特性检测也能看到已有锚点"""
+        try:
+            count = self.anchors.load(self.client, SPACE_R)
+            print(f"✅ Anchor matrix loaded: {count} anchors from {SPACE_R}")
+        except Exception as e:
+            print(f"⚠️  [Database] Could not load anchor matrix: {e}")
 
     def _init_collections(self):
         """初始化 Qdrant 集合"""
@@ -164,6 +219,10 @@ class SystemManager:
         """Wrapper for global get_embedding function."""
         return get_embedding(text=text)
 
+    def embed_texts(self, texts, batch_size=None):
+        """Wrapper for global embed_texts function."""
+        return embed_texts(texts, batch_size=batch_size)
+
     def trigger_global_recalculation(self):
         """触发基于 HNSW 结构的立体 PageRank 计算"""
         print("\n⚡️ Triggering 3D Network Recalculation (HNSW-based Recalculation) ⚡️")
@@ -181,14 +240,19 @@ class SystemManager:
             return
 
         self.r_cache = r_points
+        self.anchors.replace([p.id for p in r_points], self._vector_matrix(r_points))
         print(f"   -> Space R Total Nodes: {len(r_points)}")
 
         # 2. 构建立体图并计算 PR
         self._calculate_hnsw_pagerank(r_points)
 
-        # 3. 更新 Space X (投影)
+        # 3. 更新 Space X (投影)；已排队的延迟投影不再需要
+        self._cancel_space_x_projection()
         self._update_space_x_scores()
 
+        # 4. pr_score 已变化，旧的搜索结果缓存失效
+        invalidate_search_results()
+
     def _calculate_hnsw_pagerank(self, points):
         """
         构建 HNSW 立体分层图并计算 PageRank (Rust Accelerated)
@@ -206,62 +270,213 @@ class SystemManager:
         start_time = time.time()
 
         # 1. Prepare Data
-        # Ensure IDs are strings
+        # Ensure IDs are strings；向量一次性打包成连续的 float32 矩阵，Rust 侧零拷贝读取
         ids = [str(p.id) for p in points]
-        vectors = [p.vector['clip'] for p in points]
+        vectors = self._vector_matrix(points)
         
         # Cold start check
         if not self.interaction_mgr.interactions:
             self.interaction_mgr.simulate_cold_start_data(points)
 
-        # Interaction Weights (Fix: Use ID instead of URL)
-        interaction_weights = {}
-        for p in points:
-            w = self.interaction_mgr.get_interaction_weight(str(p.id))
-            interaction_weights[str(p.id)] = w
-            
-        # Transitions (Convert defaultdict to dict for safety)
-        # InteractionManager.transitions is defaultdict(lambda: defaultdict(int))
-        transitions = {k: dict(v) for k, v in self.interaction_mgr.transitions.items()}
+        weights, trans_src, trans_dst, trans_count = self._interaction_arrays(ids)
 
         # 2. Call Rust
+        if hasattr(visual_rank_engine, "IncrementalRankGraph"):
+            try:
+                graph, source = self._get_rank_graph(visual_rank_engine, ids, vectors)
+                graph.set_interactions(ids, weights, trans_src, trans_dst, trans_count)
+                iterations, residual = graph.update()
+                self.r_ranks = graph.ranks()
+                print(f"   -> ✅ Rust calculation finished in {time.time() - start_time:.4f}s "
+                      f"(graph: {source}, {iterations} iterations, residual {residual:.2e})")
+                return
+            except Exception as e:
+                self.rank_graph = None
+                self.rank_graph_fingerprint = None
+                print(f"   ⚠️ Incremental graph build failed, using batch engine: {e}")
+
         try:
-            ranks = visual_rank_engine.calculate_hnsw_pagerank(
-                ids,
+            ranks, iterations, residual = visual_rank_engine.calculate_hnsw_pagerank_array(
                 vectors,
-                interaction_weights,
-                transitions,
+                weights,
+                trans_src,
+                trans_dst,
+                trans_count,
                 self.m_neighbors,
-                0.85, # damping
-                30    # iterations
+                PAGERANK_DAMPING,
+                PAGERANK_MAX_ITERATIONS,
+                PAGERANK_TOLERANCE,
+                HNSW_MAX_LAYER,
+                HNSW_EF_CONSTRUCTION
             )
             
-            self.r_ranks = ranks
-            print(f"   -> ✅ Rust calculation finished in {time.time() - start_time:.4f}s")
+            # ranks 是与 ids 对齐的 NumPy 数组
+            self.r_ranks = dict(zip(ids, ranks.tolist()))
+            print(f"   -> ✅ Rust calculation finished in {time.time() - start_time:.4f}s "
+                  f"({iterations} iterations, residual {residual:.2e})")
             
         except Exception as e:
             print(f"   ❌ Rust Engine Failed: {e}")
             import traceback
             traceback.print_exc()
 
+    def _get_rank_graph(self, engine, ids, vectors):
+        """
+        取得与当前 Space R 一致的排名图，尽量跳过建图（Phase 1/2）：
+        1. 内存中的图指纹一致（只有交互权重变了）-> 直接复用
+        2. 磁盘快照指纹一致（例如服务重启后）-> 从快照恢复
+        3. 否则全量建图，并写入新快照
+
+        Returns:
+            (graph, 来源说明)
+        """
+        fingerprint = space_fingerprint(ids, vectors)
+        if self.rank_graph is not None and self.rank_graph_fingerprint == fingerprint:
+            return self.rank_graph, "reused"
+
+        params = (self.m_neighbors, HNSW_MAX_LAYER, HNSW_EF_CONSTRUCTION)
+        graph_kwargs = dict(
+            m_neighbors=self.m_neighbors, damping=PAGERANK_DAMPING, tolerance=PAGERANK_TOLERANCE,
+            max_iterations=PAGERANK_MAX_ITERATIONS, max_layer=HNSW_MAX_LAYER, ef_construction=HNSW_EF_CONSTRUCTION
+        )
+        graph = load_snapshot(engine, fingerprint, params, ids, vectors, graph_kwargs)
+        source = "snapshot"
+        if graph is None:
+            # 新建增量图：后续单个锚点的增删不再需要全量重建
+            graph = engine.IncrementalRankGraph(**graph_kwargs)
+            graph.add_nodes(ids, vectors)
+            save_snapshot(graph, fingerprint, params)
+            source = "rebuilt"
+
+        self.rank_graph = graph
+        self.rank_graph_fingerprint = fingerprint
+        return graph, source
+
+    @staticmethod
+    def _vector_matrix(points):
+        """点的 CLIP 向量 -> C 连续的 (n, dim) float32 矩阵"""
+        return np.ascontiguousarray([p.vector['clip'] for p in points], dtype=np.float32)
+
+    def _interaction_arrays(self, ids):
+        """
+        交互权重与转移计数，按 ids 的下标对齐，供 Rust 引擎计算边权重
+
+        Returns:
+            (weights[float64], trans_src[int64], trans_dst[int64], trans_count[int64])
+            transitions 为按 (src, dst) 排序的 COO 格式，src/dst 是 ids 中的下标；不在 ids 中的节点被忽略
+        """
+        return self.interaction_mgr.rank_tables(ids)
+
+    def _on_space_r_changed(self, added=None, removed_ids=None):
+        """
+        Space R 增删后的增量重算：只把变化的节点插入/移出已有的 HNSW 图，
+        并从上一次的 PR 值热启动迭代。图尚未建立时退回全量重算。
+
+        Args:
+            added: 新晋升的锚点（带 id / vector['clip'] / payload 的点）
+            removed_ids: 被删除的锚点 ID
+        """
+        added = list(added or [])
+        removed_ids = [str(i) for i in (removed_ids or [])]
+
+        if self.rank_graph is None:
+            self.trigger_global_recalculation()
+            return
+
+        start_time = time.time()
+        try:
+            if removed_ids:
+                removed = set(removed_ids)
+                for p in self.r_cache:
+                    if str(p.id) in removed:
+                        self._update_graph_fingerprint(p)
+                self.r_cache = [p for p in self.r_cache if str(p.id) not in removed]
+                self.rank_graph.remove_nodes(removed_ids)
+            if added:
+                self.r_cache.extend(added)
+                for p in added:
+                    if str(p.id) not in self.rank_graph:
+                        self._update_graph_fingerprint(p)
+                self.rank_graph.add_nodes([str(p.id) for p in added], self._vector_matrix(added))
+            r_ids = [str(p.id) for p in self.r_cache]
+            self.rank_graph.set_interactions(r_ids, *self._interaction_arrays(r_ids))
+            iterations, residual = self.rank_graph.update()
+            self.r_ranks = self.rank_graph.ranks()
+        except Exception as e:
+            print(f"   ⚠️ Incremental PageRank failed, falling back to full recalculation: {e}")
+            self.rank_graph = None
+            self.trigger_global_recalculation()
+            return
+
+        print(f"⚡️ Incremental PageRank: +{len(added)} / -{len(removed_ids)} anchors, "
+              f"{iterations} iterations in {time.time() - start_time:.4f}s")
+
+        # 投影到 Space X 是全量扫描，延迟合并后执行（执行完再让结果缓存失效）
+        self._schedule_space_x_projection()
+
+    def _schedule_space_x_projection(self):
+        """
+        SPACE_X_PROJECTION_DELAY 秒后投影一次：期间的晋升 / 删除只排一次，
+        届时使用最新的 PR 值（非守护线程，进程退出前仍会完成）
+        """
+        if SPACE_X_PROJECTION_DELAY <= 0:
+            self._run_space_x_projection()
+            return
+        with self._projection_lock:
+            if self._projection_timer is not None:
+                return
+            self._projection_timer = threading.Timer(SPACE_X_PROJECTION_DELAY, self._run_space_x_projection)
+            self._projection_timer.name = "space-x-projection"
+            self._projection_timer.start()
+
+    def _cancel_space_x_projection(self):
+        with self._projection_lock:
+            if self._projection_timer is not None:
+                self._projection_timer.cancel()
+                self._projection_timer = None
+
+    def _run_space_x_projection(self):
+        with self._projection_lock:
+            self._projection_timer = None
+        # 同一时间只跑一个投影；运行期间又有变化时会排下一次
+        with self._projection_run_lock:
+            self._update_space_x_scores()
+            invalidate_search_results()
+
+    def flush_space_x_projection(self):
+        """立即执行排队中的投影（批量导入脚本结束前调用）"""
+        with self._projection_lock:
+            pending = self._projection_timer is not None
+        if pending:
+            self._cancel_space_x_projection()
+            self._run_space_x_projection()
+
+    def _update_graph_fingerprint(self, point):
+        """增删一个锚点后更新指纹（异或是自反的，增删同一操作）"""
+        if self.rank_graph_fingerprint is not None:
+            self.rank_graph_fingerprint ^= point_digest(str(point.id), point.vector['clip'])
+
     def _check_novelty(self, vector):
         """
         独特性检测：计算向量与 R 空间中最近锚点的距离。
         返回: (is_novel, min_distance)
         """
-        if not self.r_cache:
-            # 如果 R 为空，第一个进来的肯定是新的
-            return True, 1.0
-
-        r_vecs = np.array([p.vector['clip'] for p in self.r_cache])
-        # 计算与现有锚点的相似度
-        sims = np.dot(r_vecs, np.array(vector))
-        max_sim = np.max(sims)
+        # 如果 R 为空，第一个进来的肯定是新的（max_similarity 返回 0，距离 1.0）
+        max_sim = float(self.check_novelty_many([vector])[0])
         min_dist = 1.0 - max_sim
 
         is_novel = min_dist > NOVELTY_THRESHOLD
         return is_novel, min_dist
 
+    def check_novelty_many(self, vectors):
+        """
+        批量独特性检测：一次矩阵乘算出每个向量与最近锚点的相似度
+
+        Returns:
+            (n,) 最大相似度数组；1 - max_sim > NOVELTY_THRESHOLD 即为独特
+        """
+        return self.anchors.max_similarity(vectors)
+
     def process_url_and_add(self, url, trigger_recalc=True, check_db_first=True):
         """
         全自动流水线：检查数据库 -> 爬取（如需要）-> 清洗(熵) -> 向量化 -> 独特性检测 -> 晋升/入库
@@ -292,15 +507,23 @@ class SystemManager:
 
         print(f"   -> ✅🐛🕸️Crawl successful! Retrieved {len(data['texts'])} valid text blocks (Entropy Cleaned).")
 
-        promoted_count = 0
+        promoted = []
+        texts = [text for text in data['texts'] if text]
+        if not texts:
+            print("   ✅ URL processing complete. 0 items promoted to Anchors.")
+            return
+
+        # 2. 处理文本：整页一次批量编码，一次矩阵乘算出与现有锚点的相似度
+        vectors = embed_texts(texts)
+        maybe_novel = (1.0 - self.check_novelty_many(vectors)) > NOVELTY_THRESHOLD
+        points_x = []
 
-        # 2. 处理文本
-        for text in data['texts']:
-            vec = get_embedding(text=text)
-            if not vec: continue
+        for text, vec_arr, candidate in zip(texts, vectors, maybe_novel):
+            vec = vec_arr.tolist()
 
             # --- 独特性检测 ---
-            is_novel, dist = self._check_novelty(vec)
+            # 批量结果已不独特的肯定不独特（锚点只会增加）；其余逐条复查，本页先晋升的也算锚点
+            is_novel, dist = self._check_novelty(vec) if candidate else (False, 0.0)
             promotion_status = False
 
             if is_novel:
@@ -309,16 +532,14 @@ class SystemManager:
                 print(f"      Content Summary: {text[:40]}...")
 
                 pt_id = str(uuid.uuid4())
+                r_payload = {"content": text, "url": url}
                 client.upsert(
                     collection_name=SPACE_R,
-                    points=[models.PointStruct(id=pt_id, vector={"clip": vec}, payload={"content": text, "url": url})]
+                    points=[models.PointStruct(id=pt_id, vector={"clip": vec}, payload=r_payload)]
                 )
+                self.anchors.add([pt_id], [vec])
                 promotion_status = True
-                promoted_count += 1
-                
-                # 如果开启了实时重算
-                if trigger_recalc:
-                    self.trigger_global_recalculation()
+                promoted.append(models.Record(id=pt_id, vector={"clip": vec}, payload=r_payload))
 
             # 无论如何，都要添加到 X (搜索池)
             payload = {"url": url, "type": "text", "content_preview": text[:100], "pr_score": 0.0}
@@ -327,16 +548,22 @@ class SystemManager:
             if 'links' in data and data['links']:
                 payload['links'] = data['links'][:50]  # 存储前50个链接
             
-            client.upsert(
-                collection_name=SPACE_X,
-                points=[models.PointStruct(
-                    id=str(uuid.uuid4()),
-                    vector={"clip": vec},
-                    payload=payload
-                )]
-            )
+            points_x.append(models.PointStruct(
+                id=str(uuid.uuid4()),
+                vector={"clip": vec},
+                payload=payload
+            ))
 
-        print(f"   ✅ URL processing complete. {promoted_count} items promoted to Anchors.")
+        # 整页的 X 点一次写入
+        client.upsert(collection_name=SPACE_X, points=points_x)
+        self.url_index.add(SPACE_X, [url])
+
+        invalidate_search_results()
+        print(f"   ✅ URL processing complete. {len(promoted)} items promoted to Anchors.")
+
+        # 如果开启了实时重算（增量）：整页的晋升合并为一次，且在本页 X 点写入之后，投影能覆盖到它们
+        if trigger_recalc and promoted:
+            self._on_space_r_changed(added=promoted)
 
     def add_to_space_x(self, text, url=None, promote_to_r=False, is_summarized=False, **kwargs):
         """
@@ -380,6 +607,8 @@ class SystemManager:
             collection_name=SPACE_X,
             points=[models.PointStruct(id=pt_id, vector={"clip": vec}, payload=payload)]
         )
+        self.url_index.add(SPACE_X, [url])
+        invalidate_search_results()
         print(f"   ✅ Added to Space X (ID: {pt_id})")
 
         # 4. (可选) 晋升到 R
@@ -389,36 +618,27 @@ class SystemManager:
                 collection_name=SPACE_R,
                 points=[models.PointStruct(id=pt_id, vector={"clip": vec}, payload=payload)]
             )
-            self.trigger_global_recalculation()
+            self.anchors.add([pt_id], [vec])
+            self._on_space_r_changed(added=[models.Record(id=pt_id, vector={"clip": vec}, payload=payload)])
 
     def _update_space_x_scores(self):
-        # 简单的投影更新逻辑
-        if not self.r_cache: return
-
-        # 这里为了演示不打印太多刷屏
-        # print("   -> Updating Space X scores (projection calculation)...")
-
-        r_vecs = np.array([p.vector['clip'] for p in self.r_cache])
-        r_scores = np.array([self.r_ranks[p.id] for p in self.r_cache])
-
-        offset = None
-        while True:
-            batch, offset = client.scroll(collection_name=SPACE_X, limit=50, with_vectors=True, offset=offset)
-            if not batch: break
+        """
+        把 Space R 的 PR 值投影到 Space X 的 pr_score
+        (分页矩阵乘 + 只回写 pr_score，中断后下次调用从检查点续跑，见 space_projection)
+        """
+        # 可能在延迟投影线程中运行，先取快照（晋升 / 删除会替换 r_cache 和 r_ranks）
+        r_cache, r_ranks = list(self.r_cache), self.r_ranks
+        if not r_cache: return
 
-            points_to_update = []
-            for point in batch:
-                x_vec = np.array(point.vector['clip'])
-                sims = np.dot(r_vecs, x_vec)
-                sims[sims < 0] = 0
-                new_score = float(np.sum(sims * r_scores))
+        r_ids = [str(p.id) for p in r_cache]
+        r_scores = np.array([r_ranks.get(r_id, 0.0) for r_id in r_ids])
 
-                points_to_update.append(models.PointStruct(
-                    id=point.id, vector={"clip": x_vec.tolist()},
-                    payload={**point.payload, "pr_score": new_score}
-                ))
-            client.upsert(collection_name=SPACE_X, points=points_to_update)
-            if offset is None: break
+        start_time = time.time()
+        try:
+            done = SpaceXProjection(client, SPACE_X, r_ids, self._vector_matrix(r_cache), r_scores).run()
+            print(f"   -> Space X projection updated {done} points in {time.time() - start_time:.2f}s")
+        except Exception as e:
+            print(f"   ⚠️ Space X projection interrupted (will resume from checkpoint): {e}")
 
     # ... (保留之前的 __init__, trigger_global_recalculation 等所有代码) ...
 
@@ -460,49 +680,7 @@ class SystemManager:
         Returns:
             bool: 如果URL存在返回True，否则返回False。如果数据库连接失败，返回False以允许继续爬取。
         """
-        try:
-            # 使用线程安全的超时机制
-            from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
-            
-            def check_in_thread():
-                """在线程中执行数据库查询"""
-                try:
-                    points, _ = self.client.scroll(
-                        collection_name=collection_name,
-                        scroll_filter=models.Filter(
-                            must=[
-                                models.FieldCondition(
-                                    key="url",
-                                    match=models.MatchValue(value=url)
-                                )
-                            ]
-                        ),
-                        limit=1
-                    )
-                    return len(points) > 0
-                except Exception as inner_e:
-                    raise inner_e
-            
-            # 使用线程池执行，设置3秒超时
-            with ThreadPoolExecutor(max_workers=1) as executor:
-                future = executor.submit(check_in_thread)
-                try:
-                    result = future.result(timeout=3.0)  # 3秒超时
-                    return result
-                except FutureTimeoutError:
-                    print(f"⚠️  [Database Check] Timeout (3s) checking URL: {url[:50]}...")
-                    print(f"   ⚠️  Continuing without database check to avoid blocking...")
-                    return False
-        except Exception as e:
-            error_msg = str(e)
-            if "timeout" in error_msg.lower() or "connection" in error_msg.lower():
-                print(f"⚠️  [Database Check] Connection error checking URL: {url[:50]}...")
-                print(f"   Error: {error_msg}")
-                print(f"   ⚠️  Please check QDRANT_URL and QDRANT_API_KEY in .env file")
-            else:
-                print(f"⚠️  [Database Check] Error checking URL existence for {url[:50]}...: {error_msg}")
-            print(f"   ⚠️  Continuing without database check to avoid blocking crawler...")
-            return False  # 出错时返回False，允许继续爬取，不阻塞爬虫
+        return self.batch_check_urls([url], collection_name)[url]
     
     def get_url_from_db(self, url: str, collection_name: str = SPACE_X) -> Optional[Dict]:
         """
@@ -545,6 +723,8 @@ class SystemManager:
         """
         批量检查多个URL是否存在
         
+        先查本地已知 URL 集合，未命中的按块用 MatchAny 过滤查询（见 url_index）
+        
         Args:
             urls: URL列表
             collection_name: 要查询的集合名称（默认SPACE_X）
@@ -552,24 +732,42 @@ class SystemManager:
         Returns:
             Dict[str, bool]: URL到存在性的映射字典
         """
-        result = {}
-        
-        # 批量查询以提高效率
-        for url in urls:
-            result[url] = self.check_url_exists(url, collection_name)
+        try:
+            found = self.url_index.lookup(collection_name, urls)
+        except Exception as e:
+            error_msg = str(e)
+            if "timeout" in error_msg.lower() or "connection" in error_msg.lower():
+                print(f"⚠️  [Database Check] Connection error checking {len(urls)} URLs")
+                print(f"   Error: {error_msg}")
+                print(f"   ⚠️  Please check QDRANT_URL and QDRANT_API_KEY in .env file")
+            else:
+                print(f"⚠️  [Database Check] Error checking URL existence: {error_msg}")
+            print(f"   ⚠️  Continuing without database check to avoid blocking crawler...")
+            # 出错时只信任本地已知的 URL，其余视为不存在，允许继续爬取
+            found = {url for url in urls if self.url_index.known(collection_name, url)}
         
-        return result
+        return {url: url in found for url in urls}
 
     # [新增] 删除接口 (用于 Admin 面板)
     def delete_item(self, collection_name, point_id):
+        if collection_name == SPACE_X:
+            # 先取出 URL，删除后从已知 URL 集合中移除
+            try:
+                deleted = client.retrieve(collection_name=SPACE_X, ids=[point_id], with_payload=["url"])
+                self.url_index.discard(SPACE_X, [(p.payload or {}).get("url") for p in deleted])
+            except Exception as e:
+                print(f"⚠️  Could not look up URL for {point_id}: {e}")
         client.delete(
             collection_name=collection_name,
             points_selector=models.PointIdsList(points=[point_id])
         )
         print(f"🗑️ Deleted ID from {collection_name}: {point_id}")
-        # 如果删的是 R 空间，必须触发重算
+        if collection_name == SPACE_X:
+            invalidate_search_results()
+        # 如果删的是 R 空间，必须触发重算（增量）
         if collection_name == SPACE_R:
-            self.trigger_global_recalculation()
+            self.anchors.remove([point_id])
+            self._on_space_r_changed(removed_ids=[point_id])
 
     # [新增] 从 X 复制到 R (用于 Admin 手动优化)
     def promote_from_x_to_r(self, point_id):
@@ -585,18 +783,20 @@ class SystemManager:
         point = points[0]
 
         # 2. 写入 R
+        r_payload = {**point.payload, "promoted_by_admin": True}
         client.upsert(
             collection_name=SPACE_R,
             points=[models.PointStruct(
                 id=point.id,  # 保持 ID 一致
                 vector=point.vector,
-                payload={**point.payload, "promoted_by_admin": True}
+                payload=r_payload
             )]
         )
+        self.anchors.add([point.id], [point.vector['clip'] if isinstance(point.vector, dict) else point.vector])
         print(f"⬆️ Admin manually promoted ID: {point_id}")
 
-        # 3. 触发重算
-        self.trigger_global_recalculation()
+        # 3. 触发重算（增量）
+        self._on_space_r_changed(added=[models.Record(id=point.id, vector=point.vector, payload=r_payload)])
         return True
 
 
@@ -668,25 +868,101 @@ class SystemManager:
                 
             if points_to_update:
                 self.client.upsert(collection_name=SPACE_X, points=points_to_update)
+                invalidate_search_results()
                 
             if offset is None: break
             
         print(f"✅ Backfill complete. Updated {count} items.")
 
-    def process_url_recursive(self, start_url, max_depth=8, max_pages=None, callback=None, check_db_first=True):
+    def process_url_recursive(self, start_url, max_depth=8, max_pages=None, callback=None, check_db_first=True,
+                              crawl_id=None):
         """
         Recursively crawl and process URLs up to max_depth.
         callback(count, url): function to call on successful addition.
         check_db_first: 是否先检查数据库，如果URL已存在则跳过爬取
         max_depth: 最大爬取深度（默认8层，可扩展到10层）
         max_pages: 最大爬取页面数（None表示不限制）
+        crawl_id: 可恢复任务的 ID（默认由起始 URL 得出；同一任务中断后再次调用即从检查点续爬）
+
+        使用 crawler_v2 时走 ingest_pipeline 的分阶段流水线（抓取/解析/摘要/向量化/写库重叠执行），
+        frontier 和 visited 集合持久化到 CRAWL_STATE_DB；
+        旧版爬虫或 INGEST_PIPELINE=0 时退回逐个 URL 串行处理。
+        """
+        async_crawler = getattr(self.crawler, "async_crawler", None)
+        if not INGEST_PIPELINE or async_crawler is None:
+            return self._process_url_recursive_serial(start_url, max_depth, max_pages, callback, check_db_first)
+
+        print(f"🕸️ Starting pipelined crawl: {start_url} (Depth: {max_depth}, Max Pages: {max_pages or 'unlimited'})")
+        frontier = None
+        if CRAWL_STATE_DB:
+            crawl_id = crawl_id or default_crawl_id(start_url)
+            try:
+                frontier = DurableFrontier(
+                    CRAWL_STATE_DB, crawl_id, start_url=start_url,
+                    params={"max_depth": max_depth, "max_pages": max_pages}
+                )
+            except CrawlAlreadyRunning:
+                # 同一 URL 重复提交：正在运行的任务会继续，不再启动第二个
+                print(f"   ⏳ Crawl {crawl_id} for {start_url} is already running, ignoring duplicate request")
+                return 0
+            if frontier.resumed:
+                print(f"   ♻️  Resuming crawl {crawl_id}: {frontier.stored_count} stored, {len(frontier)} queued")
+
+        pipeline = IngestPipeline(
+            self, async_crawler, SPACE_X,
+            max_depth=max_depth, max_pages=max_pages, callback=callback, check_db_first=check_db_first,
+            frontier=frontier
+        )
+        try:
+            # 在爬虫的常驻事件循环上运行，复用其连接池（AsyncCrawler 的锁和信号量也只绑定这一个循环）
+            if hasattr(self.crawler, "submit"):
+                count = self.crawler.submit(pipeline.run(start_url, session=self.crawler.session)).result()
+            else:
+                count = pipeline.run_sync(start_url)
+            if frontier is not None:
+                frontier.finish()
+            return count
+        finally:
+            # 进度已逐次提交，异常中断后以同一 crawl_id 再次调用即可续爬
+            if frontier is not None:
+                frontier.close()
+
+    def resume_unfinished_crawls(self):
+        """
+        续爬上次进程退出时未完成的递归爬取（按原参数逐个执行，阻塞直到全部结束）
+
+        Returns:
+            每个任务处理的页面数 {crawl_id: count}
+        """
+        if not CRAWL_STATE_DB or not INGEST_PIPELINE or not os.path.exists(CRAWL_STATE_DB):
+            return {}
+        results = {}
+        for crawl in DurableFrontier.unfinished_crawls(CRAWL_STATE_DB):
+            params = crawl["params"]
+            print(f"♻️ Resuming unfinished crawl {crawl['crawl_id']}: {crawl['start_url']}")
+            try:
+                results[crawl["crawl_id"]] = self.process_url_recursive(
+                    crawl["start_url"], max_depth=params.get("max_depth", 8), max_pages=params.get("max_pages"),
+                    crawl_id=crawl["crawl_id"]
+                )
+            except Exception as e:
+                print(f"   ❌ Resumed crawl {crawl['crawl_id']} failed: {e}")
+        return results
+
+    def _process_url_recursive_serial(self, start_url, max_depth=8, max_pages=None, callback=None, check_db_first=True):
+        """
+        Recursively crawl and process URLs up to max_depth (one URL at a time).
+        callback(count, url): function to call on successful addition.
+        check_db_first: 是否先检查数据库，如果URL已存在则跳过爬取
+        max_depth: 最大爬取深度（默认8层，可扩展到10层）
+        max_pages: 最大爬取页面数（None表示不限制）
         """
         print(f"🕸️ Starting recursive crawl: {start_url} (Depth: {max_depth}, Max Pages: {max_pages or 'unlimited'})")
         if check_db_first:
             print(f"   ✅ 已启用数据库检查，将跳过已存在的URL")
         
         visited = set()
-        queue = [(start_url, 0)]
+        queue = deque([(start_url, 0)])
         
         # 批量检查URL是否存在（用于优化）
         urls_to_check = [] # (url, depth)
@@ -705,7 +981,7 @@ class SystemManager:
             if max_pages and count >= max_pages:
                 print(f"   ✅ 已达到最大页面数限制: {max_pages}")
                 break
-            current_url, depth = queue.pop(0)
+            current_url, depth = queue.popleft()
             
             if current_url in visited:
                 continue
@@ -0,0 +1,50 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+import numpy as np
+
+# Adjust path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from anchor_matrix import AnchorMatrix
+
+
+class TestAnchorMatrix(unittest.TestCase):
+
+    def test_empty_matrix_reports_zero_similarity(self):
+        anchors = AnchorMatrix()
+        np.testing.assert_array_equal(anchors.max_similarity([[1.0, 0.0], [0.0, 1.0]]), [0.0, 0.0])
+
+    def test_add_remove_and_batch_similarity(self):
+        anchors = AnchorMatrix(capacity=2)
+        anchors.add(["a", "b"], [[1.0, 0.0], [0.0, 1.0]])
+        anchors.add(["c"], [[0.6, 0.8]])  # 超出初始容量，自动扩容
+        anchors.add(["a"], [[-1.0, 0.0]])  # 已存在的 ID 只覆盖向量
+        self.assertEqual(len(anchors), 3)
+
+        queries = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+        np.testing.assert_allclose(anchors.max_similarity(queries), [0.6, 1.0], rtol=1e-6)
+
+        anchors.remove(["b", "missing"])
+        self.assertNotIn("b", anchors)
+        np.testing.assert_allclose(anchors.max_similarity(queries), [0.6, 0.8], rtol=1e-6)
+        np.testing.assert_allclose(sorted(anchors.vectors.tolist()), [[-1.0, 0.0], [0.6, 0.8]], rtol=1e-6)
+
+    def test_load_scrolls_vectors_only(self):
+        def point(point_id, vector):
+            p = MagicMock()
+            p.id = point_id
+            p.vector = {"clip": vector}
+            return p
+
+        client = MagicMock()
+        client.scroll.side_effect = [([point(1, [1.0, 0.0])], 1), ([point(2, [0.0, 1.0])], None)]
+
+        anchors = AnchorMatrix()
+        self.assertEqual(anchors.load(client, "r"), 2)
+        self.assertIn(1, anchors)
+        self.assertFalse(client.scroll.call_args.kwargs["with_payload"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+import asyncio
+import time
+import numpy as np
+import sys
+import os
+
+# Adjust path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from clip_encoder import ClipEncoder, QueryBatcher, get_encoder, set_encoder
+
+
+class RecordingEncoder:
+    """Fake encoder: maps each text to a distinct one-hot vector and records batches."""
+    def __init__(self):
+        self.batches = []
+
+    def encode_texts(self, texts):
+        self.batches.append(list(texts))
+        vecs = np.zeros((len(texts), 8), dtype=np.float32)
+        for i, text in enumerate(texts):
+            vecs[i, len(text) % 8] = 1.0
+        return vecs
+
+
+class TestClipEncoder(unittest.TestCase):
+
+    def tearDown(self):
+        set_encoder(None)
+
+    def test_encoder_is_lazy_and_shared(self):
+        encoder = ClipEncoder()
+        self.assertFalse(encoder.is_loaded)
+        self.assertIs(get_encoder(), get_encoder())
+
+    def test_embed_texts_batches_and_keeps_input_order(self):
+        fake = RecordingEncoder()
+        encoder = ClipEncoder(batch_size=2)
+        encoder.encode_texts = fake.encode_texts
+        texts = ["ccc", "a", "bbbb", "bb", "eeeee"]
+
+        vectors = encoder.embed_texts(texts)
+
+        self.assertEqual(vectors.shape, (5, 8))
+        # 按长度排序后每批最多 2 条
+        self.assertEqual(fake.batches, [["a", "bb"], ["ccc", "bbbb"], ["eeeee"]])
+        for text, vec in zip(texts, vectors):
+            self.assertEqual(int(np.argmax(vec)), len(text) % 8)
+        self.assertFalse(encoder.is_loaded)
+
+    def test_set_encoder_injects_fake(self):
+        fake = RecordingEncoder()
+        set_encoder(fake)
+        self.assertIs(get_encoder(), fake)
+
+
+class TestQueryBatcher(unittest.TestCase):
+
+    def test_concurrent_queries_share_one_batch(self):
+        fake = RecordingEncoder()
+        batcher = QueryBatcher(max_batch_size=16, max_wait_ms=20, encoder=fake)
+        queries = ["a", "bb", "ccc", "bb"]
+
+        async def run():
+            return await asyncio.gather(*(batcher.encode(q) for q in queries))
+
+        vectors = asyncio.run(run())
+        batcher.shutdown()
+
+        # One forward pass, duplicates encoded once
+        self.assertEqual(fake.batches, [["a", "bb", "ccc"]])
+        for q, vec in zip(queries, vectors):
+            self.assertEqual(int(np.argmax(vec)), len(q) % 8)
+        self.assertEqual(batcher.stats["queries"], 4)
+        self.assertEqual(batcher.stats["batches"], 1)
+
+    def test_full_batch_flushes_immediately(self):
+        fake = RecordingEncoder()
+        batcher = QueryBatcher(max_batch_size=2, max_wait_ms=10_000, encoder=fake)
+
+        async def run():
+            return await asyncio.wait_for(
+                asyncio.gather(batcher.encode("x"), batcher.encode("yy")), timeout=2
+            )
+
+        asyncio.run(run())
+        batcher.shutdown()
+        self.assertEqual(fake.batches, [["x", "yy"]])
+
+    def test_queries_arriving_during_a_batch_form_the_next_batch(self):
+        class SlowEncoder(RecordingEncoder):
+            def encode_texts(self, texts):
+                time.sleep(0.1)
+                return super().encode_texts(texts)
+
+        fake = SlowEncoder()
+        batcher = QueryBatcher(max_batch_size=16, max_wait_ms=1, encoder=fake)
+
+        async def run():
+            first = asyncio.ensure_future(batcher.encode("a"))
+            await asyncio.sleep(0.03)  # 第一批已在计算
+            rest = []
+            for q in ["bb", "ccc", "dddd"]:
+                rest.append(asyncio.ensure_future(batcher.encode(q)))
+                await asyncio.sleep(0.01)  # 间隔大于 max_wait_ms
+            return await asyncio.gather(first, *rest)
+
+        asyncio.run(run())
+        batcher.shutdown()
+        self.assertEqual(fake.batches, [["a"], ["bb", "ccc", "dddd"]])
+
+    def test_encoder_error_propagates_to_callers(self):
+        class BrokenEncoder:
+            def encode_texts(self, texts):
+                raise RuntimeError("boom")
+
+        batcher = QueryBatcher(max_wait_ms=1, encoder=BrokenEncoder())
+
+        async def run():
+            return await batcher.encode("q")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(run())
+        batcher.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
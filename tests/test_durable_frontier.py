@@ -0,0 +1,163 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+import asyncio
+import tempfile
+import threading
+
+# Adjust path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from crawler_v2.durable_frontier import DurableFrontier, CrawlAlreadyRunning, default_crawl_id
+from ingest_pipeline import IngestPipeline
+from tests.test_ingest_pipeline import SITE, FakeCrawler, FakeManager
+
+
+class TestDurableFrontier(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "crawl_state.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def open(self, crawl_id="c1", **kwargs):
+        return DurableFrontier(self.path, crawl_id, start_url="http://a.de/", **kwargs)
+
+    def test_dedup_and_priority_order(self):
+        frontier = self.open()
+        self.assertIsNotNone(frontier.add("http://a.de/tag/x/", 1))
+        self.assertIsNotNone(frontier.add("http://a.de/news/story/", 1))
+        self.assertIsNone(frontier.add("http://a.de/news/story#top", 2))
+        self.assertEqual(frontier.seen_count, 2)
+        self.assertIn("http://a.de/tag/x", frontier)
+
+        item = frontier.pop()
+        self.assertEqual((item.url, item.depth), ("http://a.de/news/story", 1))
+        self.assertEqual(len(frontier), 1)
+        frontier.close()
+
+    def test_add_many_writes_a_page_in_one_transaction(self):
+        frontier = self.open()
+        frontier.add("http://a.de/0")
+        statements = []
+        frontier._conn.set_trace_callback(statements.append)
+
+        links = [f"http://a.de/{i}" for i in range(200)] + ["http://a.de/5#x", "not a url"]
+        self.assertEqual(frontier.add_many(links, 1), 199)
+
+        self.assertEqual(statements.count("BEGIN IMMEDIATE"), 1)
+        self.assertEqual(statements.count("COMMIT"), 1)
+        self.assertEqual((frontier.seen_count, len(frontier)), (200, 200))
+        self.assertEqual(frontier.pop().url, "http://a.de/0")
+        frontier.close()
+
+    def test_resume_requeues_unfinished_urls(self):
+        frontier = self.open()
+        for url in ["http://a.de/1", "http://a.de/2", "http://a.de/3"]:
+            frontier.add(url)
+        stored, fetched = frontier.pop(), frontier.pop()
+        frontier.done(stored)
+        frontier.done(fetched)
+        frontier.complete([stored.url])
+        frontier.pop()  # 在途时进程退出
+        frontier.close()
+
+        self.assertEqual([c["crawl_id"] for c in DurableFrontier.unfinished_crawls(self.path)], ["c1"])
+
+        resumed = self.open()
+        self.assertTrue(resumed.resumed)
+        self.assertEqual(resumed.stored_count, 1)
+        self.assertEqual(len(resumed), 2)
+        self.assertIsNone(resumed.add("http://a.de/1"))  # visited 集合也恢复了
+        self.assertEqual(sorted([resumed.pop().url, resumed.pop().url]), ["http://a.de/2", "http://a.de/3"])
+
+        resumed.finish()
+        resumed.close()
+        self.assertEqual(DurableFrontier.unfinished_crawls(self.path), [])
+        # 已完成的任务再次打开时重新开始
+        fresh = self.open()
+        self.assertFalse(fresh.resumed)
+        self.assertEqual(fresh.seen_count, 0)
+        fresh.close()
+
+    def test_two_frontiers_share_one_file(self):
+        first, second = self.open("c1"), self.open("c2")
+        try:
+            # 交替写入：每个操作一个短事务，不会因另一个连接持有写锁而报 database is locked
+            for i in range(20):
+                self.assertIsNotNone(first.add(f"http://a.de/{i}"))
+                self.assertIsNotNone(second.add(f"http://a.de/{i}"))
+            item = second.pop()
+            second.done(item)
+            second.complete([item.url])
+            self.assertEqual((len(first), len(second)), (20, 19))
+            self.assertEqual(second.stored_count, 1)
+
+            # 多线程并发写入同一文件
+            def crawl(frontier):
+                while True:
+                    item = frontier.pop()
+                    if item is None:
+                        return
+                    frontier.done(item)
+                    frontier.complete([item.url])
+
+            threads = [threading.Thread(target=crawl, args=(f,)) for f in (first, second)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join(timeout=30)
+            self.assertEqual((first.stored_count, second.stored_count), (20, 20))
+        finally:
+            first.close()
+            second.close()
+
+        self.assertEqual(sorted(c["crawl_id"] for c in DurableFrontier.unfinished_crawls(self.path)), ["c1", "c2"])
+
+    def test_same_crawl_id_cannot_be_opened_twice(self):
+        first = self.open("c1")
+        first.add("http://a.de/1")
+        item = first.pop()
+
+        # 正在运行的任务不能被当作中断任务"恢复"：在途状态不被重置
+        with self.assertRaises(CrawlAlreadyRunning):
+            self.open("c1")
+        self.assertEqual((len(first), first.in_flight), (0, 1))
+        first.done(item)
+        first.complete([item.url])
+        self.assertEqual(first.stored_count, 1)
+        first.close()
+
+        # 释放后可以正常恢复
+        resumed = self.open("c1")
+        self.assertTrue(resumed.resumed)
+        self.assertEqual(resumed.stored_count, 1)
+        resumed.close()
+
+    def test_pipeline_resumes_from_checkpoint(self):
+        crawl_id = default_crawl_id("http://site/")
+        frontier = DurableFrontier(self.path, crawl_id, start_url="http://site/")
+        frontier.add("http://site/", 0)
+        root = frontier.pop()
+        frontier.done(root)
+        frontier.complete([root.url])
+        frontier.add("http://site/a", 1)
+        frontier.add("http://site/b", 1)
+        frontier.close()
+
+        mgr, crawler = FakeManager(), FakeCrawler()
+        frontier = DurableFrontier(self.path, crawl_id, start_url="http://site/")
+        pipeline = IngestPipeline(mgr, crawler, "x", batch_wait=0.05, frontier=frontier)
+        count = asyncio.run(pipeline.run("http://site/", session=MagicMock()))
+        frontier.close()
+
+        # 起始页已入库，不再抓取；其余页面从检查点继续
+        self.assertNotIn("http://site/", crawler.fetched)
+        self.assertEqual(sorted(crawler.fetched), sorted(set(SITE) - {"http://site/"}))
+        self.assertEqual(count, len(SITE))
+
+if __name__ == '__main__':
+    unittest.main()
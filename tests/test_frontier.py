@@ -0,0 +1,112 @@
+import unittest
+import sys
+import os
+import asyncio
+
+# Adjust path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from crawler_v2 import AsyncCrawler
+from crawler_v2.frontier import Frontier, run_frontier, score_link
+
+
+class TestFrontier(unittest.TestCase):
+
+    def test_dedup_uses_normalized_urls(self):
+        frontier = Frontier(scorer=None)
+        self.assertIsNotNone(frontier.add("http://a.de/x/../y#top", 0))
+        self.assertIsNone(frontier.add("http://a.de/y", 1))
+        self.assertIsNone(frontier.add("not a url", 0))
+        self.assertIn("http://a.de/y#other", frontier)
+        self.assertEqual(len(frontier), 1)
+        self.assertEqual(frontier.pop().url, "http://a.de/y")
+
+    def test_add_many_counts_new_urls(self):
+        frontier = Frontier(scorer=None)
+        frontier.add("http://a.de/1")
+        self.assertEqual(frontier.add_many(["http://a.de/1", "http://a.de/2", "http://a.de/2#x", "bad"], 1), 1)
+        self.assertEqual(len(frontier), 2)
+
+    def test_fifo_per_host_and_round_robin_across_hosts(self):
+        frontier = Frontier(scorer=None)
+        for url in ["http://a.de/1", "http://a.de/2", "http://a.de/3", "http://b.de/1"]:
+            frontier.add(url)
+        order = []
+        while len(frontier):
+            item = frontier.pop()
+            order.append(item.url)
+            frontier.done(item)
+        self.assertEqual(order, ["http://a.de/1", "http://b.de/1", "http://a.de/2", "http://a.de/3"])
+
+    def test_priority_and_per_host_limit(self):
+        frontier = Frontier(per_host_limit=1)
+        frontier.add("http://a.de/tag/x/", 0)
+        frontier.add("http://a.de/news/story/", 0)
+        frontier.add("http://b.de/", 0)
+        self.assertGreater(score_link("http://a.de/news/story/"), score_link("http://a.de/tag/x/"))
+
+        first = frontier.pop()
+        self.assertEqual(first.url, "http://a.de/news/story")
+        # a.de 已有一个在途，只能出 b.de
+        self.assertEqual(frontier.pop().host, "b.de")
+        self.assertIsNone(frontier.pop())
+        frontier.done(first)
+        self.assertEqual(frontier.pop().url, "http://a.de/tag/x")
+
+    def test_scheduler_has_no_level_barrier(self):
+        site = {
+            "http://s.de/": ["http://s.de/slow", "http://s.de/fast"],
+            "http://s.de/slow": [],
+            "http://s.de/fast": ["http://s.de/deep"],
+            "http://s.de/deep": [],
+        }
+        frontier = Frontier(scorer=None)
+        frontier.add("http://s.de/", 0)
+        finished = []
+
+        async def handle(item):
+            await asyncio.sleep(0.2 if item.url.endswith("slow") else 0)
+            for link in site[item.url]:
+                frontier.add(link, item.depth + 1)
+            finished.append(item.url)
+            return True
+
+        count = asyncio.run(run_frontier(frontier, handle, concurrency=2))
+        self.assertEqual(count, 4)
+        # 第 2 层的 deep 不必等第 1 层的 slow 完成
+        self.assertLess(finished.index("http://s.de/deep"), finished.index("http://s.de/slow"))
+
+
+class TestCrawlRecursive(unittest.TestCase):
+
+    def test_crawl_recursive_respects_depth_pages_and_domain(self):
+        site = {
+            "http://s.de/": ["http://s.de/a", "http://s.de/b", "http://other.de/x"],
+            "http://s.de/a": ["http://s.de/c", "http://s.de/"],
+            "http://s.de/b": ["http://s.de/c#frag"],
+            "http://s.de/c": ["http://s.de/d"],
+            "http://s.de/d": [],
+        }
+        crawler = AsyncCrawler(concurrency=2, enable_robots=False)
+        fetched = []
+
+        async def fake_process_url(session, url):
+            fetched.append(url)
+            await asyncio.sleep(0)
+            return {"url": url, "texts": [], "images": [], "links": site[url]}
+
+        crawler.process_url = fake_process_url
+
+        results = asyncio.run(crawler.crawl_recursive("http://s.de/", max_depth=8, session=object()))
+        self.assertEqual(sorted(r["url"] for r in results), sorted(site))
+        self.assertEqual(len(fetched), len(set(fetched)))
+
+        fetched.clear()
+        results = asyncio.run(crawler.crawl_recursive("http://s.de/", max_depth=1, session=object()))
+        self.assertEqual(sorted(fetched), ["http://s.de/", "http://s.de/a", "http://s.de/b"])
+
+        results = asyncio.run(crawler.crawl_recursive("http://s.de/", max_pages=2, session=object()))
+        self.assertEqual(len(results), 2)
+
+if __name__ == '__main__':
+    unittest.main()
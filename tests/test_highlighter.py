@@ -0,0 +1,47 @@
+import unittest
+import sys
+import os
+
+# Adjust path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from highlighter import SnippetHighlighter, get_highlighter, HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE
+
+
+class TestSnippetHighlighter(unittest.TestCase):
+
+    def test_marks_all_keywords_case_insensitive(self):
+        hl = SnippetHighlighter("informatics master")
+        snippet = hl.snippet("The Informatics MASTER program at TUM.", snippet_length=200)
+        self.assertIn(f"{HIGHLIGHT_OPEN}Informatics{HIGHLIGHT_CLOSE}", snippet)
+        self.assertIn(f"{HIGHLIGHT_OPEN}MASTER{HIGHLIGHT_CLOSE}", snippet)
+
+    def test_stop_words_are_not_highlighted(self):
+        hl = SnippetHighlighter("the mensa")
+        self.assertEqual(hl.keywords, ["mensa"])
+
+    def test_picks_densest_window(self):
+        filler = "x" * 500
+        text = f"exam {filler} exam dates exam dates {filler}"
+        hl = SnippetHighlighter("exam dates")
+        snippet = hl.snippet(text, snippet_length=100)
+        # The lone "exam" at the start is not in the dense cluster's window
+        self.assertTrue(snippet.startswith("..."))
+        self.assertEqual(snippet.count(HIGHLIGHT_OPEN), 4)
+
+    def test_no_match_returns_text_start(self):
+        hl = SnippetHighlighter("mensa")
+        self.assertEqual(hl.snippet("abcdef", snippet_length=3), "abc")
+        self.assertEqual(hl.snippet("", snippet_length=3), "")
+
+    def test_longer_keyword_wins(self):
+        hl = SnippetHighlighter("data database")
+        snippet = hl.snippet("database", snippet_length=50)
+        self.assertEqual(snippet, f"{HIGHLIGHT_OPEN}database{HIGHLIGHT_CLOSE}")
+
+    def test_highlighter_is_reused_per_query(self):
+        self.assertIs(get_highlighter("mensa"), get_highlighter("mensa"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Adjust path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ingest_pipeline import IngestPipeline
+
+SITE = {
+    "http://site/": ["http://site/a", "http://site/b", "http://other/x"],
+    "http://site/a": ["http://site/c", "http://site/"],
+    "http://site/b": ["http://site/c"],
+    "http://site/c": ["http://site/d"],
+    "http://site/d": [],
+}
+
+
+class FakeCrawler:
+    """fetch 返回 URL 本身作为 HTML；_parse_sync 按 SITE 表给出链接"""
+    concurrency = 3
+    verify_ssl = True
+    robots_checker = None
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.fetched = []
+
+    async def fetch(self, session, url):
+        self.fetched.append(url)
+        await asyncio.sleep(0)
+        return url if url in SITE else None
+
+    def _parse_sync(self, html, url):
+        return {"url": url, "texts": [f"text of {url}"], "images": [], "links": SITE[html]}
+
+
+class FakeManager:
+    def __init__(self, existing=()):
+        self.client = MagicMock()
+        self.existing = set(existing)
+        self.embed_calls = []
+
+    def check_url_exists(self, url, collection_name):
+        return url in self.existing
+
+    def get_url_from_db(self, url, collection_name):
+        return {"payload": {"links": SITE[url]}}
+
+    def summarize_text_api(self, text):
+        return text
+
+    def embed_texts(self, texts):
+        self.embed_calls.append(list(texts))
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+class TestIngestPipeline(unittest.TestCase):
+
+    def run_pipeline(self, mgr, crawler, **kwargs):
+        kwargs.setdefault("batch_wait", 0.05)
+        pipeline = IngestPipeline(mgr, crawler, "x", **kwargs)
+        count = asyncio.run(pipeline.run("http://site/", session=MagicMock()))
+        return pipeline, count
+
+    def upserted_urls(self, mgr):
+        return sorted(
+            p.payload["url"]
+            for call in mgr.client.upsert.call_args_list
+            for p in call.kwargs["points"]
+        )
+
+    def test_crawls_site_once_and_batches_downstream(self):
+        mgr, crawler = FakeManager(), FakeCrawler()
+        callbacks = []
+        pipeline, count = self.run_pipeline(mgr, crawler, callback=lambda n, url: callbacks.append(n))
+
+        self.assertEqual(count, 5)
+        self.assertEqual(sorted(crawler.fetched), sorted(SITE))  # 每个页面只抓一次，不出站
+        self.assertEqual(self.upserted_urls(mgr), sorted(SITE))
+        # 向量化和写库按批进行，而不是每页一次
+        self.assertLess(len(mgr.embed_calls), 5)
+        self.assertLess(mgr.client.upsert.call_count, 5)
+        self.assertEqual(callbacks[0], 0)
+        self.assertEqual(callbacks[-1], 5)
+        metrics = pipeline.metrics()
+        self.assertEqual(metrics["fetch"]["items"], 5)
+        self.assertEqual(metrics["upsert"]["items"], 5)
+
+    def test_depth_and_page_limits(self):
+        mgr, crawler = FakeManager(), FakeCrawler()
+        _, count = self.run_pipeline(mgr, crawler, max_depth=1)
+        self.assertEqual(self.upserted_urls(mgr), ["http://site/", "http://site/a", "http://site/b"])
+        self.assertEqual(count, 3)
+
+        mgr, crawler = FakeManager(), FakeCrawler()
+        _, count = self.run_pipeline(mgr, crawler, max_pages=2)
+        self.assertEqual(count, 2)
+
+    def test_page_limit_counts_stored_pages(self):
+        class SparseCrawler(FakeCrawler):
+            # site/a 没有正文，不会入库，不应占用 max_pages 名额
+            def _parse_sync(self, html, url):
+                data = super()._parse_sync(html, url)
+                if url == "http://site/a":
+                    data["texts"] = []
+                return data
+
+        mgr, crawler = FakeManager(), SparseCrawler()
+        _, count = self.run_pipeline(mgr, crawler, max_pages=3)
+        self.assertEqual(count, 3)
+        self.assertEqual(len(self.upserted_urls(mgr)), 3)
+        self.assertNotIn("http://site/a", self.upserted_urls(mgr))
+
+    def test_embedding_failure_retries_pages_individually(self):
+        class FlakyManager(FakeManager):
+            def embed_texts(self, texts):
+                if "text of http://site/c" in texts:
+                    raise RuntimeError("bad page")
+                return super().embed_texts(texts)
+
+        mgr, crawler = FlakyManager(), FakeCrawler()
+        pipeline, count = self.run_pipeline(mgr, crawler, embed_batch=8, batch_wait=1.0)
+
+        # 只丢弃坏页面，同批其他页面仍然入库
+        self.assertEqual(count, 4)
+        self.assertEqual(self.upserted_urls(mgr), ["http://site/", "http://site/a", "http://site/b", "http://site/d"])
+        self.assertEqual(pipeline.metrics()["embed"]["failed"], 1)
+        self.assertEqual(pipeline.metrics()["embed"]["items"], 4)
+
+    def test_existing_urls_reuse_stored_links(self):
+        mgr, crawler = FakeManager(existing={"http://site/", "http://site/b"}), FakeCrawler()
+        _, count = self.run_pipeline(mgr, crawler)
+
+        self.assertEqual(count, 5)
+        self.assertNotIn("http://site/", crawler.fetched)
+        self.assertEqual(self.upserted_urls(mgr), ["http://site/a", "http://site/c", "http://site/d"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import tempfile
+import numpy as np
+import sys
+import os
+
+# Adjust path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rank_snapshot import space_fingerprint, point_digest, save_snapshot, load_snapshot
+
+
+class FakeGraph:
+    """Mimics IncrementalRankGraph.export_graph / from_graph."""
+    def __init__(self, ids, vectors=None, indptr=None, indices=None, distances=None, ranks=None):
+        self.ids = list(ids)
+        self.vectors = vectors
+        self.indptr = indptr if indptr is not None else np.array([0, 1, 2], dtype=np.int64)
+        self.indices = indices if indices is not None else np.array([1, 0], dtype=np.int64)
+        self.distances = distances if distances is not None else np.array([0.1, 0.1], dtype=np.float32)
+        self.ranks = ranks if ranks is not None else np.array([0.5, 0.5])
+
+    def export_graph(self):
+        return self.ids, self.indptr, self.indices, self.distances, self.ranks
+
+    @staticmethod
+    def from_graph(ids, vectors, indptr, indices, distances, ranks, **kwargs):
+        return FakeGraph(ids, vectors, indptr, indices, distances, ranks)
+
+
+class FakeEngine:
+    IncrementalRankGraph = FakeGraph
+
+
+class TestRankSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.ids = ["a", "b"]
+        self.vectors = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "graph.npz")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_fingerprint_is_order_independent_and_incremental(self):
+        fp = space_fingerprint(self.ids, self.vectors)
+        self.assertEqual(fp, space_fingerprint(self.ids[::-1], self.vectors[::-1]))
+        # Removing "b" is one XOR
+        self.assertEqual(fp ^ point_digest("b", self.vectors[1]), space_fingerprint(["a"], self.vectors[:1]))
+        # Vector change is detected
+        self.assertNotEqual(fp, space_fingerprint(self.ids, self.vectors * 2))
+
+    def test_roundtrip_reorders_vectors_to_snapshot_order(self):
+        fp = space_fingerprint(self.ids, self.vectors)
+        self.assertTrue(save_snapshot(FakeGraph(self.ids), fp, (5, 16, 200), path=self.path))
+
+        graph = load_snapshot(FakeEngine, fp, (5, 16, 200), self.ids[::-1], self.vectors[::-1], {}, path=self.path)
+        self.assertEqual(graph.ids, ["a", "b"])
+        np.testing.assert_array_equal(graph.vectors, self.vectors)
+        self.assertEqual(graph.indices.tolist(), [1, 0])
+
+    def test_mismatch_returns_none(self):
+        fp = space_fingerprint(self.ids, self.vectors)
+        save_snapshot(FakeGraph(self.ids), fp, (5, 16, 200), path=self.path)
+        self.assertIsNone(load_snapshot(FakeEngine, fp ^ 1, (5, 16, 200), self.ids, self.vectors, {}, path=self.path))
+        self.assertIsNone(load_snapshot(FakeEngine, fp, (8, 16, 200), self.ids, self.vectors, {}, path=self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
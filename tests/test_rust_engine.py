@@ -0,0 +1,121 @@
+import unittest
+import sys
+import os
+import math
+
+import numpy as np
+
+# Adjust path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 未编译时 visual_rank_engine 目录会被当作命名空间包导入，需检查导出的函数
+try:
+    import visual_rank_engine
+except ImportError:
+    visual_rank_engine = None
+BUILT = hasattr(visual_rank_engine, "calculate_hnsw_pagerank_array")
+
+
+def temporal_reference(num_nodes, edges, last_interactions, damping, decay, iterations):
+    """纯 Python 参考实现（与 mock_data/benchmark_rust.py 一致）"""
+    adj_out = [[] for _ in range(num_nodes)]
+    for src, dst in edges:
+        if src < num_nodes and dst < num_nodes:
+            adj_out[src].append(dst)
+    ranks = [1.0 / num_nodes] * num_nodes
+    for _ in range(iterations):
+        new_ranks = [0.0] * num_nodes
+        for u, neighbors in enumerate(adj_out):
+            if not neighbors:
+                continue
+            share = damping * ranks[u] * math.exp(-decay * last_interactions[u]) / len(neighbors)
+            for v in neighbors:
+                new_ranks[v] += share
+        total = sum(new_ranks)
+        ranks = [r / total for r in new_ranks] if total > 0 else [1.0 / num_nodes] * num_nodes
+    return ranks
+
+
+def unit_vectors(n, dim, seed):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@unittest.skipUnless(BUILT, "visual_rank_engine not built (cd visual_rank_engine && maturin develop --release)")
+class TestRustEngine(unittest.TestCase):
+
+    def test_dict_and_array_entry_points_agree(self):
+        vectors = unit_vectors(50, 8, seed=0)
+        ids = [f"n{i}" for i in range(50)]
+        weights = np.linspace(1.0, 2.0, 50)
+
+        ranks, iters, residual = visual_rank_engine.calculate_hnsw_pagerank(
+            ids, vectors.tolist(), dict(zip(ids, weights)), {"n0": {"n1": 5}}, 5, 0.85, 100, 1e-10
+        )
+        array_ranks, array_iters, _ = visual_rank_engine.calculate_hnsw_pagerank_array(
+            vectors, weights,
+            np.array([0], dtype=np.int64), np.array([1], dtype=np.int64), np.array([5], dtype=np.int64),
+            5, 0.85, 100, 1e-10,
+        )
+        self.assertLessEqual(iters, 100)
+        self.assertLess(residual, 1e-6)
+        self.assertAlmostEqual(sum(ranks.values()), 1.0, places=6)
+        self.assertEqual(array_ranks.shape, (50,))
+        # 同一组输入，两个入口只是数据传递方式不同
+        np.testing.assert_allclose(array_ranks, [ranks[i] for i in ids], atol=1e-6)
+
+    def test_temporal_matches_python_reference(self):
+        rng = np.random.default_rng(7)
+        edges = rng.integers(0, 100, size=(800, 2)).tolist()
+        edges += [[100, 0], [0, 105]]  # 越界边两边都应忽略
+        last_interactions = rng.uniform(0, 72, size=100).tolist()
+
+        expected = temporal_reference(100, edges, last_interactions, 0.85, 0.01, 30)
+        from_list = visual_rank_engine.calculate_temporal_pagerank(100, edges, last_interactions, 0.85, 0.01, 30)
+        from_array = visual_rank_engine.calculate_temporal_pagerank(
+            100, np.asarray(edges, dtype=np.int64), last_interactions, 0.85, 0.01, 30
+        )
+        np.testing.assert_allclose(from_list, expected, atol=1e-9)
+        np.testing.assert_allclose(from_array, expected, atol=1e-9)
+
+    def test_incremental_graph_add_update_remove(self):
+        vectors = unit_vectors(120, 16, seed=1)
+        ids = [f"n{i}" for i in range(120)]
+        graph = visual_rank_engine.IncrementalRankGraph(5, 0.85)
+        self.assertEqual(graph.add_nodes(ids[:119], vectors[:119]), 119)
+        cold_iters, _ = graph.update()
+
+        graph.add_nodes(ids[119:], vectors[119:])
+        warm_iters, _ = graph.update()
+        self.assertLessEqual(warm_iters, cold_iters)
+        self.assertEqual(len(graph), 120)
+        self.assertAlmostEqual(sum(graph.ranks().values()), 1.0, places=4)
+
+        self.assertEqual(graph.remove_nodes(["n0", "missing"]), 1)
+        graph.update()
+        self.assertNotIn("n0", graph)
+        self.assertEqual(len(graph.ranks()), 119)
+
+        # 导出再恢复后排名不变
+        kept_ids, indptr, indices, distances, ranks = graph.export_graph()
+        kept_vectors = vectors[[ids.index(i) for i in kept_ids]]
+        restored = visual_rank_engine.IncrementalRankGraph.from_graph(
+            kept_ids, kept_vectors, indptr, indices, distances, ranks
+        )
+        self.assertEqual(len(restored), 119)
+        self.assertAlmostEqual(restored.ranks()["n1"], graph.ranks()["n1"], places=9)
+
+    def test_anchor_hnsw_search(self):
+        anchors = unit_vectors(300, 32, seed=2)
+        index = visual_rank_engine.AnchorHnsw(anchors, 16, 128)
+        indices, sims = index.search(anchors[:5], 3)
+        self.assertEqual(len(index), 300)
+        self.assertEqual(indices.shape, (5, 3))
+        self.assertEqual(sims.shape, (5, 3))
+        np.testing.assert_array_equal(indices[:, 0], np.arange(5))
+        np.testing.assert_allclose(sims[:, 0], 1.0, atol=1e-5)
+
+
+if __name__ == '__main__':
+    unittest.main()
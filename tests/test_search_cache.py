@@ -0,0 +1,75 @@
+import unittest
+import sys
+import os
+
+# Adjust path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from search_cache import LRUTTLCache, normalize_query
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUTTLCache(unittest.TestCase):
+
+    def test_hit_and_miss_counters(self):
+        cache = LRUTTLCache(maxsize=4, ttl=60)
+        self.assertIsNone(cache.get("mensa"))
+        cache.put("mensa", [1, 2])
+        self.assertEqual(cache.get("mensa"), [1, 2])
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_lru_eviction(self):
+        cache = LRUTTLCache(maxsize=2, ttl=60)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")          # "b" is now least recently used
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_ttl_expiry(self):
+        clock = FakeClock()
+        cache = LRUTTLCache(maxsize=2, ttl=10, timer=clock)
+        cache.put("exam dates", "v")
+        clock.now = 9.9
+        self.assertEqual(cache.get("exam dates"), "v")
+        clock.now = 10.0
+        self.assertIsNone(cache.get("exam dates"))
+        self.assertEqual(cache.expirations, 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_clear_counts_invalidation(self):
+        cache = LRUTTLCache(maxsize=2, ttl=10)
+        cache.put("a", 1)
+        cache.clear()
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.invalidations, 1)
+
+    def test_put_after_clear_is_dropped_for_old_generation(self):
+        cache = LRUTTLCache(maxsize=2, ttl=10)
+        generation = cache.generation
+        cache.clear()  # 空缓存清空也要推进 generation
+        cache.put("a", 1, generation)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stale_puts, 1)
+
+        cache.put("a", 2, cache.generation)
+        self.assertEqual(cache.get("a"), 2)
+
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query("  Informatics   MASTER "), "informatics master")
+
+
+if __name__ == '__main__':
+    unittest.main()
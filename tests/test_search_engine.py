@@ -1,5 +1,7 @@
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, AsyncMock, patch
+import asyncio
+import threading
 import numpy as np
 import sys
 import os
@@ -7,10 +9,37 @@ import os
 # Adjust path to import modules from parent directory
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from search_engine import gauss_rank_norm, search
+from clip_encoder import set_encoder
+from search_engine import gauss_rank_norm, fuse_scores, top_k_indices, search, search_async, get_query_vector_async
+from search_cache import query_vector_cache, search_result_cache, invalidate_search_results
+
+
+class FakeEncoder:
+    """Stand-in for ClipEncoder that never loads a model."""
+    def __init__(self, dim=2):
+        self.dim = dim
+        self.calls = []
+
+    def encode_texts(self, texts):
+        self.calls.append(list(texts))
+        vecs = np.ones((len(texts), self.dim), dtype=np.float32)
+        return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+    def encode_text(self, text):
+        return self.encode_texts([text])[0]
+
 
 class TestSearchEngine(unittest.TestCase):
 
+    def setUp(self):
+        self.encoder = FakeEncoder()
+        set_encoder(self.encoder)
+        query_vector_cache.clear()
+        search_result_cache.clear()
+
+    def tearDown(self):
+        set_encoder(None)
+
     def test_gauss_rank_norm(self):
         scores = [0.1, 0.5, 0.9]
         norm_scores = gauss_rank_norm(scores)
@@ -22,25 +51,34 @@ class TestSearchEngine(unittest.TestCase):
         # Test empty
         self.assertEqual(gauss_rank_norm([]), [])
 
+    def test_fuse_scores_matches_rank_norm(self):
+        sims = [0.9, 0.1, 0.5]
+        prs = [0.0, 1.0, 0.5]
+        scores = fuse_scores(sims, prs, w_sim=0.7, w_pr=0.3)
+        expected = [0.7 * s + 0.3 * p for s, p in zip(gauss_rank_norm(sims), gauss_rank_norm(prs))]
+        np.testing.assert_allclose(scores, expected)
+        # Weights are configurable
+        np.testing.assert_allclose(fuse_scores(sims, prs, w_sim=1.0, w_pr=0.0), gauss_rank_norm(sims))
+        self.assertEqual(fuse_scores([], []).shape, (0,))
+
+    def test_top_k_indices(self):
+        scores = np.array([0.2, 0.9, 0.5, 0.9, 0.1])
+        # Sorted descending, ties keep original order
+        self.assertEqual(top_k_indices(scores, 3).tolist(), [1, 3, 2])
+        self.assertEqual(top_k_indices(scores, 10).tolist(), [1, 3, 2, 0, 4])
+        self.assertEqual(top_k_indices(scores, 0).tolist(), [])
+
+        # Ties straddling the k-th place are broken by position, like a stable full sort
+        rng = np.random.default_rng(0)
+        for _ in range(50):
+            scores = rng.integers(0, 4, size=40).astype(np.float64)
+            k = int(rng.integers(1, 40))
+            expected = np.argsort(-scores, kind="stable")[:k]
+            self.assertEqual(top_k_indices(scores, k).tolist(), expected.tolist())
+
     @patch('search_engine.client')
-    @patch('search_engine.clip_model')
-    @patch('search_engine.clip_processor')
     @patch('search_engine.consistency_engine')
-    def test_search(self, mock_consistency, mock_processor, mock_model, mock_client):
-        # Mock CLIP
-        mock_processor.return_value = {'input_ids': 'fake'}
-        
-        mock_features = MagicMock()
-        # Return a tensor that supports .norm() and .numpy()
-        mock_tensor = MagicMock()
-        mock_tensor.norm.return_value = 1.0
-        mock_tensor.__truediv__.return_value = mock_tensor
-        mock_tensor.__getitem__.return_value = mock_tensor
-        mock_tensor.numpy.return_value = np.array([[0.1, 0.2]])
-        mock_tensor.tolist.return_value = [0.1, 0.2]
-        
-        mock_model.get_text_features.return_value = mock_tensor
-
+    def test_search(self, mock_consistency, mock_client):
         # Mock Qdrant Search
         mock_hit = MagicMock()
         mock_hit.id = "test_id_1"
@@ -51,7 +89,7 @@ class TestSearchEngine(unittest.TestCase):
             "url": "http://example.com",
             "content_preview": "Test Content"
         }
-        mock_client.search.return_value = [mock_hit]
+        mock_client.query_points.return_value.points = [mock_hit]
 
         # Mock Consistency Engine
         mock_consistency.check_consistency.return_value = (True, 0.1)
@@ -65,30 +103,19 @@ class TestSearchEngine(unittest.TestCase):
         self.assertEqual(results[0]['url'], "http://example.com")
         
         # Verify calls
-        mock_client.search.assert_called_once()
+        mock_client.query_points.assert_called_once()
         mock_consistency.check_consistency.assert_called_once()
+        self.assertEqual(self.encoder.calls, [["test query"]])
 
     @patch('search_engine.client')
-    @patch('search_engine.clip_model')
-    @patch('search_engine.clip_processor')
     @patch('search_engine.consistency_engine')
-    def test_search_consistency_failure(self, mock_consistency, mock_processor, mock_model, mock_client):
-        # Mock CLIP (same as above)
-        mock_processor.return_value = {'input_ids': 'fake'}
-        mock_tensor = MagicMock()
-        mock_tensor.norm.return_value = 1.0
-        mock_tensor.__truediv__.return_value = mock_tensor
-        mock_tensor.__getitem__.return_value = mock_tensor
-        mock_tensor.numpy.return_value = np.array([[0.1, 0.2]])
-        mock_tensor.tolist.return_value = [0.1, 0.2]
-        mock_model.get_text_features.return_value = mock_tensor
-
+    def test_search_consistency_failure(self, mock_consistency, mock_client):
         # Mock Qdrant Search
         mock_hit = MagicMock()
         mock_hit.id = "test_id_blocked"
         mock_hit.score = 0.9
         mock_hit.payload = {}
-        mock_client.search.return_value = [mock_hit]
+        mock_client.query_points.return_value.points = [mock_hit]
 
         # Mock Consistency Engine to FAIL
         mock_consistency.check_consistency.return_value = (False, 10.0)
@@ -99,5 +126,153 @@ class TestSearchEngine(unittest.TestCase):
         # Should be empty because the only result was blocked
         self.assertEqual(len(results), 0)
 
+    @patch('search_engine.client')
+    @patch('search_engine.consistency_engine')
+    def test_search_result_cache(self, mock_consistency, mock_client):
+        mock_hit = MagicMock()
+        mock_hit.id = "cached_id"
+        mock_hit.score = 0.8
+        mock_hit.payload = {"pr_score": 0.1, "type": "text", "url": "http://mensa.example"}
+        mock_client.query_points.return_value.points = [mock_hit]
+        mock_consistency.check_consistency.return_value = (True, 0.0)
+
+        first = search("Mensa", top_k=5)
+        second = search("  mensa ", top_k=5)
+
+        self.assertEqual(first, second)
+        mock_client.query_points.assert_called_once()
+        self.assertEqual(len(self.encoder.calls), 1)
+
+        # Space X changed -> results recomputed, query vector still cached
+        invalidate_search_results()
+        search("mensa", top_k=5)
+        self.assertEqual(mock_client.query_points.call_count, 2)
+        self.assertEqual(len(self.encoder.calls), 1)
+
+    @patch('search_engine.client')
+    @patch('search_engine.consistency_engine')
+    def test_invalidation_during_search_is_not_overwritten(self, mock_consistency, mock_client):
+        mock_hit = MagicMock()
+        mock_hit.id = "stale_id"
+        mock_hit.score = 0.8
+        mock_hit.payload = {"pr_score": 0.1, "type": "text", "url": "http://mensa.example"}
+        mock_consistency.check_consistency.return_value = (True, 0.0)
+
+        # Space X changes while the Qdrant query is in flight
+        def query_then_invalidate(*args, **kwargs):
+            invalidate_search_results()
+            return MagicMock(points=[mock_hit])
+        mock_client.query_points.side_effect = query_then_invalidate
+
+        search("Mensa", top_k=5)
+        self.assertEqual(len(search_result_cache), 0)
+
+        search("Mensa", top_k=5)
+        self.assertEqual(mock_client.query_points.call_count, 2)
+
+    @patch('search_engine.random.random', return_value=1.0)  # disable exploration
+    @patch('search_engine.client')
+    @patch('search_engine.consistency_engine')
+    def test_search_fetches_full_text_only_for_final_results(self, mock_consistency, mock_client, _mock_random):
+        hits = []
+        for i in range(6):
+            hit = MagicMock()
+            hit.id = f"id_{i}"
+            hit.score = 1.0 - i * 0.1
+            hit.payload = {"pr_score": 0.1, "type": "text", "url": f"http://x/{i}", "content_preview": "preview"}
+            hits.append(hit)
+        mock_client.query_points.return_value.points = hits
+        mock_consistency.check_consistency.return_value = (True, 0.0)
+
+        def fake_retrieve(collection_name, ids, with_payload, with_vectors):
+            return [MagicMock(id=i, payload={"full_text": f"long text about garching {i}"}) for i in ids]
+        mock_client.retrieve.side_effect = fake_retrieve
+
+        results = search("garching", top_k=2)
+
+        # Candidate stage must not ship full_text
+        self.assertEqual(
+            mock_client.query_points.call_args.kwargs["with_payload"],
+            ["url", "type", "pr_score", "content_preview"]
+        )
+        # One retrieve, only for the returned ids
+        mock_client.retrieve.assert_called_once()
+        self.assertEqual(mock_client.retrieve.call_args.kwargs["ids"], [r["id"] for r in results])
+        for r in results:
+            self.assertIn("[[HIGHLIGHT]]garching[[/HIGHLIGHT]]", r["highlighted_snippet"])
+
+        # Cache hit reuses the stored snippets without fetching again
+        search("garching", top_k=2)
+        mock_client.retrieve.assert_called_once()
+
+    @patch('search_engine.random.random', return_value=1.0)  # disable exploration
+    @patch('search_engine.client')
+    @patch('search_engine.consistency_engine')
+    def test_failed_snippet_fetch_is_not_cached(self, mock_consistency, mock_client, _mock_random):
+        hit = MagicMock()
+        hit.id = "id_0"
+        hit.score = 0.9
+        hit.payload = {"pr_score": 0.1, "type": "text", "url": "http://x/0", "content_preview": "preview"}
+        mock_client.query_points.return_value.points = [hit]
+        mock_consistency.check_consistency.return_value = (True, 0.0)
+        mock_client.retrieve.side_effect = [
+            RuntimeError("qdrant down"),
+            [MagicMock(id="id_0", payload={"full_text": "full text about garching"})],
+        ]
+
+        # 正文获取失败时退回预览，但降级的摘要不进缓存
+        self.assertNotIn("[[HIGHLIGHT]]", search("garching", top_k=1)[0]["highlighted_snippet"])
+        results = search("garching", top_k=1)
+        self.assertEqual(mock_client.retrieve.call_count, 2)
+        self.assertIn("[[HIGHLIGHT]]garching[[/HIGHLIGHT]]", results[0]["highlighted_snippet"])
+        mock_client.query_points.assert_called_once()
+
+    @patch('search_engine.random.random', return_value=1.0)  # disable exploration
+    @patch('search_engine.client')
+    @patch('search_engine.async_store')
+    @patch('search_engine.consistency_engine')
+    def test_search_async_uses_async_store(self, mock_consistency, mock_store, mock_client, _mock_random):
+        hit = MagicMock()
+        hit.id = "async_id"
+        hit.score = 0.9
+        hit.payload = {"pr_score": 0.2, "type": "text", "url": "http://async.example", "content_preview": "p"}
+        mock_store.query_points = AsyncMock(return_value=[hit])
+        mock_store.retrieve = AsyncMock(return_value=[MagicMock(id="async_id", payload={"full_text": "async garching"})])
+        mock_consistency.check_consistency.return_value = (True, 0.0)
+
+        results = asyncio.run(search_async("garching", top_k=5, query_vector=np.ones(2)))
+
+        self.assertEqual([r["id"] for r in results], ["async_id"])
+        self.assertIn("[[HIGHLIGHT]]garching[[/HIGHLIGHT]]", results[0]["highlighted_snippet"])
+        mock_store.query_points.assert_awaited_once()
+        mock_store.retrieve.assert_awaited_once()
+        # The blocking client is never touched on the async path
+        mock_client.query_points.assert_not_called()
+        mock_client.retrieve.assert_not_called()
+        # Shares the result cache with search()
+        self.assertEqual(search("garching", top_k=5), results)
+        mock_client.query_points.assert_not_called()
+
+    def test_async_query_vector_is_encoded_off_the_event_loop(self):
+        loop_thread = []
+
+        class ThreadRecordingEncoder(FakeEncoder):
+            def encode_texts(self, texts):
+                loop_thread.append(threading.current_thread() is threading.main_thread())
+                return super().encode_texts(texts)
+
+        set_encoder(ThreadRecordingEncoder())
+        vec = asyncio.run(get_query_vector_async("Garching"))
+        self.assertEqual(loop_thread, [False])
+        # 命中缓存时不再编码
+        np.testing.assert_array_equal(asyncio.run(get_query_vector_async("garching ")), vec)
+        self.assertEqual(loop_thread, [False])
+
+        batcher = MagicMock()
+        batcher.encode = AsyncMock(return_value=np.zeros(2, dtype=np.float32))
+        asyncio.run(get_query_vector_async("mensa", batcher))
+        batcher.encode.assert_awaited_once_with("mensa")
+        self.assertEqual(loop_thread, [False])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+import tempfile
+import json
+import numpy as np
+
+# Adjust path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from space_projection import SpaceXProjection, AnchorIndex, project_scores, project_scores_topk
+
+
+def make_point(point_id, vector):
+    point = MagicMock()
+    point.id = point_id
+    point.vector = {"clip": vector}
+    return point
+
+
+class TestSpaceXProjection(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.tmpdir.name, "projection.json")
+        self.r_vecs = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+        self.r_scores = np.array([0.6, 0.4])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def job(self, client, page_size=2):
+        return SpaceXProjection(client, "x", ["r1", "r2"], self.r_vecs, self.r_scores,
+                                page_size=page_size, checkpoint_path=self.checkpoint)
+
+    def test_project_scores_matches_per_point_loop(self):
+        rng = np.random.default_rng(0)
+        x = rng.standard_normal((7, 4)).astype(np.float32)
+        r = rng.standard_normal((3, 4)).astype(np.float32)
+        scores = rng.random(3).astype(np.float32)
+
+        expected = [float(np.sum(np.maximum(r @ v, 0) * scores)) for v in x]
+        np.testing.assert_allclose(project_scores(x, r, scores), expected, rtol=1e-5)
+
+    def test_topk_projection_sums_only_nearest_positive_anchors(self):
+        rng = np.random.default_rng(1)
+        r = rng.standard_normal((50, 8)).astype(np.float32)
+        x = rng.standard_normal((6, 8)).astype(np.float32)
+        scores = rng.random(50)
+
+        # 原 ingest_data 的逐锚点实现：正相关的锚点按相似度排序取前 5
+        expected = []
+        for v in x:
+            sims = sorted((s for s in zip(r @ v, scores) if s[0] > 0), key=lambda s: s[0], reverse=True)[:5]
+            expected.append(sum(sim * pr for sim, pr in sims))
+
+        index = AnchorIndex(r)
+        self.assertIsNone(index.hnsw)  # 锚点少于 ANCHOR_ANN_MIN_SIZE，走精确平面检索
+        np.testing.assert_allclose(project_scores_topk(x, index, scores, 5), expected, rtol=1e-5)
+        # k 大于锚点数时等价于对全部锚点求和
+        np.testing.assert_allclose(project_scores_topk(x, index, scores, 100), project_scores(x, r, scores), rtol=1e-5)
+
+    def test_run_writes_only_pr_score_per_page(self):
+        client = MagicMock()
+        client.scroll.side_effect = [
+            ([make_point("a", [1.0, 0.0]), make_point("b", [0.0, -1.0])], "c"),
+            ([make_point("c", [0.0, 1.0])], None),
+        ]
+
+        self.assertEqual(self.job(client).run(), 3)
+
+        client.upsert.assert_not_called()
+        self.assertEqual(client.batch_update_points.call_count, 2)
+        # 每页确认写入后才推进检查点
+        self.assertTrue(all(c.kwargs["wait"] for c in client.batch_update_points.call_args_list))
+        ops = client.batch_update_points.call_args_list[0].kwargs["update_operations"]
+        self.assertEqual([op.set_payload.points for op in ops], [["a"], ["b"]])
+        self.assertAlmostEqual(ops[0].set_payload.payload["pr_score"], 0.6, places=5)
+        self.assertEqual(ops[1].set_payload.payload["pr_score"], 0.0)
+        # 只取向量，不拉 payload
+        self.assertFalse(client.scroll.call_args.kwargs["with_payload"])
+        # 完成后清除检查点
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def interrupted_run(self):
+        failing = MagicMock()
+        failing.scroll.side_effect = [
+            ([make_point("a", [1.0, 0.0]), make_point("b", [0.0, 1.0])], "c"),
+            ConnectionError("timeout"),
+        ]
+        with self.assertRaises(ConnectionError):
+            self.job(failing).run()
+
+    def test_run_resumes_from_checkpoint(self):
+        self.interrupted_run()
+        with open(self.checkpoint) as f:
+            self.assertEqual(json.load(f)["offset"], "c")
+
+        client = MagicMock()
+        client.scroll.return_value = ([make_point("c", [0.0, 1.0])], None)
+        self.assertEqual(self.job(client).run(), 3)
+        self.assertEqual(client.scroll.call_args.kwargs["offset"], "c")
+
+        # Space R 排名变了：旧进度作废，从头开始
+        self.interrupted_run()
+        client.scroll.reset_mock()
+        self.r_scores = np.array([0.5, 0.5])
+        self.job(client).run()
+        self.assertIsNone(client.scroll.call_args.kwargs["offset"])
+
+if __name__ == '__main__':
+    unittest.main()
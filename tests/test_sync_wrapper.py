@@ -0,0 +1,73 @@
+import unittest
+import sys
+import os
+import asyncio
+import threading
+
+# Adjust path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from crawler_v2.sync_wrapper import SyncCrawlerWrapper
+
+
+class TestSyncCrawlerWrapper(unittest.TestCase):
+
+    def setUp(self):
+        self.wrapper = SyncCrawlerWrapper(concurrency=2)
+        self.calls = []
+
+        async def fake_process_url(session, url):
+            # 记录每次调用所在的事件循环和会话
+            self.calls.append((asyncio.get_running_loop(), session, threading.current_thread().name))
+            if url.endswith("/bad"):
+                raise ValueError("boom")
+            if url.endswith("/none"):
+                return None
+            return {"url": url, "texts": [], "images": [], "links": []}
+
+        self.wrapper.async_crawler.process_url = fake_process_url
+
+    def tearDown(self):
+        self.wrapper.close()
+
+    def test_parse_many_returns_aligned_results(self):
+        urls = ["http://a/1", "http://a/bad", "http://a/none", "http://a/2"]
+        results = self.wrapper.parse_many(urls)
+        self.assertEqual([r["url"] if r else None for r in results], ["http://a/1", None, None, "http://a/2"])
+
+    def test_calls_share_one_loop_and_session(self):
+        self.wrapper.parse("http://a/1")
+        self.wrapper.parse_many(["http://a/2", "http://a/3"])
+        self.wrapper.parse("http://a/4")
+
+        loops = {id(loop) for loop, _, _ in self.calls}
+        sessions = {id(session) for _, session, _ in self.calls}
+        self.assertEqual(len(self.calls), 4)
+        self.assertEqual(len(loops), 1)
+        self.assertEqual(len(sessions), 1)
+        self.assertTrue(all(name == "crawler-loop" for _, _, name in self.calls))
+
+    def test_parse_many_timeout_cancels_pending_fetches(self):
+        cancelled = threading.Event()
+
+        async def hanging_process_url(session, url):
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        self.wrapper.async_crawler.process_url = hanging_process_url
+        self.assertEqual(self.wrapper.parse_many(["http://a/slow"], timeout=0.1), [None])
+        # 超时后循环中的抓取被取消，而不是继续占着并发名额
+        self.assertTrue(cancelled.wait(2))
+
+    def test_close_releases_session(self):
+        session = self.wrapper.session
+        self.wrapper.close()
+        self.assertTrue(session.closed)
+        # 关闭后再次使用会重新启动循环
+        self.assertEqual(self.wrapper.parse_many(["http://a/1"])[0]["url"], "http://a/1")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,16 @@
 import unittest
 from unittest.mock import MagicMock, patch
 import sys
+import numpy as np
 import os
+import tempfile
 
 # Adjust path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from system_manager import SystemManager, SPACE_X, SPACE_R
+from interaction_manager import InteractionManager
+from crawler_v2.durable_frontier import DurableFrontier
 
 class TestSystemManager(unittest.TestCase):
 
@@ -59,23 +63,23 @@ class TestSystemManager(unittest.TestCase):
 
     @patch('system_manager.client')
     @patch('system_manager.crawler')
-    @patch('system_manager.get_embedding')
-    def test_process_url_and_add(self, mock_get_embedding, mock_crawler, mock_client):
+    @patch('system_manager.embed_texts')
+    def test_process_url_and_add(self, mock_embed_texts, mock_crawler, mock_client):
         # Mock crawler
         mock_crawler.parse.return_value = {
             'texts': ["Content 1", "Content 2"],
             'images': []
         }
         
-        # Mock embedding
-        mock_get_embedding.return_value = [0.1]*512
+        # Mock embedding (整页一次批量编码)
+        mock_embed_texts.return_value = np.full((2, 512), 0.1, dtype=np.float32)
         
         # Mock novelty check. 
         # _check_novelty uses self.r_cache.
         # We can mock _check_novelty method on the instance since it is a method.
         with patch.object(self.mgr, '_check_novelty', return_value=(True, 1.0)):
             # Mock trigger_global_recalculation to avoid complex logic
-            with patch.object(self.mgr, 'trigger_global_recalculation') as mock_trigger:
+            with patch.object(self.mgr, 'trigger_global_recalculation'):
                 self.mgr.process_url_and_add("http://test.com")
                 
                 # Should call upsert to SPACE_R (because novel)
@@ -83,9 +87,114 @@ class TestSystemManager(unittest.TestCase):
                 r_calls = [c for c in calls if c.kwargs['collection_name'] == SPACE_R]
                 self.assertTrue(len(r_calls) > 0)
                 
-                # Should also call upsert to SPACE_X
+                # Should also call upsert to SPACE_X (one batched upsert for the page)
                 x_calls = [c for c in calls if c.kwargs['collection_name'] == SPACE_X]
-                self.assertTrue(len(x_calls) > 0)
+                self.assertEqual(len(x_calls), 1)
+                self.assertEqual(len(x_calls[0].kwargs['points']), 2)
+                mock_embed_texts.assert_called_once_with(["Content 1", "Content 2"])
+
+    @patch('system_manager.client')
+    @patch('system_manager.crawler')
+    @patch('system_manager.embed_texts')
+    def test_page_promotions_trigger_one_recalc_after_x_upsert(self, mock_embed_texts, mock_crawler, mock_client):
+        mock_crawler.parse.return_value = {'texts': ["Content 1", "Content 2", "Content 3"], 'images': []}
+        mock_embed_texts.return_value = np.eye(3, 512, dtype=np.float32)
+        x_written = []
+
+        def on_changed(added=None, removed_ids=None):
+            x_calls = [c for c in mock_client.upsert.call_args_list if c.kwargs['collection_name'] == SPACE_X]
+            x_written.append(len(x_calls))
+
+        with patch.object(self.mgr, '_check_novelty', return_value=(True, 1.0)), \
+                patch.object(self.mgr, '_on_space_r_changed', side_effect=on_changed) as mock_changed:
+            self.mgr.process_url_and_add("http://test.com")
+
+        mock_changed.assert_called_once()
+        self.assertEqual(len(mock_changed.call_args.kwargs['added']), 3)
+        self.assertEqual(x_written, [1])
+
+    @patch('system_manager.SPACE_X_PROJECTION_DELAY', 0.05)
+    def test_space_x_projection_is_coalesced(self):
+        with patch.object(self.mgr, '_update_space_x_scores') as mock_projection:
+            for _ in range(5):
+                self.mgr._schedule_space_x_projection()
+            mock_projection.assert_not_called()
+            self.mgr._projection_timer.join()
+            mock_projection.assert_called_once()
+
+            # 排队中的投影可以被立即执行
+            self.mgr._schedule_space_x_projection()
+            self.mgr.flush_space_x_projection()
+            self.assertEqual(mock_projection.call_count, 2)
+            self.assertIsNone(self.mgr._projection_timer)
+
+    @patch('system_manager.client')
+    def test_promotion_and_delete_update_rank_graph_incrementally(self, mock_client):
+        graph = MagicMock()
+        graph.update.return_value = (3, 1e-7)
+        graph.ranks.return_value = {"anchor_1": 0.6, "test_id": 0.4}
+        self.mgr.rank_graph = graph
+        self.mgr.r_cache = [MagicMock(id="anchor_1", vector={"clip": [1.0, 0.0]})]
+
+        mock_point = MagicMock()
+        mock_point.id = "test_id"
+        mock_point.vector = {"clip": [0.0, 1.0]}
+        mock_point.payload = {"url": "http://test.com"}
+        mock_client.retrieve.return_value = [mock_point]
+        mock_client.scroll.return_value = ([], None)
+
+        with patch.object(self.mgr, 'trigger_global_recalculation') as mock_full, \
+                patch.object(self.mgr, '_schedule_space_x_projection') as mock_projection:
+            self.assertTrue(self.mgr.promote_from_x_to_r("test_id"))
+            ids, vectors = graph.add_nodes.call_args.args
+            self.assertEqual(ids, ["test_id"])
+            self.assertEqual(vectors.dtype, np.float32)
+            self.assertEqual(vectors.tolist(), [[0.0, 1.0]])
+            self.assertEqual(self.mgr.r_ranks, {"anchor_1": 0.6, "test_id": 0.4})
+            self.assertEqual([str(p.id) for p in self.mgr.r_cache], ["anchor_1", "test_id"])
+
+            self.mgr.delete_item(SPACE_R, "anchor_1")
+            graph.remove_nodes.assert_called_once_with(["anchor_1"])
+            self.assertEqual([str(p.id) for p in self.mgr.r_cache], ["test_id"])
+
+            # No full Space R rebuild for single changes; Space X projection is deferred
+            mock_full.assert_not_called()
+            self.assertEqual(mock_projection.call_count, 2)
+
+    def test_resume_unfinished_crawls_uses_stored_params(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        path = os.path.join(tmpdir.name, "crawl_state.db")
+        DurableFrontier(path, "c1", start_url="http://a.de/", params={"max_depth": 3, "max_pages": 40}).close()
+        done = DurableFrontier(path, "c2", start_url="http://b.de/")
+        done.finish()
+        done.close()
+
+        with patch('system_manager.CRAWL_STATE_DB', path), \
+                patch.object(self.mgr, 'process_url_recursive', return_value=7) as mock_crawl:
+            self.assertEqual(self.mgr.resume_unfinished_crawls(), {"c1": 7})
+        mock_crawl.assert_called_once_with("http://a.de/", max_depth=3, max_pages=40, crawl_id="c1")
+
+    def test_interaction_arrays_are_index_aligned(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.mgr.interaction_mgr = InteractionManager(storage_path=os.path.join(tmpdir.name, "interactions.json"))
+        self.mgr.interaction_mgr.interactions["a"]["clicks"] = 2
+        self.mgr.interaction_mgr.transitions.update({
+            "c": {"b": 4, "a": 5},
+            "a": {"b": 3, "gone": 1},
+            "gone": {"a": 1},
+        })
+
+        weights, src, dst, counts = self.mgr._interaction_arrays(["a", "b", "c"])
+
+        self.assertEqual(weights.tolist(), [2.0, 1.0, 1.0])
+        # 按 (src, dst) 排序：每个源节点一段连续、按目标有序的切片
+        self.assertEqual(
+            (src.tolist(), dst.tolist(), counts.tolist()),
+            ([0, 2, 2], [1, 0, 1], [3, 5, 4])
+        )
+        self.assertEqual(src.dtype, np.int64)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+
+# Adjust path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from url_index import UrlIndex
+
+
+def record(url):
+    p = MagicMock()
+    p.payload = {"url": url}
+    return p
+
+
+class FakeClient:
+    """按 MatchAny 过滤返回库中存在的 URL"""
+
+    def __init__(self, stored):
+        self.stored = list(stored)
+        self.calls = []
+
+    def scroll(self, collection_name, scroll_filter=None, limit=10, offset=None, **kwargs):
+        self.calls.append((scroll_filter, kwargs))
+        if scroll_filter is None:
+            page = self.stored[offset or 0:(offset or 0) + limit]
+            next_offset = (offset or 0) + limit
+            return [record(u) for u in page], (next_offset if next_offset < len(self.stored) else None)
+        wanted = scroll_filter.must[0].match.any
+        return [record(u) for u in self.stored if u in wanted], None
+
+
+class TestUrlIndex(unittest.TestCase):
+
+    def test_lookup_queries_only_unknown_urls_in_chunks(self):
+        client = FakeClient(["u1", "u3", "u5"])
+        index = UrlIndex(client, chunk_size=2)
+        index.add("x", ["u1"])
+
+        found = index.lookup("x", ["u1", "u2", "u3", "u4", "u5", "u3"])
+        self.assertEqual(found, {"u1", "u3", "u5"})
+        # u1 本地命中；其余 4 个 URL 分 2 块查询
+        self.assertEqual(len(client.calls), 2)
+        self.assertEqual(client.calls[0][0].must[0].match.any, ["u2", "u3"])
+        self.assertEqual(client.calls[0][1]["with_payload"], ["url"])
+
+        # 查到的 URL 进入本地集合，再次查询不访问数据库
+        client.calls.clear()
+        self.assertEqual(index.lookup("x", ["u3", "u5"]), {"u3", "u5"})
+        self.assertEqual(client.calls, [])
+
+    def test_warm_scrolls_url_payload_only(self):
+        client = FakeClient([f"u{i}" for i in range(5)])
+        index = UrlIndex(client)
+        self.assertEqual(index.warm("x", page_size=2), 5)
+        self.assertIn("x", index.warmed)
+        self.assertTrue(index.known("x", "u4"))
+        self.assertFalse(client.calls[0][1]["with_vectors"])
+
+        index.discard("x", ["u4"])
+        self.assertFalse(index.known("x", "u4"))
+        self.assertFalse(index.known("r", "u1"))
+
+if __name__ == '__main__':
+    unittest.main()
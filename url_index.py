@@ -0,0 +1,114 @@
+"""
+URL 存在性索引 - 批量判断 URL 是否已在 Qdrant 集合中
+
+- 本地哈希集合记录已知存在的 URL：启动时用只取 url 字段的 scroll 预热，
+  本进程写入新页面时同步登记；命中直接返回，不访问数据库
+- 未命中的 URL 按块用 MatchAny（url 关键字索引）一次过滤查询，
+  10 万行 CSV 由 10 万次往返变为几百次
+- 其他脚本（ingest_data、xml_dump_processor 等）也会直接写库，所以本地未命中不代表不存在，
+  只有正向结果被缓存
+"""
+import threading
+from typing import Dict, Iterable, Set
+
+from qdrant_client.http import models
+
+URL_LOOKUP_CHUNK = 256
+URL_WARM_PAGE_SIZE = 2048
+URL_LOOKUP_TIMEOUT = 10  # 单次过滤查询的超时（秒）
+
+
+class UrlIndex:
+    """按集合维护已知 URL 集合，并提供批量存在性查询"""
+
+    def __init__(self, client, chunk_size: int = URL_LOOKUP_CHUNK):
+        self.client = client
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self._known: Dict[str, Set[str]] = {}
+        self.warmed: Set[str] = set()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(urls) for urls in self._known.values())
+
+    def add(self, collection_name: str, urls: Iterable[str]):
+        """登记已写入集合的 URL"""
+        urls = [u for u in urls if u]
+        if not urls:
+            return
+        with self._lock:
+            self._known.setdefault(collection_name, set()).update(urls)
+
+    def discard(self, collection_name: str, urls: Iterable[str]):
+        """URL 对应的点被删除后移出本地集合"""
+        with self._lock:
+            known = self._known.get(collection_name)
+            if known:
+                known.difference_update(urls)
+
+    def known(self, collection_name: str, url: str) -> bool:
+        """只查本地集合（不访问数据库）"""
+        with self._lock:
+            return url in self._known.get(collection_name, ())
+
+    def warm(self, collection_name: str, page_size: int = URL_WARM_PAGE_SIZE) -> int:
+        """用只取 url 字段的 scroll 预热本地集合，返回载入的 URL 数"""
+        offset = None
+        loaded = 0
+        while True:
+            batch, offset = self.client.scroll(
+                collection_name=collection_name,
+                limit=page_size,
+                offset=offset,
+                with_payload=["url"],
+                with_vectors=False,
+            )
+            urls = [(p.payload or {}).get("url") for p in batch]
+            self.add(collection_name, urls)
+            loaded += len(batch)
+            if offset is None:
+                break
+        self.warmed.add(collection_name)
+        return loaded
+
+    def lookup(self, collection_name: str, urls: Iterable[str]) -> Set[str]:
+        """
+        批量存在性查询
+
+        Returns:
+            urls 中已存在于集合的那部分
+        """
+        urls = list(dict.fromkeys(u for u in urls if u))
+        with self._lock:
+            known = self._known.get(collection_name, ())
+            found = {u for u in urls if u in known}
+        missing = [u for u in urls if u not in found]
+
+        for start in range(0, len(missing), self.chunk_size):
+            chunk = missing[start:start + self.chunk_size]
+            hits = self._query(collection_name, chunk)
+            self.add(collection_name, hits)
+            found.update(hits)
+        return found
+
+    def _query(self, collection_name: str, urls) -> Set[str]:
+        """一次 MatchAny 过滤查询（同一 URL 可能有多个点，翻页直到取完）"""
+        wanted = set(urls)
+        hits = set()
+        offset = None
+        while True:
+            batch, offset = self.client.scroll(
+                collection_name=collection_name,
+                scroll_filter=models.Filter(
+                    must=[models.FieldCondition(key="url", match=models.MatchAny(any=list(urls)))]
+                ),
+                limit=len(urls),
+                offset=offset,
+                with_payload=["url"],
+                with_vectors=False,
+                timeout=URL_LOOKUP_TIMEOUT,
+            )
+            hits.update(u for u in ((p.payload or {}).get("url") for p in batch) if u in wanted)
+            if offset is None or hits == wanted:
+                return hits
@@ -1,3 +1,5 @@
+import sys
+
 import visual_rank_engine
 import numpy as np
 
@@ -30,18 +32,21 @@ def test_pagerank():
     iterations = 30
     
     try:
-        ranks = visual_rank_engine.calculate_hnsw_pagerank(
+        ranks, iters_run, residual = visual_rank_engine.calculate_hnsw_pagerank(
             ids,
             vectors,
             interaction_weights,
             transitions,
             m_neighbors,
             damping,
-            iterations
+            iterations,
+            1e-8  # tolerance
         )
         
         print("Calculation successful!")
         print("Ranks:", ranks)
+        print(f"Iterations: {iters_run}, residual: {residual:.2e}")
+        assert iters_run <= iterations
         
         # Basic assertions
         assert len(ranks) == 3
@@ -51,11 +56,124 @@ def test_pagerank():
         assert ranks["B"] > ranks["C"]
         
         print("✅ Verification Passed!")
+        return True
         
     except Exception as e:
         print(f"❌ Verification Failed: {e}")
         import traceback
         traceback.print_exc()
+        return False
+
+def test_incremental_graph():
+    print("Testing IncrementalRankGraph...")
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(200, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"n{i}" for i in range(200)]
+
+    try:
+        graph = visual_rank_engine.IncrementalRankGraph(5, 0.85)
+        graph.add_nodes(ids[:199], vectors[:199])
+        cold_iters, _ = graph.update()
+
+        # Single promotion: warm start should converge in far fewer iterations
+        graph.add_nodes(ids[199:], vectors[199:])
+        warm_iters, residual = graph.update()
+        ranks = graph.ranks()
+        assert len(ranks) == 200
+        assert abs(sum(ranks.values()) - 1.0) < 1e-4
+        print(f"Cold start: {cold_iters} iterations, warm start: {warm_iters} iterations (residual {residual:.2e})")
+
+        graph.remove_nodes(["n0"])
+        graph.update()
+        assert "n0" not in graph.ranks() and len(graph) == 199
+
+        print("✅ Incremental Verification Passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Incremental Verification Failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_array_input():
+    print("Testing calculate_hnsw_pagerank_array...")
+    vectors = np.array([[1.0, 0.0, 0.0], [0.9, 0.1, 0.0], [0.0, 0.0, 1.0]], dtype=np.float32)
+    weights = np.array([1.0, 2.0, 1.0])
+    # Transition A -> B (COO, node indices)
+    trans_src = np.array([0], dtype=np.int64)
+    trans_dst = np.array([1], dtype=np.int64)
+    trans_count = np.array([5], dtype=np.int64)
+
+    try:
+        ranks, iters_run, residual = visual_rank_engine.calculate_hnsw_pagerank_array(
+            vectors, weights, trans_src, trans_dst, trans_count, 2, 0.85, 30
+        )
+        print("Ranks:", ranks, f"({iters_run} iterations, residual {residual:.2e})")
+        assert isinstance(ranks, np.ndarray) and ranks.shape == (3,)
+        assert abs(ranks.sum() - 1.0) < 1e-4
+        assert ranks[1] > ranks[2]
+        print("✅ Array Verification Passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Array Verification Failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_anchor_hnsw():
+    print("Testing AnchorHnsw...")
+    rng = np.random.default_rng(1)
+    anchors = rng.normal(size=(500, 32)).astype(np.float32)
+    anchors /= np.linalg.norm(anchors, axis=1, keepdims=True)
+    queries = anchors[:10] + 0.01 * rng.normal(size=(10, 32)).astype(np.float32)
+
+    try:
+        index = visual_rank_engine.AnchorHnsw(anchors, 16, 128)
+        indices, sims = index.search(queries, 5)
+        assert len(index) == 500
+        assert indices.shape == (10, 5) and sims.shape == (10, 5)
+        # 扰动很小，最近邻应是各自的锚点
+        assert (indices[:, 0] == np.arange(10)).all()
+        assert (np.diff(sims, axis=1) <= 1e-6).all()
+        print("✅ AnchorHnsw Verification Passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ AnchorHnsw Verification Failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_temporal():
+    print("Testing calculate_temporal_pagerank...")
+    edges = np.array([[0, 1], [1, 2], [2, 0], [2, 1]], dtype=np.int64)
+    last_interactions = [0.0, 1.0, 2.0]
+
+    try:
+        from_array = visual_rank_engine.calculate_temporal_pagerank(3, edges, last_interactions, 0.85, 0.01, 50)
+        from_list = visual_rank_engine.calculate_temporal_pagerank(3, edges.tolist(), last_interactions, 0.85, 0.01, 50)
+        assert from_array.shape == (3,)
+        assert abs(from_array.sum() - 1.0) < 1e-6
+        assert np.allclose(from_array, from_list)
+        print("Ranks:", from_array)
+        print("✅ Temporal Verification Passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Temporal Verification Failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
 
 if __name__ == "__main__":
-    test_pagerank()
+    results = [
+        test_pagerank(),
+        test_array_input(),
+        test_incremental_graph(),
+        test_anchor_hnsw(),
+        test_temporal(),
+    ]
+    sys.exit(0 if all(results) else 1)
@@ -1,12 +1,229 @@
 use pyo3::prelude::*;
+use pyo3::exceptions::PyValueError;
 use std::collections::HashMap;
 use hnsw_rs::prelude::*;
 use rayon::prelude::*; // Import Rayon for parallelism
+use numpy::{IntoPyArray, PyArray1, PyArray2, PyReadonlyArray1, PyReadonlyArray2};
+
+/// HNSW construction defaults (hnsw_rs caps max_layer at 16)
+const DEFAULT_MAX_LAYER: usize = 16;
+const DEFAULT_EF_CONSTRUCTION: usize = 200;
+
+/// Edge weight shared by the batch and incremental engines:
+/// semantic similarity x target popularity x transition boost.
+#[inline]
+fn edge_weight(distance: f32, target_weight: f64, transition_count: Option<usize>) -> f64 {
+    let semantic_sim = (1.0_f32 - distance).max(0.0_f32) as f64;
+    let transition_boost = match transition_count {
+        Some(count) => 1.0 + (0.5 * (count as f64)),
+        None => 1.0,
+    };
+    semantic_sim * target_weight * transition_boost
+}
+
+/// Transition counts as one slice per source node, sorted by target index,
+/// built from COO arrays (duplicate pairs are summed).
+fn transition_lists(
+    n: usize,
+    pairs: impl Iterator<Item = (usize, usize, usize)>,
+) -> Vec<Vec<(usize, usize)>> {
+    let mut lists: Vec<Vec<(usize, usize)>> = vec![Vec::new(); n];
+    for (src, dst, count) in pairs {
+        lists[src].push((dst, count));
+    }
+    lists.par_iter_mut().for_each(|list| {
+        list.sort_unstable_by_key(|&(dst, _)| dst);
+        list.dedup_by(|next, kept| {
+            if next.0 == kept.0 {
+                kept.1 += next.1;
+                true
+            } else {
+                false
+            }
+        });
+    });
+    lists
+}
+
+#[inline]
+fn transition_count(lists: &[Vec<(usize, usize)>], src: usize, dst: usize) -> Option<usize> {
+    let list = lists.get(src)?;
+    list.binary_search_by_key(&dst, |&(t, _)| t).ok().map(|k| list[k].1)
+}
+
+/// Validate COO transition arrays against `n` nodes and yield (src, dst, count).
+fn coo_triples<'a>(
+    n: usize,
+    src: &'a [i64],
+    dst: &'a [i64],
+    count: &'a [i64],
+) -> PyResult<impl Iterator<Item = (usize, usize, usize)> + 'a> {
+    if src.len() != dst.len() || src.len() != count.len() {
+        return Err(PyValueError::new_err(
+            "trans_src, trans_dst and trans_count must have the same length",
+        ));
+    }
+    let in_range = |v: i64| v >= 0 && (v as usize) < n;
+    if !src.iter().all(|&v| in_range(v)) || !dst.iter().all(|&v| in_range(v)) {
+        return Err(PyValueError::new_err("transition index out of range"));
+    }
+    Ok(src
+        .iter()
+        .zip(dst)
+        .zip(count)
+        .map(|((&s, &d), &c)| (s as usize, d as usize, c.max(0) as usize)))
+}
+
+/// Borrow a C-contiguous (n, dim) float32 array as one flat slice.
+fn matrix_slice<'a>(vectors: &'a PyReadonlyArray2<'_, f32>) -> PyResult<(&'a [f32], usize, usize)> {
+    let (n, dim) = vectors.as_array().dim();
+    let flat = vectors
+        .as_slice()
+        .map_err(|_| PyValueError::new_err("vectors must be a C-contiguous float32 array"))?;
+    Ok((flat, n, dim))
+}
+
+/// Transposed (in-edge) CSR of the rank graph, built once per solve.
+///
+/// `weights` already hold `damping * w(i -> j) / total_out(i)`, so one
+/// iteration is a plain gather per target with no division and no shared
+/// writes.
+struct PullGraph {
+    indptr: Vec<usize>,
+    sources: Vec<usize>,
+    weights: Vec<f64>,
+    /// Live nodes with no usable out-weight; their rank is spread uniformly
+    dangling: Vec<usize>,
+}
+
+impl PullGraph {
+    fn build(adj_out: &[Vec<(usize, f64)>], is_dead: impl Fn(usize) -> bool + Sync, damping: f64) -> Self {
+        let n = adj_out.len();
+        // Out-weight totals do not change between iterations
+        let totals: Vec<f64> = adj_out
+            .par_iter()
+            .enumerate()
+            .map(|(i, edges)| {
+                if is_dead(i) {
+                    0.0
+                } else {
+                    edges.iter().map(|(_, w)| w).sum::<f64>()
+                }
+            })
+            .collect();
+        // Treat as dangling if total weight is 0 (e.g. all neighbors have 0 similarity)
+        let dangling: Vec<usize> = (0..n).filter(|&i| !is_dead(i) && totals[i] == 0.0).collect();
+
+        // Counting sort of the out-edges by target
+        let mut indptr = vec![0usize; n + 1];
+        for (i, edges) in adj_out.iter().enumerate() {
+            if totals[i] == 0.0 {
+                continue;
+            }
+            for &(j, _) in edges {
+                indptr[j + 1] += 1;
+            }
+        }
+        for j in 0..n {
+            indptr[j + 1] += indptr[j];
+        }
+        let mut cursor = indptr.clone();
+        let mut sources = vec![0usize; indptr[n]];
+        let mut weights = vec![0.0; indptr[n]];
+        for (i, edges) in adj_out.iter().enumerate() {
+            if totals[i] == 0.0 {
+                continue;
+            }
+            for &(j, w) in edges {
+                sources[cursor[j]] = i;
+                weights[cursor[j]] = damping * w / totals[i];
+                cursor[j] += 1;
+            }
+        }
+        PullGraph { indptr, sources, weights, dangling }
+    }
+}
+
+/// Weighted power iteration over an out-edge adjacency list.
+///
+/// Nodes flagged in `skip` (tombstones) neither send nor receive rank.
+/// Starts from `ranks` (warm start) and stops after `max_iterations`, or
+/// earlier once the L1 change between iterations drops below `tolerance`
+/// (a tolerance of 0 always runs every iteration).
+///
+/// The adjacency is transposed once into a pull graph, then every round is
+/// a Rayon-parallel gather per target node plus a parallel reduction of
+/// the dangling mass, so a round scales with the number of cores.
+/// Returns (iterations run, last L1 residual).
+fn power_iterate(
+    adj_out: &[Vec<(usize, f64)>],
+    skip: Option<&[bool]>,
+    ranks: &mut Vec<f64>,
+    damping: f64,
+    max_iterations: usize,
+    tolerance: f64,
+) -> (usize, f64) {
+    let n = adj_out.len();
+    let is_dead = |i: usize| skip.map_or(false, |s| s[i]);
+    let live = (0..n).filter(|&i| !is_dead(i)).count();
+    if live == 0 {
+        return (0, 0.0);
+    }
+
+    let graph = PullGraph::build(adj_out, is_dead, damping);
+    let base_teleport = (1.0 - damping) / live as f64;
+
+    // Two buffers swapped every round instead of allocating per iteration
+    let mut new_ranks = vec![0.0; n];
+    let mut residual = f64::INFINITY;
+    let mut iterations = 0;
+    while iterations < max_iterations {
+        // 1. Dangling Energy (parallel reduction)
+        let dangling_rank_sum: f64 = graph.dangling.par_iter().map(|&i| ranks[i]).sum();
+
+        // 2. Gather Flow + Teleport (random jump to every live node)
+        let jump = base_teleport + (damping * dangling_rank_sum) / live as f64;
+        let current: &[f64] = ranks;
+        new_ranks.par_iter_mut().enumerate().for_each(|(j, slot)| {
+            if is_dead(j) {
+                *slot = 0.0;
+                return;
+            }
+            let (start, end) = (graph.indptr[j], graph.indptr[j + 1]);
+            let inflow: f64 = graph.sources[start..end]
+                .iter()
+                .zip(&graph.weights[start..end])
+                .map(|(&i, &w)| current[i] * w)
+                .sum();
+            *slot = inflow + jump;
+        });
+
+        residual = new_ranks
+            .par_iter()
+            .zip(current.par_iter())
+            .enumerate()
+            .filter(|&(i, _)| !is_dead(i))
+            .map(|(_, (a, b))| (a - b).abs())
+            .sum();
+
+        std::mem::swap(ranks, &mut new_ranks);
+        iterations += 1;
+        if tolerance > 0.0 && residual < tolerance {
+            break;
+        }
+    }
+    (iterations, residual)
+}
 
 /// Calculate PageRank using HNSW for graph construction
 ///
-/// Returns a HashMap mapping Point IDs to their calculated Rank.
+/// Power iteration stops after `iterations` rounds, or earlier once the L1
+/// residual drops below `tolerance` (0 disables early stopping).
+///
+/// Returns (ranks, iterations run, final L1 residual), where ranks maps
+/// Point IDs to their calculated Rank.
 #[pyfunction]
+#[pyo3(signature = (ids, vectors, interaction_weights, transitions, m_neighbors, damping, iterations, tolerance=1e-6, max_layer=DEFAULT_MAX_LAYER, ef_construction=DEFAULT_EF_CONSTRUCTION))]
 fn calculate_hnsw_pagerank(
     ids: Vec<String>,
     vectors: Vec<Vec<f32>>,
@@ -15,44 +232,45 @@ fn calculate_hnsw_pagerank(
     m_neighbors: usize,
     damping: f64,
     iterations: usize,
-) -> PyResult<HashMap<String, f64>> {
+    tolerance: f64,
+    max_layer: usize,
+    ef_construction: usize,
+) -> PyResult<(HashMap<String, f64>, usize, f64)> {
     let n = ids.len();
     if n == 0 {
-        return Ok(HashMap::new());
+        return Ok((HashMap::new(), 0, 0.0));
     }
 
-    // --- Phase 1: Build HNSW Index (Construction) ---
-    // HNSW construction can be costly, but hnsw_rs is efficient.
-    let hnsw = Hnsw::new(
-        m_neighbors, 
-        n, 
-        16,     // max_layer
-        200,    // ef_construction
-        DistCosine
-    );
-
-    // Parallel insertion is tricky with standard hnsw_rs without locking, 
-    // keeping sequential insertion for safety.
+    // --- Phase 1: Build HNSW Index (Construction, Parallelized) ---
+    // hnsw_rs locks per point internally, so insertion is safe from Rayon threads.
+    let hnsw = Hnsw::new(m_neighbors, n, max_layer, ef_construction, DistCosine);
     let data_with_ids: Vec<(&Vec<f32>, usize)> = vectors.iter().enumerate().map(|(i, v)| (v, i)).collect();
-    for (vec, i) in data_with_ids {
-        hnsw.insert((vec, i));
-    }
+    hnsw.parallel_insert(&data_with_ids);
 
     // --- Phase 2: Build Graph / Adjacency Matrix (Parallelized) ---
     // We use Rayon (par_iter) here because searching is read-only and thread-safe.
     // This transforms the O(N * log N) search into O(N * log N / Cores).
-    
-    // Pre-process weights to Vector for O(1) access and cache friendliness
-    // This also avoids HashMap lookup contention if any (though HashMap is Sync)
-    // let weight_vec: Vec<f64> = ids.iter()
-    //    .map(|id| *interaction_weights.get(id).unwrap_or(&1.0))
-    //    .collect();
-
-    // We need to access transitions map in parallel. 
-    // Since HashMap is Sync (for String keys/values), we can share it across threads.
-    // However, looking up strings by reference in the hot loop might be slow.
-    // For this implementation, we'll stick to the safe parallel logic.
-    
+
+    // Map string IDs to dense indices once, so the hot loop below only does
+    // Vec indexing and a binary search instead of hashing strings per edge.
+    let index: HashMap<&str, usize> = ids.iter().enumerate().map(|(i, id)| (id.as_str(), i)).collect();
+    let weight_vec: Vec<f64> = ids
+        .iter()
+        .map(|id| *interaction_weights.get(id).unwrap_or(&1.0))
+        .collect();
+    let index_ref = &index;
+    let transition_table = transition_lists(
+        n,
+        transitions
+            .iter()
+            .filter_map(move |(src, targets)| index_ref.get(src.as_str()).map(|&i| (i, targets)))
+            .flat_map(move |(i, targets)| {
+                targets
+                    .iter()
+                    .filter_map(move |(dst, &count)| index_ref.get(dst.as_str()).map(|&j| (i, j, count)))
+            }),
+    );
+
     let adj_out: Vec<Vec<(usize, f64)>> = (0..n).into_par_iter().map(|i| {
         let query_vec = &vectors[i];
         let neighbors = hnsw.search(query_vec, m_neighbors, 2 * m_neighbors);
@@ -63,87 +281,808 @@ fn calculate_hnsw_pagerank(
             let j = neighbor.d_id;
             if i == j { continue; } // Skip self-loops in construction
 
-            // 1. Semantic Similarity
-            let dist = neighbor.distance;
-            let semantic_sim = (1.0_f32 - dist).max(0.0_f32) as f64;
-
-            // 2. Interaction Weight (Target Popularity)
-            let target_id = &ids[j];
-            let target_weight = *interaction_weights.get(target_id).unwrap_or(&1.0);
-            // We need to look up transitions[ids[i]][ids[j]]
-            let source_id = &ids[i];
-            let target_id = &ids[j];
-            
-            let transition_boost = if let Some(targets) = transitions.get(source_id) {
-                if let Some(count) = targets.get(target_id) {
-                    1.0 + (0.5 * (*count as f64))
-                } else { 1.0 }
-            } else { 1.0 };
-
-            // Formula
-            let final_weight = semantic_sim * target_weight * transition_boost;
-            edges.push((j, final_weight));
+            // Interaction Weight (Target Popularity) x transitions[i][j]
+            let count = transition_count(&transition_table, i, j);
+            edges.push((j, edge_weight(neighbor.distance, weight_vec[j], count)));
         }
         edges
     }).collect();
 
     // --- Phase 3: Power Iteration (Optimized) ---
     let mut ranks = vec![1.0 / n as f64; n];
-    let base_teleport = (1.0 - damping) / n as f64;
-
-    for _ in 0..iterations {
-        let mut new_ranks = vec![base_teleport; n];
-        let mut dangling_rank_sum = 0.0;
-
-        // 1. Distribute Flow
-        for i in 0..n {
-            let out_edges = &adj_out[i];
-            
-            if out_edges.is_empty() {
-                // Collect energy from dangling nodes (Dead Ends)
-                dangling_rank_sum += ranks[i];
+    let (iterations_run, residual) = power_iterate(&adj_out, None, &mut ranks, damping, iterations, tolerance);
+
+    // --- Phase 4: Output ---
+    // Optional: Normalize result to sum to 1.0
+    let sum_rank: f64 = ranks.iter().sum();
+    let mut result = HashMap::new();
+    for (i, r) in ranks.iter().enumerate() {
+        result.insert(ids[i].clone(), r / sum_rank);
+    }
+
+    Ok((result, iterations_run, residual))
+}
+
+/// NumPy variant of `calculate_hnsw_pagerank`.
+///
+/// Inputs are index-aligned arrays read in place, without converting to
+/// Python objects: `vectors` is a C-contiguous (n, dim) float32 matrix,
+/// `weights` holds the interaction weight of node i, and transitions are
+/// COO arrays of node indices with their counts.
+///
+/// Returns (ranks as a float64 array aligned with `vectors`, iterations, residual).
+#[pyfunction]
+#[pyo3(signature = (vectors, weights, trans_src, trans_dst, trans_count, m_neighbors, damping, iterations, tolerance=1e-6, max_layer=DEFAULT_MAX_LAYER, ef_construction=DEFAULT_EF_CONSTRUCTION))]
+fn calculate_hnsw_pagerank_array<'py>(
+    py: Python<'py>,
+    vectors: PyReadonlyArray2<'py, f32>,
+    weights: PyReadonlyArray1<'py, f64>,
+    trans_src: PyReadonlyArray1<'py, i64>,
+    trans_dst: PyReadonlyArray1<'py, i64>,
+    trans_count: PyReadonlyArray1<'py, i64>,
+    m_neighbors: usize,
+    damping: f64,
+    iterations: usize,
+    tolerance: f64,
+    max_layer: usize,
+    ef_construction: usize,
+) -> PyResult<(Bound<'py, PyArray1<f64>>, usize, f64)> {
+    let (flat, n, dim) = matrix_slice(&vectors)?;
+    let weights = weights.as_slice()?;
+    if weights.len() != n {
+        return Err(PyValueError::new_err("weights must have one entry per vector"));
+    }
+    if n == 0 {
+        return Ok((Vec::<f64>::new().into_pyarray(py), 0, 0.0));
+    }
+    let transitions = transition_lists(
+        n,
+        coo_triples(n, trans_src.as_slice()?, trans_dst.as_slice()?, trans_count.as_slice()?)?,
+    );
+
+    let (ranks, iterations_run, residual) = py.allow_threads(|| {
+        let row = |i: usize| &flat[i * dim..(i + 1) * dim];
+
+        // --- Phase 1: Build HNSW Index (Parallelized) ---
+        let hnsw = Hnsw::new(m_neighbors, n, max_layer, ef_construction, DistCosine);
+        let data_with_ids: Vec<(&[f32], usize)> = (0..n).map(|i| (row(i), i)).collect();
+        hnsw.parallel_insert_slice(&data_with_ids);
+
+        // --- Phase 2: Build Graph (Parallelized) ---
+        let adj_out: Vec<Vec<(usize, f64)>> = (0..n)
+            .into_par_iter()
+            .map(|i| {
+                hnsw.search(row(i), m_neighbors, 2 * m_neighbors)
+                    .into_iter()
+                    .filter(|nb| nb.d_id != i)
+                    .map(|nb| {
+                        let j = nb.d_id;
+                        (j, edge_weight(nb.distance, weights[j], transition_count(&transitions, i, j)))
+                    })
+                    .collect()
+            })
+            .collect();
+
+        // --- Phase 3: Power Iteration ---
+        let mut ranks = vec![1.0 / n as f64; n];
+        let (iterations_run, residual) =
+            power_iterate(&adj_out, None, &mut ranks, damping, iterations, tolerance);
+
+        // --- Phase 4: Normalize to sum to 1.0 ---
+        let sum_rank: f64 = ranks.iter().sum();
+        ranks.iter_mut().for_each(|r| *r /= sum_rank);
+        (ranks, iterations_run, residual)
+    });
+
+    Ok((ranks.into_pyarray(py), iterations_run, residual))
+}
+
+/// Edge list accepted from Python: an (E, 2) int64 NumPy array (read in
+/// place) or any sequence of (src, dst) pairs.
+#[derive(FromPyObject)]
+enum EdgeInput<'py> {
+    Array(PyReadonlyArray2<'py, i64>),
+    Pairs(Vec<(i64, i64)>),
+}
+
+/// In-edge CSR: sources of node v are `sources[indptr[v]..indptr[v + 1]]`.
+struct InEdgeCsr {
+    indptr: Vec<usize>,
+    sources: Vec<u32>,
+    out_degree: Vec<u32>,
+}
+
+impl InEdgeCsr {
+    /// Counting sort by target. Out-of-range edges are skipped; duplicate
+    /// edges are kept (they count as parallel links).
+    fn from_edges(n: usize, edges: &[(i64, i64)]) -> Self {
+        let valid = |&(s, d): &(i64, i64)| s >= 0 && d >= 0 && (s as usize) < n && (d as usize) < n;
+
+        let mut indptr = vec![0usize; n + 1];
+        let mut out_degree = vec![0u32; n];
+        for &(s, d) in edges.iter().filter(|e| valid(*e)) {
+            indptr[d as usize + 1] += 1;
+            out_degree[s as usize] += 1;
+        }
+        for v in 0..n {
+            indptr[v + 1] += indptr[v];
+        }
+        let mut cursor = indptr.clone();
+        let mut sources = vec![0u32; indptr[n]];
+        for &(s, d) in edges.iter().filter(|e| valid(*e)) {
+            sources[cursor[d as usize]] = s as u32;
+            cursor[d as usize] += 1;
+        }
+        InEdgeCsr { indptr, sources, out_degree }
+    }
+}
+
+/// Temporal PageRank over an explicit edge list.
+///
+/// Each node u spreads `damping * rank[u] * exp(-decay * t[u]) / out_degree(u)`
+/// to every out-neighbour, where t[u] is hours since its last interaction;
+/// ranks are renormalized to sum to 1 after every round. There is no
+/// teleport term, matching the Python reference in mock_data/benchmark_rust.py.
+///
+/// The graph is stored as in-edge CSR and each round is a Rayon-parallel
+/// pull (gather per target node), so no two threads write the same slot.
+/// Stops after `iterations` rounds, or earlier once the L1 change drops
+/// below `tolerance` (0 disables early stopping).
+///
+/// Returns the ranks as a float64 NumPy array indexed by node id.
+#[pyfunction]
+#[pyo3(signature = (num_nodes, edges, last_interactions, damping, decay, iterations, tolerance=0.0))]
+fn calculate_temporal_pagerank<'py>(
+    py: Python<'py>,
+    num_nodes: usize,
+    edges: EdgeInput<'py>,
+    last_interactions: Vec<f64>,
+    damping: f64,
+    decay: f64,
+    iterations: usize,
+    tolerance: f64,
+) -> PyResult<Bound<'py, PyArray1<f64>>> {
+    let n = num_nodes;
+    if n == 0 {
+        return Ok(Vec::<f64>::new().into_pyarray(py));
+    }
+    if n > u32::MAX as usize {
+        return Err(PyValueError::new_err("num_nodes exceeds u32 range"));
+    }
+    if last_interactions.len() < n {
+        return Err(PyValueError::new_err("last_interactions must have num_nodes entries"));
+    }
+
+    let pairs: Vec<(i64, i64)> = match &edges {
+        EdgeInput::Array(array) => {
+            let (rows, cols) = array.as_array().dim();
+            if cols != 2 {
+                return Err(PyValueError::new_err("edges array must have shape (E, 2)"));
+            }
+            let flat = array
+                .as_slice()
+                .map_err(|_| PyValueError::new_err("edges must be a C-contiguous int64 array"))?;
+            (0..rows).map(|k| (flat[2 * k], flat[2 * k + 1])).collect()
+        }
+        EdgeInput::Pairs(list) => list.clone(),
+    };
+
+    let ranks = py.allow_threads(|| {
+        let csr = InEdgeCsr::from_edges(n, &pairs);
+        drop(pairs);
+
+        // Per-source coefficient: damping * time decay / out-degree (0 for dangling nodes)
+        let coeff: Vec<f64> = (0..n)
+            .into_par_iter()
+            .map(|u| match csr.out_degree[u] {
+                0 => 0.0,
+                deg => damping * (-decay * last_interactions[u]).exp() / deg as f64,
+            })
+            .collect();
+
+        let uniform = 1.0 / n as f64;
+        let mut ranks = vec![uniform; n];
+        let mut contrib = vec![0.0; n];
+        let mut new_ranks = vec![0.0; n];
+
+        for _ in 0..iterations {
+            contrib
+                .par_iter_mut()
+                .zip(ranks.par_iter().zip(coeff.par_iter()))
+                .for_each(|(c, (r, k))| *c = r * k);
+
+            // Pull: each target gathers from its in-edges
+            new_ranks.par_iter_mut().enumerate().for_each(|(v, slot)| {
+                *slot = csr.sources[csr.indptr[v]..csr.indptr[v + 1]]
+                    .iter()
+                    .map(|&u| contrib[u as usize])
+                    .sum();
+            });
+
+            let sum_rank: f64 = new_ranks.par_iter().sum();
+            if sum_rank > 0.0 {
+                new_ranks.par_iter_mut().for_each(|r| *r /= sum_rank);
             } else {
-                let total_weight: f64 = out_edges.iter().map(|(_, w)| w).sum();
-                
-                if total_weight == 0.0 {
-                     // Treat as dangling if total weight is 0 (e.g. all neighbors have 0 similarity)
-                     dangling_rank_sum += ranks[i];
-                     continue;
+                // Reset if all zero (no edges carry any mass)
+                new_ranks.par_iter_mut().for_each(|r| *r = uniform);
+            }
+
+            let residual: f64 = new_ranks
+                .par_iter()
+                .zip(ranks.par_iter())
+                .map(|(a, b)| (a - b).abs())
+                .sum();
+            std::mem::swap(&mut ranks, &mut new_ranks);
+            if tolerance > 0.0 && residual < tolerance {
+                break;
+            }
+        }
+        ranks
+    });
+
+    Ok(ranks.into_pyarray(py))
+}
+
+/// Incremental HNSW PageRank over Space R.
+///
+/// Keeps the HNSW index, the kNN graph and the rank vector between calls,
+/// so promoting or deleting a single anchor does not rebuild everything:
+/// new nodes are inserted into the live index and wired into their
+/// neighbours' edge lists, deleted nodes become tombstones (compacted once
+/// they pile up), and `update()` warm-starts power iteration from the
+/// previous ranks until the L1 change drops below `tolerance`.
+#[pyclass]
+struct IncrementalRankGraph {
+    /// Built lazily: a graph restored from a snapshot can re-rank without
+    /// an index until the first insert or delete needs kNN searches
+    hnsw: Option<Hnsw<'static, f32, DistCosine>>,
+    capacity: usize,
+    m_neighbors: usize,
+    max_layer: usize,
+    ef_construction: usize,
+    damping: f64,
+    tolerance: f64,
+    max_iterations: usize,
+    ids: Vec<String>,
+    index: HashMap<String, usize>,
+    vectors: Vec<Vec<f32>>,
+    dead: Vec<bool>,
+    n_dead: usize,
+    /// Semantic kNN list per node: (neighbour index, cosine distance), closest first
+    neighbors: Vec<Vec<(usize, f32)>>,
+    /// Interaction weight per node index (nodes added since the last
+    /// set_interactions() default to 1.0)
+    weights: Vec<f64>,
+    /// Transition counts per source index, sorted by target index
+    transitions: Vec<Vec<(usize, usize)>>,
+    ranks: Vec<f64>,
+}
+
+const MIN_CAPACITY: usize = 1024;
+
+impl IncrementalRankGraph {
+    fn new_index(&self, capacity: usize) -> Hnsw<'static, f32, DistCosine> {
+        Hnsw::new(self.m_neighbors, capacity, self.max_layer, self.ef_construction, DistCosine)
+    }
+
+    /// Insert live nodes of `range` into the index in parallel.
+    fn index_nodes(&self, range: std::ops::Range<usize>) {
+        if let Some(hnsw) = &self.hnsw {
+            let data_with_ids: Vec<(&Vec<f32>, usize)> = range
+                .filter(|&i| !self.dead[i])
+                .map(|i| (&self.vectors[i], i))
+                .collect();
+            hnsw.parallel_insert(&data_with_ids);
+        }
+    }
+
+    /// Build the HNSW index over the current nodes if it does not exist yet.
+    fn ensure_index(&mut self) {
+        if self.hnsw.is_none() {
+            self.capacity = (2 * self.ids.len()).max(MIN_CAPACITY);
+            self.hnsw = Some(self.new_index(self.capacity));
+            self.index_nodes(0..self.ids.len());
+        }
+    }
+
+    fn live_count(&self) -> usize {
+        self.ids.len() - self.n_dead
+    }
+
+    /// kNN of node `i` among live nodes (self and tombstones filtered out).
+    fn knn(&self, i: usize) -> Vec<(usize, f32)> {
+        let m = self.m_neighbors;
+        // Over-fetch so tombstones returned by the index do not eat into the m slots
+        let k = m + 1 + self.n_dead.min(4 * m);
+        let hnsw = self.hnsw.as_ref().expect("ensure_index() must run before knn()");
+        hnsw.search(&self.vectors[i], k, k.max(2 * m))
+            .into_iter()
+            .filter(|nb| nb.d_id != i && !self.dead[nb.d_id])
+            .take(m)
+            .map(|nb| (nb.d_id, nb.distance))
+            .collect()
+    }
+
+    /// Offer `candidate` as a neighbour of `j`: kept if j still has a free
+    /// slot or the candidate is closer than j's current farthest neighbour.
+    fn offer_neighbor(&mut self, j: usize, candidate: usize, distance: f32) {
+        let m = self.m_neighbors;
+        let list = &mut self.neighbors[j];
+        if list.iter().any(|&(k, _)| k == candidate) {
+            return;
+        }
+        if list.len() >= m {
+            let worst = list.last().map_or(f32::INFINITY, |&(_, d)| d);
+            if distance >= worst {
+                return;
+            }
+            list.pop();
+        }
+        let pos = list.partition_point(|&(_, d)| d <= distance);
+        list.insert(pos, (candidate, distance));
+    }
+
+    /// Drop tombstones: rebuild the index over live nodes, keep their ranks.
+    fn compact(&mut self) {
+        let keep: Vec<usize> = (0..self.ids.len()).filter(|&i| !self.dead[i]).collect();
+        let ids: Vec<String> = keep.iter().map(|&i| self.ids[i].clone()).collect();
+        let vectors: Vec<Vec<f32>> = keep.iter().map(|&i| std::mem::take(&mut self.vectors[i])).collect();
+        let ranks: Vec<f64> = keep.iter().map(|&i| self.ranks[i]).collect();
+        let weights: Vec<f64> = keep.iter().map(|&i| self.weights.get(i).copied().unwrap_or(1.0)).collect();
+        // Transition indices shift with compaction: remap them, dropping dead targets
+        let mut remap = vec![usize::MAX; self.ids.len()];
+        for (new, &old) in keep.iter().enumerate() {
+            remap[old] = new;
+        }
+        let transitions: Vec<Vec<(usize, usize)>> = keep
+            .iter()
+            .map(|&i| {
+                self.transitions
+                    .get(i)
+                    .map(|list| {
+                        list.iter()
+                            .filter(|&&(t, _)| remap[t] != usize::MAX)
+                            .map(|&(t, c)| (remap[t], c))
+                            .collect()
+                    })
+                    .unwrap_or_default()
+            })
+            .collect();
+
+        self.capacity = (2 * ids.len()).max(MIN_CAPACITY);
+        self.hnsw = Some(self.new_index(self.capacity));
+        self.index = ids.iter().enumerate().map(|(i, id)| (id.clone(), i)).collect();
+        self.dead = vec![false; ids.len()];
+        self.n_dead = 0;
+        self.neighbors = vec![Vec::new(); ids.len()];
+        self.ids = ids;
+        self.vectors = vectors;
+        self.ranks = ranks;
+        self.weights = weights;
+        self.transitions = transitions;
+
+        self.index_nodes(0..self.ids.len());
+        let all: Vec<usize> = (0..self.ids.len()).collect();
+        self.refresh_neighbors(&all);
+    }
+
+    /// Recompute the kNN lists of `nodes` (parallel, read-only searches).
+    fn refresh_neighbors(&mut self, nodes: &[usize]) {
+        let lists: Vec<Vec<(usize, f32)>> = nodes.par_iter().map(|&i| self.knn(i)).collect();
+        for (&i, list) in nodes.iter().zip(lists) {
+            self.neighbors[i] = list;
+        }
+    }
+
+    fn weighted_adjacency(&self) -> Vec<Vec<(usize, f64)>> {
+        (0..self.ids.len())
+            .into_par_iter()
+            .map(|i| {
+                if self.dead[i] {
+                    return Vec::new();
+                }
+                self.neighbors[i]
+                    .iter()
+                    .filter(|&&(j, _)| !self.dead[j])
+                    .map(|&(j, distance)| {
+                        let target_weight = self.weights.get(j).copied().unwrap_or(1.0);
+                        let count = transition_count(&self.transitions, i, j);
+                        (j, edge_weight(distance, target_weight, count))
+                    })
+                    .collect()
+            })
+            .collect()
+    }
+}
+
+#[pymethods]
+impl IncrementalRankGraph {
+    #[new]
+    #[pyo3(signature = (m_neighbors=5, damping=0.85, tolerance=1e-6, max_iterations=100, max_layer=DEFAULT_MAX_LAYER, ef_construction=DEFAULT_EF_CONSTRUCTION))]
+    fn new(
+        m_neighbors: usize,
+        damping: f64,
+        tolerance: f64,
+        max_iterations: usize,
+        max_layer: usize,
+        ef_construction: usize,
+    ) -> Self {
+        IncrementalRankGraph {
+            hnsw: None,
+            capacity: MIN_CAPACITY,
+            m_neighbors,
+            max_layer,
+            ef_construction,
+            damping,
+            tolerance,
+            max_iterations,
+            ids: Vec::new(),
+            index: HashMap::new(),
+            vectors: Vec::new(),
+            dead: Vec::new(),
+            n_dead: 0,
+            neighbors: Vec::new(),
+            weights: Vec::new(),
+            transitions: Vec::new(),
+            ranks: Vec::new(),
+        }
+    }
+
+    /// Insert new nodes; ids already in the graph are skipped.
+    /// `vectors` is a C-contiguous (len(ids), dim) float32 array.
+    /// Returns the number of nodes actually added.
+    fn add_nodes(&mut self, py: Python<'_>, ids: Vec<String>, vectors: PyReadonlyArray2<'_, f32>) -> PyResult<usize> {
+        let (flat, n, dim) = matrix_slice(&vectors)?;
+        if ids.len() != n {
+            return Err(PyValueError::new_err("ids and vectors must have the same length"));
+        }
+        let vectors = flat.chunks_exact(dim.max(1)).map(|row| row.to_vec());
+        py.allow_threads(|| {
+            self.ensure_index();
+            let start = self.ids.len();
+            // New nodes start from the uniform share; update() renormalizes
+            let init_rank = 1.0 / (self.live_count() + ids.len()).max(1) as f64;
+            for (id, vec) in ids.into_iter().zip(vectors) {
+                if self.index.contains_key(&id) {
+                    continue;
+                }
+                self.index.insert(id.clone(), self.ids.len());
+                self.ids.push(id);
+                self.vectors.push(vec);
+                self.dead.push(false);
+                self.neighbors.push(Vec::new());
+                self.ranks.push(init_rank);
+            }
+            let end = self.ids.len();
+            if end == start {
+                return Ok(0);
+            }
+
+            if end > self.capacity {
+                // Index outgrew its sizing: rebuild once with room to spare
+                self.compact();
+                return Ok(end - start);
+            }
+
+            self.index_nodes(start..end);
+            let new_nodes: Vec<usize> = (start..end).collect();
+            self.refresh_neighbors(&new_nodes);
+
+            // Existing nodes may now have a closer neighbour among the new ones
+            for u in start..end {
+                let links = self.neighbors[u].clone();
+                for (j, distance) in links {
+                    if j < start {
+                        self.offer_neighbor(j, u, distance);
+                    }
                 }
+            }
+            Ok(end - start)
+        })
+    }
 
-                for &(j, w) in out_edges {
-                    // Distribute proportional to edge weight
-                    let share = (ranks[i] * w) / total_weight;
-                    new_ranks[j] += damping * share;
+    /// Remove nodes by id (unknown ids are ignored). Returns the number removed.
+    fn remove_nodes(&mut self, py: Python<'_>, ids: Vec<String>) -> usize {
+        py.allow_threads(|| {
+            let mut removed = 0;
+            for id in ids {
+                if let Some(i) = self.index.remove(&id) {
+                    self.dead[i] = true;
+                    self.ranks[i] = 0.0;
+                    self.neighbors[i].clear();
+                    self.n_dead += 1;
+                    removed += 1;
                 }
             }
+            if removed == 0 {
+                return 0;
+            }
+
+            if self.n_dead * 4 > self.ids.len() {
+                // More than a quarter tombstones: searches get wasteful, compact
+                self.compact();
+            } else {
+                // Re-search only the nodes that lost a neighbour
+                self.ensure_index();
+                let affected: Vec<usize> = (0..self.ids.len())
+                    .filter(|&i| !self.dead[i] && self.neighbors[i].iter().any(|&(j, _)| self.dead[j]))
+                    .collect();
+                self.refresh_neighbors(&affected);
+            }
+            removed
+        })
+    }
+
+    /// Snapshot of the live kNN graph as (ids, indptr, indices, distances, ranks).
+    ///
+    /// Neighbour lists are CSR rows whose indices point into `ids`.
+    /// Vectors and the HNSW index are not included.
+    fn export_graph<'py>(
+        &self,
+        py: Python<'py>,
+    ) -> (
+        Vec<String>,
+        Bound<'py, PyArray1<i64>>,
+        Bound<'py, PyArray1<i64>>,
+        Bound<'py, PyArray1<f32>>,
+        Bound<'py, PyArray1<f64>>,
+    ) {
+        let keep: Vec<usize> = (0..self.ids.len()).filter(|&i| !self.dead[i]).collect();
+        let mut remap = vec![usize::MAX; self.ids.len()];
+        for (new, &old) in keep.iter().enumerate() {
+            remap[old] = new;
         }
 
-        // 2. Distribute Dangling Energy
-        // The energy from dead ends is re-distributed to everyone (random jump)
-        if dangling_rank_sum > 0.0 {
-            let dangling_share = (damping * dangling_rank_sum) / n as f64;
-            for r in new_ranks.iter_mut() {
-                *r += dangling_share;
+        let mut indptr = Vec::with_capacity(keep.len() + 1);
+        let mut indices = Vec::new();
+        let mut distances = Vec::new();
+        indptr.push(0_i64);
+        for &i in &keep {
+            for &(j, d) in &self.neighbors[i] {
+                if remap[j] != usize::MAX {
+                    indices.push(remap[j] as i64);
+                    distances.push(d);
+                }
             }
+            indptr.push(indices.len() as i64);
         }
+        let ids: Vec<String> = keep.iter().map(|&i| self.ids[i].clone()).collect();
+        let ranks: Vec<f64> = keep.iter().map(|&i| self.ranks[i]).collect();
+        (
+            ids,
+            indptr.into_pyarray(py),
+            indices.into_pyarray(py),
+            distances.into_pyarray(py),
+            ranks.into_pyarray(py),
+        )
+    }
 
-        ranks = new_ranks;
+    /// Restore a graph produced by export_graph().
+    ///
+    /// `vectors` must be aligned with `ids`. They are kept for later kNN
+    /// searches, but the HNSW index is only built once a node is inserted
+    /// or removed, so a weights-only refresh skips index construction and
+    /// neighbour search entirely.
+    #[staticmethod]
+    #[pyo3(signature = (ids, vectors, indptr, indices, distances, ranks, m_neighbors=5, damping=0.85, tolerance=1e-6, max_iterations=100, max_layer=DEFAULT_MAX_LAYER, ef_construction=DEFAULT_EF_CONSTRUCTION))]
+    fn from_graph(
+        ids: Vec<String>,
+        vectors: PyReadonlyArray2<'_, f32>,
+        indptr: PyReadonlyArray1<'_, i64>,
+        indices: PyReadonlyArray1<'_, i64>,
+        distances: PyReadonlyArray1<'_, f32>,
+        ranks: PyReadonlyArray1<'_, f64>,
+        m_neighbors: usize,
+        damping: f64,
+        tolerance: f64,
+        max_iterations: usize,
+        max_layer: usize,
+        ef_construction: usize,
+    ) -> PyResult<Self> {
+        let n = ids.len();
+        let (flat, rows, dim) = matrix_slice(&vectors)?;
+        let (indptr, indices, distances, ranks) =
+            (indptr.as_slice()?, indices.as_slice()?, distances.as_slice()?, ranks.as_slice()?);
+        if rows != n || ranks.len() != n || indptr.len() != n + 1 {
+            return Err(PyValueError::new_err("vectors, ranks and indptr must be aligned with ids"));
+        }
+        if indices.len() != distances.len()
+            || indptr[0] != 0
+            || indptr[n] as usize != indices.len()
+            || indptr.windows(2).any(|w| w[0] > w[1])
+            || indices.iter().any(|&j| j < 0 || j as usize >= n)
+        {
+            return Err(PyValueError::new_err("malformed CSR graph snapshot"));
+        }
+
+        let mut graph = Self::new(m_neighbors, damping, tolerance, max_iterations, max_layer, ef_construction);
+        graph.index = ids.iter().enumerate().map(|(i, id)| (id.clone(), i)).collect();
+        if graph.index.len() != n {
+            return Err(PyValueError::new_err("duplicate ids in graph snapshot"));
+        }
+        graph.vectors = flat.chunks_exact(dim.max(1)).map(|row| row.to_vec()).collect();
+        graph.neighbors = (0..n)
+            .map(|i| {
+                let (lo, hi) = (indptr[i] as usize, indptr[i + 1] as usize);
+                (lo..hi).map(|k| (indices[k] as usize, distances[k])).collect()
+            })
+            .collect();
+        graph.ranks = ranks.to_vec();
+        graph.dead = vec![false; n];
+        graph.ids = ids;
+        Ok(graph)
     }
 
-    // --- Phase 4: Output ---
-    // Optional: Normalize result to sum to 1.0
-    let sum_rank: f64 = ranks.iter().sum();
-    let mut result = HashMap::new();
-    for (i, r) in ranks.iter().enumerate() {
-        result.insert(ids[i].clone(), r / sum_rank);
+    /// Replace interaction weights and transition counts used for edge weights.
+    ///
+    /// `weights[k]` belongs to `ids[k]`; transitions are COO arrays of
+    /// positions in `ids`. Ids are resolved to graph indices once here, so
+    /// the edge-weight pass only does integer lookups.
+    fn set_interactions(
+        &mut self,
+        ids: Vec<String>,
+        weights: PyReadonlyArray1<'_, f64>,
+        trans_src: PyReadonlyArray1<'_, i64>,
+        trans_dst: PyReadonlyArray1<'_, i64>,
+        trans_count: PyReadonlyArray1<'_, i64>,
+    ) -> PyResult<()> {
+        let weights = weights.as_slice()?;
+        if weights.len() != ids.len() {
+            return Err(PyValueError::new_err("weights must have one entry per id"));
+        }
+        let local: Vec<Option<usize>> = ids.iter().map(|id| self.index.get(id).copied()).collect();
+
+        let mut node_weights = vec![1.0; self.ids.len()];
+        for (k, slot) in local.iter().enumerate() {
+            if let Some(i) = *slot {
+                node_weights[i] = weights[k];
+            }
+        }
+        let triples = coo_triples(ids.len(), trans_src.as_slice()?, trans_dst.as_slice()?, trans_count.as_slice()?)?;
+        self.transitions = transition_lists(
+            self.ids.len(),
+            triples.filter_map(|(s, d, c)| Some((local[s]?, local[d]?, c))),
+        );
+        self.weights = node_weights;
+        Ok(())
+    }
+
+    /// Run warm-started power iteration. Returns (iterations, L1 residual).
+    fn update(&mut self, py: Python<'_>) -> (usize, f64) {
+        py.allow_threads(|| {
+            let live = self.live_count();
+            if live == 0 {
+                return (0, 0.0);
+            }
+            // Renormalize the previous ranks (plus newcomers) into a distribution
+            let sum: f64 = self.ranks.iter().sum();
+            if sum > 0.0 {
+                for r in self.ranks.iter_mut() {
+                    *r /= sum;
+                }
+            }
+            let adj_out = self.weighted_adjacency();
+            let mut ranks = std::mem::take(&mut self.ranks);
+            let result = power_iterate(
+                &adj_out,
+                Some(self.dead.as_slice()),
+                &mut ranks,
+                self.damping,
+                self.max_iterations,
+                self.tolerance,
+            );
+            self.ranks = ranks;
+            result
+        })
+    }
+
+    /// Current ranks of live nodes, normalized to sum to 1.0.
+    fn ranks(&self) -> HashMap<String, f64> {
+        let sum: f64 = self.ranks.iter().sum();
+        let sum = if sum > 0.0 { sum } else { 1.0 };
+        self.index
+            .iter()
+            .map(|(id, &i)| (id.clone(), self.ranks[i] / sum))
+            .collect()
+    }
+
+    fn __len__(&self) -> usize {
+        self.live_count()
+    }
+
+    fn __contains__(&self, id: &str) -> bool {
+        self.index.contains_key(id)
     }
+}
+
+/// Read-only HNSW index over the Space R anchor vectors, used to project
+/// PageRank onto Space X through each item's top-k most similar anchors
+/// instead of a scan over every anchor.
+#[pyclass]
+struct AnchorHnsw {
+    hnsw: Hnsw<'static, f32, DistCosine>,
+    len: usize,
+    dim: usize,
+    ef_search: usize,
+}
 
-    Ok(result)
+#[pymethods]
+impl AnchorHnsw {
+    #[new]
+    #[pyo3(signature = (vectors, m_neighbors=16, ef_search=64, max_layer=DEFAULT_MAX_LAYER, ef_construction=DEFAULT_EF_CONSTRUCTION))]
+    fn new(
+        py: Python<'_>,
+        vectors: PyReadonlyArray2<'_, f32>,
+        m_neighbors: usize,
+        ef_search: usize,
+        max_layer: usize,
+        ef_construction: usize,
+    ) -> PyResult<Self> {
+        let (flat, n, dim) = matrix_slice(&vectors)?;
+        let hnsw = Hnsw::new(m_neighbors, n.max(1), max_layer, ef_construction, DistCosine);
+        py.allow_threads(|| {
+            let data_with_ids: Vec<(&[f32], usize)> =
+                (0..n).map(|i| (&flat[i * dim..(i + 1) * dim], i)).collect();
+            hnsw.parallel_insert_slice(&data_with_ids);
+        });
+        Ok(AnchorHnsw { hnsw, len: n, dim, ef_search })
+    }
+
+    /// Top-k anchors for every row of `queries` (searched in parallel).
+    ///
+    /// Returns (indices int64 (q, k), similarities float32 (q, k)), closest
+    /// first; similarity is 1 - cosine distance. Rows with fewer than k hits
+    /// are padded with index -1 and similarity 0.
+    fn search<'py>(
+        &self,
+        py: Python<'py>,
+        queries: PyReadonlyArray2<'py, f32>,
+        k: usize,
+    ) -> PyResult<(Bound<'py, PyArray2<i64>>, Bound<'py, PyArray2<f32>>)> {
+        let (flat, q, dim) = matrix_slice(&queries)?;
+        if q > 0 && dim != self.dim {
+            return Err(PyValueError::new_err("query dimension does not match the anchor vectors"));
+        }
+        let k = k.min(self.len);
+        let ef = self.ef_search.max(k);
+
+        let (indices, sims) = py.allow_threads(|| {
+            let mut indices = vec![-1i64; q * k];
+            let mut sims = vec![0.0f32; q * k];
+            if k > 0 {
+                indices
+                    .par_chunks_mut(k)
+                    .zip(sims.par_chunks_mut(k))
+                    .enumerate()
+                    .for_each(|(row, (idx_row, sim_row))| {
+                        let hits = self.hnsw.search(&flat[row * dim..(row + 1) * dim], k, ef);
+                        for (slot, nb) in hits.into_iter().take(k).enumerate() {
+                            idx_row[slot] = nb.d_id as i64;
+                            sim_row[slot] = 1.0 - nb.distance;
+                        }
+                    });
+            }
+            (indices, sims)
+        });
+
+        let indices = numpy::ndarray::Array2::from_shape_vec((q, k), indices)
+            .map_err(|e| PyValueError::new_err(e.to_string()))?;
+        let sims = numpy::ndarray::Array2::from_shape_vec((q, k), sims)
+            .map_err(|e| PyValueError::new_err(e.to_string()))?;
+        Ok((indices.into_pyarray(py), sims.into_pyarray(py)))
+    }
+
+    fn __len__(&self) -> usize {
+        self.len
+    }
 }
 
 #[pymodule]
 fn visual_rank_engine(m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_function(wrap_pyfunction!(calculate_hnsw_pagerank, m)?)?;
+    m.add_function(wrap_pyfunction!(calculate_hnsw_pagerank_array, m)?)?;
+    m.add_function(wrap_pyfunction!(calculate_temporal_pagerank, m)?)?;
+    m.add_class::<IncrementalRankGraph>()?;
+    m.add_class::<AnchorHnsw>()?;
     Ok(())
 }
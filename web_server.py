@@ -8,6 +8,7 @@ import os
 import time
 import datetime
 import asyncio
+import threading
 from qdrant_client import models
 import argparse
 import sys
@@ -17,8 +18,11 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # 引入核心模块
-from system_manager import SystemManager, SPACE_R, SPACE_X
-from search_engine import search
+from system_manager import SystemManager, SPACE_R, SPACE_X, CRAWL_RESUME_ON_START
+from search_engine import search_async, get_query_vector_async
+import async_store
+from search_cache import cache_stats
+from clip_encoder import get_encoder, QueryBatcher
 from xml_dump_processor import MediaWikiDumpProcessor
 
 # 从环境变量读取爬取密码
@@ -40,6 +44,16 @@ async def startup_event():
     global _global_event_loop
     _global_event_loop = asyncio.get_event_loop()
     print(f"✅ [Startup] Event loop saved for WebSocket broadcasting")
+    # 在后台线程预热共享的 CLIP 编码器，服务立即可用，首个搜索请求无需等待模型加载
+    _global_event_loop.run_in_executor(None, get_encoder().warmup)
+    # 续爬上次退出时未完成的递归爬取任务（进度保存在 CRAWL_STATE_DB）
+    if CRAWL_RESUME_ON_START:
+        threading.Thread(target=mgr.resume_unfinished_crawls, name="crawl-resume", daemon=True).start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """释放异步 Qdrant 客户端的连接池"""
+    await async_store.close_async_client()
 
 # 挂载静态文件 (前端页面)
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -47,6 +61,17 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # 初始化核心管理器
 mgr = SystemManager()
 
+# 查询编码微批处理器：并发的 /api/search 请求合并成一次 CLIP 前向计算
+query_batcher = QueryBatcher(max_batch_size=32, max_wait_ms=5.0)
+
+# 图谱节点只需要这些字段，不拉取 full_text
+GRAPH_NODE_PAYLOAD_FIELDS = ["url", "type", "content_preview"]
+
+
+async def encode_query(q: str):
+    """查询向量：先查缓存，未命中再交给微批处理器编码"""
+    return await get_query_vector_async(q, query_batcher)
+
 
 # --- WebSocket 连接管理器 (用于实时通知) ---
 class ConnectionManager:
@@ -438,27 +463,46 @@ async def debug_websocket():
 
 @app.get("/api/search")
 async def api_search(q: str):
-    results = search(q, top_k=20)
+    query_vector = await encode_query(q)
+    results = await search_async(q, 20, query_vector)
     return {"results": results}
 
+@app.get("/api/debug/encoder")
+async def debug_encoder():
+    """调试端点：查看查询编码微批处理统计"""
+    return {
+        "loaded": get_encoder().is_loaded,
+        **query_batcher.stats
+    }
+
+@app.get("/api/debug/cache")
+async def debug_cache():
+    """调试端点：查询向量缓存与搜索结果缓存的命中统计（用于调整缓存大小）"""
+    return cache_stats()
+
 @app.get("/api/search/graph")
 async def api_search_graph(q: str, max_nodes: int = 30):
     """
     返回搜索结果的网络图数据
     构建以查询结果为中心的节点网络图
+
+    往返次数固定：一次搜索 + 一次批量邻居查询 + 一次批量 retrieve（协作过滤节点），
+    与中心节点数量无关
     """
-    from search_engine import search
-    from urllib.parse import urlparse
-    
     # 1. 获取搜索结果
-    search_results = search(q, top_k=min(10, max_nodes // 3))
+    query_vector = await encode_query(q)
+    search_results = await search_async(q, min(10, max_nodes // 3), query_vector)
     
     if not search_results:
         return {"nodes": [], "edges": []}
     
     # 2. 构建节点和边的集合
     nodes_dict = {}  # id -> node data
-    edges_list = []  # List of (source_id, target_id, weight) tuples
+    edges_dict = {}  # (source_id, target_id) -> weight，重复的边保留较大的权重
+
+    def add_edge(source_id, target_id, weight):
+        key = (source_id, target_id)
+        edges_dict[key] = max(weight, edges_dict.get(key, weight))
     
     # 提取节点标题的辅助函数
     def extract_title(url, content_preview="", node_id=""):
@@ -477,19 +521,19 @@ async def api_search_graph(q: str, max_nodes: int = 30):
             return title if len(title) <= 50 else title[:47] + "..."
         
         # 最后使用节点ID
+        node_id = str(node_id)
         return f"Node {node_id[:8]}" if node_id else "Unknown Node"
     
-    # 3. 为每个搜索结果添加节点，并找到相关节点
+    # 3. 先添加所有中心节点（搜索结果）
+    center_ids = []
     for result in search_results:
         result_id = result['id']
         result_url = result.get('url', '')
+        center_ids.append(result_id)
         
-        node_title = extract_title(result_url, result.get('content', ''), result_id)
-        
-        # 添加中心节点（搜索结果）
         nodes_dict[result_id] = {
             "id": result_id,
-            "name": node_title,
+            "name": extract_title(result_url, result.get('content', ''), result_id),
             "url": result_url,
             "content": result.get('content', '')[:100],
             "score": result.get('score', 0.0),
@@ -497,114 +541,108 @@ async def api_search_graph(q: str, max_nodes: int = 30):
             "value": result.get('score', 0.0) * 100,  # 节点大小
             "isCenter": True  # 标记为中心节点
         }
-        
-        # 4. 查找相关节点（通过向量相似度）
+    
+    # 4. 查找相关节点（通过向量相似度）
+    # 所有中心节点的邻居查询合并成一次 query_batch_points；
+    # 以点 ID 作为查询，由 Qdrant 直接使用已存储的向量，无需先 retrieve 向量
+    budget = max_nodes - len(nodes_dict)
+    if budget > 0:
+        per_center = min(5, budget)  # 每个中心节点最多5个相关节点
         try:
-            # 从数据库中获取该节点的向量
-            points = mgr.client.retrieve(
-                collection_name=SPACE_X,
-                ids=[result_id],
-                with_vectors=True,
-                with_payload=True
+            batch_hits = await async_store.query_batch_points(
+                SPACE_X,
+                [
+                    models.QueryRequest(
+                        query=center_id,
+                        using="clip",
+                        limit=per_center + 1,  # 多取一个，结果中可能包含中心节点自身
+                        with_payload=GRAPH_NODE_PAYLOAD_FIELDS
+                    )
+                    for center_id in center_ids
+                ]
             )
-            
-            if points:
-                point = points[0]
-                
-                # 查找相似的节点
-                related_hits = mgr.client.query_points(
-                    collection_name=SPACE_X,
-                    query=point.vector['clip'],
-                    using="clip",
-                    limit=5  # 每个中心节点最多5个相关节点
-                ).points
-                
-                for hit in related_hits:
-                    if hit.id == result_id:
-                        continue
-                    
+        except Exception as e:
+            print(f"⚠️ Error finding related nodes: {e}")
+            batch_hits = []
+
+        for center_id, related_hits in zip(center_ids, batch_hits):
+            added = 0
+            for hit in related_hits:
+                if hit.id == center_id:
+                    continue
+                if added >= per_center:
+                    break
+                if hit.id not in nodes_dict:
                     # 限制节点数量
                     if len(nodes_dict) >= max_nodes:
                         break
-                    
-                    # 提取相关节点标题
-                    related_url = hit.payload.get('url', '')
-                    related_content = hit.payload.get('content_preview', '')
-                    related_title = extract_title(related_url, related_content, hit.id)
-                    
-                    # 添加相关节点
-                    if hit.id not in nodes_dict:
-                        nodes_dict[hit.id] = {
-                            "id": hit.id,
-                            "name": related_title,
-                            "url": related_url,
-                            "content": hit.payload.get('content_preview', '')[:100],
-                            "score": float(hit.score),
-                            "category": hit.payload.get('type', 'unknown'),
-                            "value": float(hit.score) * 50,  # 相关节点较小
-                            "isCenter": False
-                        }
-                    
-                    # 添加边（中心节点 -> 相关节点）
-                    edge_tuple = (result_id, hit.id, float(hit.score))
-                    if edge_tuple not in edges_list:
-                        edges_list.append(edge_tuple)
-        
+                    payload = hit.payload or {}
+                    related_url = payload.get('url', '')
+                    related_content = payload.get('content_preview', '')
+                    nodes_dict[hit.id] = {
+                        "id": hit.id,
+                        "name": extract_title(related_url, related_content, hit.id),
+                        "url": related_url,
+                        "content": related_content[:100],
+                        "score": float(hit.score),
+                        "category": payload.get('type', 'unknown'),
+                        "value": float(hit.score) * 50,  # 相关节点较小
+                        "isCenter": False
+                    }
+                added += 1
+                # 添加边（中心节点 -> 相关节点）
+                add_edge(center_id, hit.id, float(hit.score))
+    
+    # 5. 查找协作过滤节点（通过transitions），缺失的节点一次批量 retrieve
+    collab = []  # (center_id, target_id, count)
+    for center_id in center_ids:
+        try:
+            for target_id, count in mgr.interaction_mgr.get_top_transitions(center_id, limit=3):
+                collab.append((center_id, target_id, count))
         except Exception as e:
-            print(f"⚠️ Error finding related nodes for {result_id}: {e}")
-        
-        # 5. 查找协作过滤节点（通过transitions）
+            print(f"⚠️ Error finding collaborative nodes for {center_id}: {e}")
+
+    budget = max_nodes - len(nodes_dict)
+    missing_ids = []
+    for _, target_id, _ in collab:
+        if target_id not in nodes_dict and target_id not in missing_ids:
+            missing_ids.append(target_id)
+    missing_ids = missing_ids[:max(budget, 0)]
+
+    if missing_ids:
         try:
-            top_transitions = mgr.interaction_mgr.get_top_transitions(result_id, limit=3)
-            
-            for target_id, count in top_transitions:
-                if len(nodes_dict) >= max_nodes:
-                    break
-                
-                # 如果节点已存在，只添加边
-                if target_id not in nodes_dict:
-                    try:
-                        target_points = mgr.client.retrieve(
-                            collection_name=SPACE_X,
-                            ids=[target_id],
-                            with_payload=True
-                        )
-                        
-                        if target_points:
-                            target_point = target_points[0]
-                            target_url = target_point.payload.get('url', '')
-                            target_content = target_point.payload.get('content_preview', '')
-                            target_title = extract_title(target_url, target_content, target_id)
-                            
-                            nodes_dict[target_id] = {
-                                "id": target_id,
-                                "name": target_title,
-                                "url": target_url,
-                                "content": target_point.payload.get('content_preview', '')[:100],
-                                "score": 0.5,  # 协作过滤节点中等权重
-                                "category": target_point.payload.get('type', 'unknown'),
-                                "value": 30.0,
-                                "isCenter": False
-                            }
-                    except Exception:
-                        continue
-                
-                # 添加协作边（权重基于transition count）
-                edge_weight = 0.3 + (count * 0.1)  # 基于transition次数
-                edge_tuple = (result_id, target_id, edge_weight)
-                # 检查是否已存在相同的边，如果存在则更新权重
-                existing_edge = next((e for e in edges_list if e[0] == result_id and e[1] == target_id), None)
-                if existing_edge:
-                    edges_list.remove(existing_edge)
-                    edge_weight = max(edge_weight, existing_edge[2])  # 使用较大的权重
-                edges_list.append((result_id, target_id, edge_weight))
-        
+            target_points = await async_store.retrieve(
+                SPACE_X,
+                missing_ids,
+                with_payload=GRAPH_NODE_PAYLOAD_FIELDS
+            )
         except Exception as e:
-            print(f"⚠️ Error finding collaborative nodes for {result_id}: {e}")
+            print(f"⚠️ Error retrieving collaborative nodes: {e}")
+            target_points = []
+
+        for target_point in target_points:
+            payload = target_point.payload or {}
+            target_url = payload.get('url', '')
+            target_content = payload.get('content_preview', '')
+            nodes_dict[target_point.id] = {
+                "id": target_point.id,
+                "name": extract_title(target_url, target_content, target_point.id),
+                "url": target_url,
+                "content": target_content[:100],
+                "score": 0.5,  # 协作过滤节点中等权重
+                "category": payload.get('type', 'unknown'),
+                "value": 30.0,
+                "isCenter": False
+            }
+
+    for center_id, target_id, count in collab:
+        # 只为已在图中的节点添加协作边（权重基于transition次数）
+        if target_id in nodes_dict and target_id != center_id:
+            add_edge(center_id, target_id, 0.3 + (count * 0.1))
     
     # 6. 转换数据格式
     nodes = list(nodes_dict.values())
-    edges = [{"source": src, "target": tgt, "value": weight} for src, tgt, weight in edges_list]
+    edges = [{"source": src, "target": tgt, "value": weight} for (src, tgt), weight in edges_dict.items()]
     
     return {
         "nodes": nodes,
@@ -633,9 +671,9 @@ async def api_trending(limit: int = 5):
     if trending_ids:
         # Retrieve details from Space X
         try:
-            points = mgr.client.retrieve(
-                collection_name=SPACE_X,
-                ids=trending_ids,
+            points = await async_store.retrieve(
+                SPACE_X,
+                trending_ids,
                 with_payload=True
             )
         except Exception as e:
@@ -663,9 +701,9 @@ async def view_item(item_id: str):
 @app.get("/api/item/{item_id}")
 async def get_item_details(item_id: str):
     # 1. Retrieve item from Space X
-    points = mgr.client.retrieve(
-        collection_name=SPACE_X,
-        ids=[item_id],
+    points = await async_store.retrieve(
+        SPACE_X,
+        [item_id],
         with_payload=True,
         with_vectors=True
     )
@@ -676,12 +714,11 @@ async def get_item_details(item_id: str):
     
     # 2. Find related items (Internal Navigation Links)
     # Use the item's vector to find similar items
-    related_hits = mgr.client.query_points(
-        collection_name=SPACE_X,
-        query=item.vector['clip'],
-        using="clip",
+    related_hits = await async_store.query_points(
+        SPACE_X,
+        item.vector['clip'],
         limit=6 # Top 5 related (excluding self)
-    ).points
+    )
     
     related = []
     for hit in related_hits:
@@ -701,9 +738,9 @@ async def get_item_details(item_id: str):
     if top_transitions:
         target_ids = [t[0] for t in top_transitions]
         # Retrieve target items by ID
-        target_points = mgr.client.retrieve(
-            collection_name=SPACE_X,
-            ids=target_ids,
+        target_points = await async_store.retrieve(
+            SPACE_X,
+            target_ids,
             with_payload=True
         )
         
@@ -748,7 +785,7 @@ if args.mode == "user":
         """
         # 强制指定 SPACE_X，防止用户访问 R
         offset_val = offset if offset and offset != "null" else None
-        return mgr.browse_collection(SPACE_X, limit, offset_val)
+        return await async_store.browse_collection(SPACE_X, limit, offset_val)
 
     # 用户上传接口
     @app.post("/api/admin/backfill")
@@ -873,7 +910,7 @@ elif args.mode == "admin":
     async def admin_browse(space: str, limit: int = 50, offset: str = None):
         collection = SPACE_R if space == "R" else SPACE_X
         offset_val = offset if offset and offset != "null" else None
-        return mgr.browse_collection(collection, limit, offset_val)
+        return await async_store.browse_collection(collection, limit, offset_val)
 
     @app.post("/api/admin/promote")
     async def admin_promote(id: str = Form(...)):